@@ -1,10 +1,10 @@
 from botocore.exceptions import ClientError
-from mypy_boto3_s3 import S3Client
+from config.s3 import AsyncS3Client
 from typing import Optional
 
-async def verify_s3_object(s3_client: S3Client, bucket: str, key: str) -> bool:
+async def verify_s3_object(s3_client: AsyncS3Client, bucket: str, key: str) -> bool:
     try:
-        s3_client.head_object(Bucket=bucket, Key=key)
+        await s3_client.head_object(Bucket=bucket, Key=key)
         return True
     except ClientError as e:
         response = getattr(e, 'response', {})
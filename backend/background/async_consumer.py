@@ -0,0 +1,259 @@
+"""
+Asyncio-native consumer for the `explainer-chunk` Huey queue.
+
+I/O-bound tasks that registered a coroutine via `register_async_task` (chat,
+explain-text, summaries, ingestion) run directly on this process's event loop,
+up to `async_worker_concurrency` at a time, sharing one WorkerRuntime and one
+Docling conversion pool. Every other task (website capture, thumbnails, ...)
+is executed by Huey itself inside a process pool, so CPU-heavy work never
+blocks the loop.
+
+Run with: python -m background.async_consumer
+"""
+
+import asyncio
+import datetime
+import importlib
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Set
+
+from huey import signals as S
+from huey.utils import Error
+
+from config.huey import huey
+from config.environment import WorkerSettings
+from config.logger import setup_logging, get_logger
+from background.async_tasks import AsyncTaskFn, get_async_task
+from background.worker_runtime import get_worker_runtime
+from services.docling_conversion import (
+    shutdown_conversion_pool,
+    warm_up_conversion_pool,
+)
+
+logger = get_logger()
+
+worker_settings = WorkerSettings()
+
+# Importing these registers every task with Huey (and the async registry), both
+# here and in each pool process.
+TASK_MODULES = [
+    "background.huey_jobs.capture_website_job",
+    "background.huey_jobs.chat_job",
+    "background.huey_jobs.explain_text_job",
+    "background.huey_jobs.generate_thumbnail",
+    "background.huey_jobs.ingest_document_job",
+    "background.huey_jobs.post_user_registration_job",
+    "background.huey_jobs.process_document_job",
+    "background.huey_jobs.process_document_v2_job",
+    "background.huey_jobs.summarize_document_job",
+]
+
+
+def import_task_modules() -> None:
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+def _init_pool_process() -> None:
+    # No Docling warm-up here: every pool process would start its own set of
+    # model-loaded conversion processes. The first conversion starts them.
+    setup_logging()
+    import_task_modules()
+
+
+def _timestamp() -> datetime.datetime:
+    # Huey compares naive datetimes, in UTC unless configured otherwise
+    if huey.utc:
+        return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    return datetime.datetime.now()
+
+
+def _emit(signal_name: str, task: Any, *args: Any) -> None:
+    # Huey has no public way to send its signals to registered handlers
+    huey._emit(signal_name, task, *args)
+
+
+def _finish_task(task: Any, value: Any, exception: Optional[Exception]) -> None:
+    """What Huey does after running a task; blocking, so call it from a thread."""
+    # Clear the flag if this run was revoked after it started
+    huey.get(task.revoke_id)
+
+    if huey.results:
+        if exception is not None:
+            huey.put_result(task.id, Error(huey.build_error_result(task, exception)))
+        elif value is not None or huey.store_none:
+            huey.put_result(task.id, value)
+
+    if exception is None:
+        _emit(S.SIGNAL_COMPLETE, task)
+        if task.on_complete:
+            next_task = task.on_complete
+            next_task.extend_data(value)
+            huey.enqueue(next_task)
+        return
+
+    if task.on_error:
+        next_task = task.on_error
+        next_task.extend_data(exception)
+        huey.enqueue(next_task)
+    if task.retries:
+        _emit(S.SIGNAL_RETRYING, task)
+        task.retries -= 1
+        logger.info(f"Requeueing {task.id}, {task.retries} retries left")
+        if task.retry_delay:
+            task.eta = _timestamp() + datetime.timedelta(seconds=task.retry_delay)
+            huey.add_schedule(task)
+        else:
+            huey.enqueue(task)
+
+
+def _execute_in_pool(data: bytes) -> None:
+    # Runs in a pool process; Huey handles retries, revocation and results.
+    huey.execute(huey.deserialize_task(data))
+
+
+class AsyncConsumer:
+    def __init__(
+        self,
+        concurrency: int = worker_settings.async_worker_concurrency,
+        processes: int = worker_settings.cpu_worker_processes,
+        dequeue_timeout: int = worker_settings.async_worker_dequeue_timeout,
+    ):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.dequeue_timeout = dequeue_timeout
+        # Registered coroutines look their clients up via get_worker_runtime()
+        self.runtime = get_worker_runtime()
+        self.slots = asyncio.Semaphore(concurrency)
+        self.in_flight: Set[asyncio.Task[None]] = set()
+        self.stopping = asyncio.Event()
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        # spawn, not fork: the parent holds a running loop and open sockets
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_process,
+        )
+        await self.runtime.open()
+        # Huey's on_startup hooks don't run here, so load the models before
+        # the first dequeue
+        if worker_settings.docling_warm_up_on_startup:
+            await asyncio.to_thread(warm_up_conversion_pool)
+        logger.info(
+            f"Async consumer started: concurrency={self.concurrency}, processes={self.processes}"
+        )
+
+        scheduler = asyncio.create_task(self._schedule_loop())
+        try:
+            await self._consume_loop()
+        finally:
+            scheduler.cancel()
+            await self._drain()
+            await self.runtime.close()
+            self.pool.shutdown(wait=True)
+            await asyncio.to_thread(shutdown_conversion_pool)
+            logger.info("Async consumer stopped")
+
+    async def _consume_loop(self) -> None:
+        queue_key: str = huey.storage.queue_key
+        redis_client = self.runtime.redis_client
+
+        while not self.stopping.is_set():
+            await self.slots.acquire()
+            try:
+                item = await redis_client.brpop(
+                    [queue_key], timeout=self.dequeue_timeout
+                )
+            except Exception:
+                self.slots.release()
+                logger.exception("Error reading from queue")
+                await asyncio.sleep(1)
+                continue
+
+            if item is None:
+                self.slots.release()
+                continue
+
+            job = asyncio.create_task(self._dispatch(item[1]))
+            self.in_flight.add(job)
+            job.add_done_callback(self.in_flight.discard)
+
+    async def _dispatch(self, data: bytes) -> None:
+        try:
+            task: Any = huey.deserialize_task(data)
+            # Delayed and retried tasks wait in the schedule until their eta
+            if not huey.ready_to_run(task, _timestamp()):
+                await asyncio.to_thread(huey.add_schedule, task)
+                return
+
+            async_fn = get_async_task(type(task).__name__)
+            if async_fn is None:
+                assert self.pool is not None
+                await asyncio.get_running_loop().run_in_executor(
+                    self.pool, _execute_in_pool, data
+                )
+            else:
+                await self._execute_async(task, async_fn)
+        except Exception:
+            logger.exception("Unhandled error while executing task")
+        finally:
+            self.slots.release()
+
+    async def _execute_async(self, task: Any, async_fn: AsyncTaskFn) -> None:
+        """
+        `Huey.execute` for a task with a coroutine implementation: revocation
+        and expiry checks, signals, stored results, on_complete/on_error
+        pipelines and retries after `retry_delay`.
+        """
+        timestamp = _timestamp()
+        if await asyncio.to_thread(huey.is_revoked, task, timestamp, False):
+            logger.warning(f"Task {task} was revoked, not executing")
+            _emit(S.SIGNAL_REVOKED, task)
+            return
+        if task.expires_resolved and task.expires_resolved < timestamp:
+            logger.info(f"Task {task} expired, not executing")
+            _emit(S.SIGNAL_EXPIRED, task)
+            return
+
+        logger.info(f"Executing {task}")
+        _emit(S.SIGNAL_EXECUTING, task)
+        value: Any = None
+        exception: Optional[Exception] = None
+        try:
+            args, kwargs = task.data
+            value = await async_fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Unhandled exception in task {task.id}")
+            exception = e
+            _emit(S.SIGNAL_ERROR, task, e)
+        await asyncio.to_thread(_finish_task, task, value, exception)
+
+    async def _schedule_loop(self) -> None:
+        # Moves delayed/retried tasks whose eta has passed back onto the queue,
+        # mirroring Huey's own scheduler process.
+        while True:
+            try:
+                for task in await asyncio.to_thread(huey.read_schedule):
+                    await asyncio.to_thread(huey.enqueue, task)
+            except Exception:
+                logger.exception("Error reading schedule")
+            await asyncio.sleep(1)
+
+    async def _drain(self) -> None:
+        if self.in_flight:
+            logger.info(f"Waiting for {len(self.in_flight)} in-flight tasks")
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    import_task_modules()
+    asyncio.run(AsyncConsumer().run())
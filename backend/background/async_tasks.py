@@ -0,0 +1,22 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+AsyncTaskFn = Callable[..., Awaitable[Any]]
+
+# Huey task class name -> coroutine function taking the same args as the task
+_ASYNC_TASKS: Dict[str, AsyncTaskFn] = {}
+
+
+def register_async_task(huey_task: Any, fn: AsyncTaskFn) -> AsyncTaskFn:
+    """
+    Mark a Huey task as I/O-bound by giving it a native coroutine implementation.
+
+    The async consumer runs registered tasks directly on its event loop instead
+    of handing them to a worker process. The coroutine must accept exactly the
+    arguments the Huey task is enqueued with.
+    """
+    _ASYNC_TASKS[huey_task.task_class.__name__] = fn
+    return fn
+
+
+def get_async_task(task_name: str) -> Optional[AsyncTaskFn]:
+    return _ASYNC_TASKS.get(task_name)
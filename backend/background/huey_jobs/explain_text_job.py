@@ -1,13 +1,11 @@
-import asyncio
-from typing import AsyncGenerator
-from contextlib import asynccontextmanager
+from typing import Optional
 from config.huey import huey
-from config.redis import RedisPool, RedisType
 from config.ai_models import DEFAULT_MODEL_CONFIGS, ModelPairConfig
 from config.environment import PineconeSettings, OpenAISettings
-from config.mongo import MongoManager, mongo_settings, TypedAsyncIOMotorDatabase
 from services.ai_explain_text_service import AIExplainTextService
 from utils.progress_updater import ProgressUpdater
+from background.worker_runtime import get_worker_runtime, run_in_worker
+from background.async_tasks import register_async_task
 
 import logging
 
@@ -20,52 +18,41 @@ pinecone_settings = PineconeSettings()
 open_ai_settings = OpenAISettings()
 
 
-@asynccontextmanager
-async def get_redis_client():
-    pool = RedisPool()
-    try:
-        client: RedisType = await pool.get_client()
-        yield client
-    finally:
-        await pool.close()
-
-
-# Not ideal, but this is the only apparant way to avoid event loop is closed errors
-@asynccontextmanager
-async def get_mongo_db() -> AsyncGenerator[TypedAsyncIOMotorDatabase, None]:
-    mongo_manager = MongoManager[TypedAsyncIOMotorDatabase](mongo_settings)
-    await mongo_manager.connect()
-    assert mongo_manager.db is not None
-    try:
-        yield mongo_manager.db
-    finally:
-        await mongo_manager.close()
-
-
 async def async_explain_text(
     document_upload_id: str,
     highlighted_text: str,
     model_config: ModelPairConfig,
+    job_id: Optional[str] = None,
 ):
-    async with get_redis_client() as redis_client, get_mongo_db() as db:
-        progress_updater = ProgressUpdater(
-            redis_client, document_upload_id, "explain_text_task"
-        )
-        ai_explain_text_service = AIExplainTextService(
-            openai_api_key=open_ai_settings.openai_api_key,
-            model_pair_config=model_config,
-            progress_updater=progress_updater,
-            db=db,
-        )
-        try:
-            await ai_explain_text_service.explain_text(
-                document_upload_id, highlighted_text, model_config
-            )
-            logger.info(
-                f"Finished explaining text section with document_upload_id={document_upload_id} for model={model_config['chat_model']['model_name']}"
-            )
-        finally:
-            ai_explain_text_service.openai_assistant_service.client.close()
+    runtime = get_worker_runtime()
+    progress_updater = ProgressUpdater(
+        runtime.redis_client, document_upload_id, "explain_text_task", job_id
+    )
+    ai_explain_text_service = AIExplainTextService(
+        openai_api_key=open_ai_settings.openai_api_key,
+        model_pair_config=model_config,
+        progress_updater=progress_updater,
+        db=runtime.db,
+        redis_client=runtime.redis_client,
+    )
+    await ai_explain_text_service.explain_text(
+        document_upload_id, highlighted_text, model_config
+    )
+    logger.info(
+        f"Finished explaining text section with document_upload_id={document_upload_id} for model={model_config['chat_model']['model_name']}"
+    )
+
+
+async def run_explain_text(
+    document_upload_id: str,
+    highlighted_text: str,
+    model_name: str = "gpt-4-mini",
+    job_id: Optional[str] = None,
+):
+    model_pair_config = DEFAULT_MODEL_CONFIGS[model_name]
+    await async_explain_text(
+        document_upload_id, highlighted_text, model_pair_config, job_id
+    )
 
 
 @huey.task()
@@ -73,15 +60,14 @@ def explain_text(
     document_upload_id: str,
     highlighted_text: str,
     model_name: str = "gpt-4-mini",
+    job_id: Optional[str] = None,
 ):
     logger.info(
         f"Starting explain text task for document_upload_id={document_upload_id} for model={model_name}"
     )
     try:
-        model_pair_config = DEFAULT_MODEL_CONFIGS[model_name]
-
-        asyncio.run(
-            async_explain_text(document_upload_id, highlighted_text, model_pair_config)
+        run_in_worker(
+            run_explain_text(document_upload_id, highlighted_text, model_name, job_id)
         )
 
         logger.info(
@@ -92,3 +78,6 @@ def explain_text(
             f"Error in explaining text for document_id={document_upload_id} for model={model_name}: {str(e)}"
         )
         raise  # Re-raise the exception so Huey marks the task as failed
+
+
+register_async_task(explain_text, run_explain_text)
@@ -0,0 +1,68 @@
+from config.huey import huey
+from config.ai_models import DEFAULT_MODEL_CONFIGS, ModelPairConfig
+from config.environment import IngestionPipelineSettings, WorkerSettings
+from services.docling_conversion import (
+    shutdown_conversion_pool,
+    warm_up_conversion_pool,
+)
+from services.ingestion_pipeline import DocumentIngestionPipeline
+from background.async_tasks import register_async_task
+from background.worker_runtime import get_worker_runtime, run_in_worker
+from config.logger import get_logger
+
+logger = get_logger()
+
+pipeline_settings = IngestionPipelineSettings()
+worker_settings = WorkerSettings()
+
+
+async def async_ingest_document(document_id: str, model_pair_config: ModelPairConfig):
+    runtime = get_worker_runtime()
+    pipeline = DocumentIngestionPipeline(
+        db=runtime.db,
+        es_client=runtime.elasticsearch,
+        redis_client=runtime.redis_client,
+        model_pair_config=model_pair_config,
+    )
+    return await pipeline.run(document_id)
+
+
+async def run_ingest_document(document_id: str, model_name: str = "gpt-4o-mini"):
+    model_pair_config = DEFAULT_MODEL_CONFIGS[model_name]
+    return await async_ingest_document(document_id, model_pair_config)
+
+
+# Retries resume from the stages checkpointed by the failed attempt
+@huey.task(
+    retries=pipeline_settings.ingestion_retries,
+    retry_delay=pipeline_settings.ingestion_retry_delay,
+)
+def ingest_document(document_id: str, model_name: str = "gpt-4o-mini"):
+    logger.info(f"Starting ingestion for document_id={document_id}")
+    try:
+        result = run_in_worker(run_ingest_document(document_id, model_name))
+
+        logger.info(f"Finished ingestion for document_id={document_id}")
+        return result
+    except Exception as e:
+        logger.exception(
+            f"Error in ingestion for document_id={document_id}: {str(e)}"
+        )
+        raise  # Re-raise the exception so Huey marks the task as failed
+
+
+# Conversion itself runs in the Docling conversion pool, so the async consumer
+# runs ingestion on its loop and shares one warmed-up pool across jobs
+register_async_task(ingest_document, run_ingest_document)
+
+
+# Plain Huey consumers; the async consumer warms up and shuts down the pool itself
+@huey.on_startup()
+def warm_up_docling_models():
+    if worker_settings.docling_warm_up_on_startup:
+        warm_up_conversion_pool()
+
+
+@huey.on_shutdown()
+def stop_docling_conversion_pool():
+    shutdown_conversion_pool()
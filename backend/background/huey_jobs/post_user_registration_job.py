@@ -1,9 +1,6 @@
-import asyncio
-from typing import AsyncGenerator
-from contextlib import asynccontextmanager
 from config.huey import huey
-from config.mongo import MongoManager, mongo_settings, TypedAsyncIOMotorDatabase
 from services.registration_service import RegistrationService
+from background.worker_runtime import get_worker_runtime, run_in_worker
 import logging
 
 logging.basicConfig(
@@ -12,24 +9,13 @@ logging.basicConfig(
 logger = logging.getLogger("PostRegistrationJob")
 
 
-# Not ideal, but this is the only apparant way to avoid event loop is closed errors
-@asynccontextmanager
-async def get_mongo_db() -> AsyncGenerator[TypedAsyncIOMotorDatabase, None]:
-    mongo_manager = MongoManager[TypedAsyncIOMotorDatabase](mongo_settings)
-    await mongo_manager.connect()
-    assert mongo_manager.db is not None
-    try:
-        yield mongo_manager.db
-    finally:
-        await mongo_manager.close()
-
-
 async def post_registration_job_async(
     user_id: str,
 ):
-    async with get_mongo_db() as db:
-        registration_service = RegistrationService(db=db, logger=logger)
-        await registration_service.process_new_registration(user_id=user_id)
+    registration_service = RegistrationService(
+        db=get_worker_runtime().db, logger=logger
+    )
+    await registration_service.process_new_registration(user_id=user_id)
 
 
 @huey.task()
@@ -38,7 +24,7 @@ def post_registration_job(
 ):
     logger.info(f"Starting post registration job for user id {user_id}")
     try:
-        asyncio.run(post_registration_job_async(user_id))
+        run_in_worker(post_registration_job_async(user_id))
         logger.info(f"Finished post registration job for user id {user_id}")
     except Exception as e:
         logger.error(e)
@@ -1,11 +1,19 @@
 import asyncio
-import json
-from typing import Dict, Optional, Any, Coroutine, Protocol, TYPE_CHECKING
+from typing import Dict, Optional, Any, List, Set, Tuple, TYPE_CHECKING
+
+from fastapi import WebSocket
 
 from config.redis import Redis
-from utils.valid_json import is_valid_json
+from config.environment import ProgressStreamSettings
 from services.websocket_manager import WebSocketManager
+from services.connection_registry import ConnectionRegistry
 from config.redis_pubsub_channels import PUBSUB_CONFIG, PubSubChannel
+from utils.progress_updater import (
+    decode_stream_id,
+    parse_stream_id,
+    progress_event_job_id,
+    progress_event_message,
+)
 from config.logger import get_logger
 
 logger = get_logger()
@@ -17,14 +25,6 @@ else:
     RedisType = Redis
 
 
-class PubSub(Protocol):
-    def subscribe(self, *args: str) -> Coroutine[Any, Any, Any]: ...
-    def get_message(
-        self, ignore_subscribe_messages: bool = False
-    ) -> Coroutine[Any, Any, Optional[Dict[str, Any]]]: ...
-    def unsubscribe(self) -> Coroutine[Any, Any, Any]: ...
-
-
 CHANNEL_TO_SOCKET_PREFIX_MAP: Dict[PubSubChannel, str] = {
     PubSubChannel.CAPTURE_WEBSITE: "document_upload",
     PubSubChannel.SUMMARIZE_DOCUMENT: "summary",
@@ -32,35 +32,71 @@ CHANNEL_TO_SOCKET_PREFIX_MAP: Dict[PubSubChannel, str] = {
     PubSubChannel.CHAT: "chat",
 }
 
+SOCKET_PREFIX_TO_CHANNEL_MAP: Dict[str, PubSubChannel] = {
+    prefix: channel for channel, prefix in CHANNEL_TO_SOCKET_PREFIX_MAP.items()
+}
+
+StreamEntry = Tuple[Any, Dict[Any, Any]]
+
+# Progress statuses that end a job; these are never dropped for a slow client.
+TERMINAL_STATUSES = ("COMPLETE", "ERROR")
+
 
 class RedisSubscriber:
+    """
+    Forwards job progress from the per-job Redis Streams to the websockets
+    connected to this process.
+
+    A stream is read while at least one local socket is attached to its topic
+    (`prefix:connection_id`), tracked with the ID of the last event forwarded,
+    and a single reader blocks on all of the tracked streams at once. Because
+    the events stay in the stream, a socket that attaches with the ID it last
+    saw is replayed everything it missed.
+
+    Only streams of sockets held by this node are read, so adding API nodes
+    doesn't multiply the read work. The node's claim on each socket is kept in
+    the `ConnectionRegistry` until the socket goes away; a client reconnecting
+    through another node doesn't affect the sockets held here.
+    """
+
     def __init__(self, redis_client: RedisType, websocket_manager: WebSocketManager):
         self.redis_client = redis_client
         self.websocket_manager = websocket_manager
+        self.settings = ProgressStreamSettings()
         self.is_running = False
         self.task: Optional[asyncio.Task[None]] = None
+        # stream name -> ID of the last event forwarded from it
+        self.streams: Dict[str, str] = {}
+        # stream name -> (connection_id, socket_prefix) of its topic
+        self.targets: Dict[str, Tuple[str, str]] = {}
+        # stream name -> keys of the sockets attached to it
+        self.attached: Dict[str, Set[str]] = {}
+        # keys of the sockets this node has claimed in the registry
+        self.claimed: Set[str] = set()
+        self.registry = ConnectionRegistry(redis_client)
+        self.refresh_task: Optional[asyncio.Task[None]] = None
 
     async def start(self):
-        self.pubsub: PubSub = self.redis_client.pubsub()
-
-        # Subscribe to all channels defined in PUBSUB_CONFIG
-        channels_to_subscribe = [channel.value for channel in PubSubChannel]
-        await self.pubsub.subscribe(*channels_to_subscribe)
-
         self.is_running = True
+        self.refresh_task = asyncio.create_task(self.refresh_registry())
         logger.info(
-            f"Redis subscriber started and subscribed to channels: {', '.join(channels_to_subscribe)}"
+            f"Redis subscriber started on node {self.registry.node_id} for progress streams of channels: {', '.join(channel.value for channel in PubSubChannel)}"
         )
 
         while self.is_running:
             try:
-                message: Optional[Dict[str, Any]] = await asyncio.wait_for(
-                    self.pubsub.get_message(ignore_subscribe_messages=True), timeout=1.0
+                if not self.streams:
+                    await asyncio.sleep(self.settings.progress_stream_block_ms / 1000)
+                    continue
+                response: Optional[List[Tuple[Any, List[StreamEntry]]]] = (
+                    await self.redis_client.xread(
+                        dict(self.streams),
+                        count=self.settings.progress_stream_read_count,
+                        block=self.settings.progress_stream_block_ms,
+                    )
                 )
-                if message is not None:
-                    await self.process_message(message)
-            except asyncio.TimeoutError:
-                continue
+                for stream_name, entries in response or []:
+                    await self.process_entries(decode_stream_id(stream_name), entries)
             except asyncio.CancelledError:
                 logger.info("Redis subscriber received cancellation signal")
                 break
@@ -71,19 +107,200 @@ class RedisSubscriber:
 
         await self.cleanup()
 
-    async def process_message(self, message: Dict[str, Any]):
-        if is_valid_json(message["data"]):
-            data = json.loads(message["data"])
-            channel = message.get("channel", "").decode("utf-8")
+    async def claim(self, socket_key: str):
+        """Record in the registry that this node holds the socket."""
+        await self.registry.register(socket_key)
+        self.claimed.add(socket_key)
+
+    async def release(
+        self, socket_key: str, websocket: Optional[WebSocket] = None
+    ):
+        """
+        Give up the node's claim on a socket; with `websocket`, only while it is
+        still the socket held under that key.
+        """
+        if self.websocket_manager.is_replaced(socket_key, websocket):
+            return
+        if socket_key in self.claimed:
+            self.claimed.discard(socket_key)
+            await self.registry.unregister(socket_key)
 
-            if PUBSUB_CONFIG.is_valid_channel(channel):
-                socket_prefix = CHANNEL_TO_SOCKET_PREFIX_MAP[PubSubChannel(channel)]
+    async def attach(
+        self,
+        connection_id: str,
+        socket_prefix: str,
+        last_event_id: Optional[str],
+        socket_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ):
+        """
+        Start forwarding a job's progress to a socket, by default the job's own
+        `prefix:connection_id` socket. With `last_event_id` the events after it
+        are replayed to that socket first ("0" replays the whole stream), only
+        those of `job_id` if given; without it only new events are sent.
+        """
+        channel = SOCKET_PREFIX_TO_CHANNEL_MAP[socket_prefix]
+        stream_name = PUBSUB_CONFIG.get_stream_name(channel, connection_id)
+        topic_key = self.websocket_manager.connection_key(connection_id, socket_prefix)
+        socket_key = socket_key or topic_key
 
-                await self.websocket_manager.send_message(
-                    json.dumps(data), data["connection_id"], socket_prefix
+        if last_event_id is None:
+            last_id = self.streams.get(stream_name)
+            if last_id is None:
+                latest: List[StreamEntry] = await self.redis_client.xrevrange(
+                    stream_name, count=1
                 )
-            else:
-                logger.warning(f"Received message from unknown channel: {channel}")
+                last_id = decode_stream_id(latest[0][0]) if latest else "0-0"
+        else:
+            milliseconds, sequence = parse_stream_id(last_event_id)
+            last_id = await self.replay(
+                stream_name,
+                socket_key,
+                socket_prefix,
+                f"{milliseconds}-{sequence}",
+                job_id,
+            )
+
+        # No awaits from here on, so the reader can't forward anything between
+        # the replay catching up and the socket joining the topic.
+        if stream_name not in self.streams:
+            self.streams[stream_name] = last_id
+        self.targets[stream_name] = (connection_id, socket_prefix)
+        self.attached.setdefault(stream_name, set()).add(socket_key)
+        self.websocket_manager.subscribe(socket_key, topic_key)
+
+    async def replay(
+        self,
+        stream_name: str,
+        socket_key: str,
+        socket_prefix: str,
+        last_id: str,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Send a socket the events after `last_id`, only those of `job_id` if
+        given. If the stream is already being read for other sockets, the replay
+        stops at the last event the reader forwarded, which the socket then
+        picks up from.
+        """
+        replayed = 0
+        while True:
+            tracked_id = self.streams.get(stream_name)
+            if tracked_id is not None and parse_stream_id(
+                tracked_id
+            ) <= parse_stream_id(last_id):
+                break
+            entries: List[StreamEntry] = await self.redis_client.xrange(
+                stream_name,
+                min=f"({last_id}",
+                max=tracked_id or "+",
+                count=self.settings.progress_stream_read_count,
+            )
+            for stream_id, fields in entries:
+                last_id = decode_stream_id(stream_id)
+                if job_id is not None and progress_event_job_id(fields) != job_id:
+                    continue
+                await self.send_event(
+                    socket_prefix, last_id, fields, socket_key=socket_key
+                )
+            replayed += len(entries)
+            if len(entries) < self.settings.progress_stream_read_count and (
+                self.streams.get(stream_name) == tracked_id
+            ):
+                break
+        logger.info(f"Replayed {replayed} progress events to {socket_key} up to {last_id}")
+        return last_id
+
+    async def detach(
+        self,
+        connection_id: str,
+        socket_prefix: str,
+        socket_key: Optional[str] = None,
+        websocket: Optional[WebSocket] = None,
+    ):
+        channel = SOCKET_PREFIX_TO_CHANNEL_MAP[socket_prefix]
+        stream_name = PUBSUB_CONFIG.get_stream_name(channel, connection_id)
+        topic_key = self.websocket_manager.connection_key(connection_id, socket_prefix)
+        socket_key = socket_key or topic_key
+        if self.websocket_manager.is_replaced(socket_key, websocket):
+            return
+        self.websocket_manager.unsubscribe(socket_key, topic_key)
+        sockets = self.attached.get(stream_name)
+        if sockets is None:
+            return
+        sockets.discard(socket_key)
+        if not sockets:
+            # Last local socket for this job; stop reading its stream.
+            del self.attached[stream_name]
+            self.streams.pop(stream_name, None)
+            self.targets.pop(stream_name, None)
+
+    async def detach_socket(
+        self, socket_key: str, websocket: Optional[WebSocket] = None
+    ):
+        """
+        Detach a socket from every stream it is attached to; with `websocket`,
+        only while it is still the socket held under that key.
+        """
+        if self.websocket_manager.is_replaced(socket_key, websocket):
+            return
+        for stream_name, sockets in list(self.attached.items()):
+            if socket_key in sockets:
+                connection_id, socket_prefix = self.targets[stream_name]
+                await self.detach(connection_id, socket_prefix, socket_key)
+
+    async def refresh_registry(self):
+        """Keep this node's socket claims alive."""
+        interval = self.registry.settings.websocket_registry_refresh_interval
+        while self.is_running:
+            await asyncio.sleep(interval)
+            try:
+                await self.registry.refresh(list(self.claimed))
+            except Exception as e:
+                logger.exception(e)
+                logger.error(f"Error refreshing websocket connection registry")
+
+    async def process_entries(self, stream_name: str, entries: List[StreamEntry]):
+        target = self.targets.get(stream_name)
+        if target is None:
+            return
+        connection_id, socket_prefix = target
+        for stream_id, fields in entries:
+            stream_id = decode_stream_id(stream_id)
+            last_id = self.streams.get(stream_name)
+            # Skip events already forwarded while this read was in flight.
+            if last_id is None or parse_stream_id(stream_id) <= parse_stream_id(
+                last_id
+            ):
+                continue
+            await self.send_event(
+                socket_prefix, stream_id, fields, connection_id=connection_id
+            )
+            self.streams[stream_name] = stream_id
+
+    async def send_event(
+        self,
+        socket_prefix: str,
+        stream_id: str,
+        fields: Dict[Any, Any],
+        connection_id: Optional[str] = None,
+        socket_key: Optional[str] = None,
+    ):
+        """Send an event to its topic's sockets, or to just `socket_key`."""
+        try:
+            message, status = progress_event_message(stream_id, fields, socket_prefix)
+        except (TypeError, ValueError):
+            logger.warning(
+                f"Skipping malformed {socket_prefix} progress event {stream_id}"
+            )
+            return
+        terminal = status in TERMINAL_STATUSES
+        if socket_key is not None:
+            await self.websocket_manager.send_to(socket_key, message, terminal)
+        elif connection_id is not None:
+            await self.websocket_manager.send_message(
+                message, connection_id, socket_prefix, terminal=terminal
+            )
 
     async def stop(self):
         logger.info("Stopping Redis subscriber")
@@ -96,6 +313,11 @@ class RedisSubscriber:
                 pass
 
     async def cleanup(self):
-        if self.pubsub:
-            await self.pubsub.unsubscribe()
+        if self.refresh_task:
+            self.refresh_task.cancel()
+        for socket_key in list(self.claimed):
+            await self.release(socket_key)
+        self.streams.clear()
+        self.targets.clear()
+        self.attached.clear()
         logger.info("Redis subscriber cleaned up")
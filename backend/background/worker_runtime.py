@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+from aiohttp import ClientSession, TCPConnector
+from elasticsearch import AsyncElasticsearch
+
+from config.huey import huey
+from config.mongo import MongoManager, mongo_settings, TypedAsyncIOMotorDatabase
+from config.redis import RedisPool, RedisType
+from config.elasticsearch import (
+    create_elasticsearch_client,
+    check_elasticsearch_connection,
+)
+from config.environment import WorkerSettings
+from config.openai_client import close_async_openai_clients
+from config.logger import get_logger
+
+logger = get_logger()
+
+worker_settings = WorkerSettings()
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    """
+    Long-lived event loop plus pooled Mongo/Redis/Elasticsearch/HTTP clients for
+    a single Huey worker. OpenAI clients are pooled per loop by
+    `get_async_openai_client` and closed here with the rest.
+
+    Async clients are bound to the loop they were created on, so each worker
+    owns exactly one loop and one set of clients, created on worker startup and
+    closed on worker shutdown. Tasks submit their coroutine with `run()` rather
+    than calling `asyncio.run`, which would rebuild every connection per job.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.mongo_manager: Optional[MongoManager[TypedAsyncIOMotorDatabase]] = None
+        self.redis_pool: Optional[RedisPool] = None
+        self.es_client: Optional[AsyncElasticsearch] = None
+        self.http_session: Optional[ClientSession] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.mongo_manager is not None
+
+    async def open(self) -> None:
+        """Create the shared clients on the currently running loop."""
+        if self.is_open:
+            return
+
+        mongo_manager = MongoManager[TypedAsyncIOMotorDatabase](mongo_settings)
+        await mongo_manager.connect()
+        self.mongo_manager = mongo_manager
+
+        self.redis_pool = RedisPool()
+
+        self.es_client = create_elasticsearch_client()
+        await check_elasticsearch_connection(self.es_client)
+
+        self.http_session = ClientSession(
+            connector=TCPConnector(
+                limit=worker_settings.worker_http_pool_size,
+                limit_per_host=worker_settings.worker_http_pool_size_per_host,
+            )
+        )
+        logger.info("Worker runtime clients opened")
+
+    async def close(self) -> None:
+        """Close the shared clients. Safe to call more than once."""
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+        if self.es_client is not None:
+            await self.es_client.close()
+            self.es_client = None
+        if self.redis_pool is not None:
+            await self.redis_pool.close()
+            self.redis_pool = None
+        if self.mongo_manager is not None:
+            await self.mongo_manager.close()
+            self.mongo_manager = None
+        await close_async_openai_clients()
+        logger.info("Worker runtime clients closed")
+
+    def start(self) -> None:
+        """Create this worker's event loop and open the shared clients on it."""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.open())
+
+    def stop(self) -> None:
+        if self.loop is None:
+            return
+        try:
+            self.loop.run_until_complete(self.close())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+            self.loop = None
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a task's coroutine to completion on this worker's loop."""
+        if self.loop is None:
+            # e.g. huey.immediate, or a task called outside the consumer
+            self.start()
+        assert self.loop is not None
+        return self.loop.run_until_complete(coro)
+
+    @property
+    def db(self) -> TypedAsyncIOMotorDatabase:
+        assert self.mongo_manager is not None and self.mongo_manager.db is not None
+        return self.mongo_manager.db
+
+    @property
+    def redis_client(self) -> RedisType:
+        assert self.redis_pool is not None
+        return self.redis_pool.client
+
+    @property
+    def elasticsearch(self) -> AsyncElasticsearch:
+        assert self.es_client is not None
+        return self.es_client
+
+    @property
+    def session(self) -> ClientSession:
+        assert self.http_session is not None
+        return self.http_session
+
+
+# Huey's startup/shutdown hooks run inside each worker's own thread (or process),
+# so a thread-local gives every worker its own runtime.
+_local = threading.local()
+
+
+def get_worker_runtime() -> WorkerRuntime:
+    runtime: Optional[WorkerRuntime] = getattr(_local, "runtime", None)
+    if runtime is None:
+        runtime = WorkerRuntime()
+        _local.runtime = runtime
+    return runtime
+
+
+def run_in_worker(coro: Coroutine[Any, Any, T]) -> T:
+    return get_worker_runtime().run(coro)
+
+
+@huey.on_startup()
+def start_worker_runtime():
+    get_worker_runtime().start()
+
+
+@huey.on_shutdown()
+def stop_worker_runtime():
+    get_worker_runtime().stop()
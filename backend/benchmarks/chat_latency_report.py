@@ -0,0 +1,34 @@
+"""
+Chat reply latency per chat mode (assistant runs vs. retrieval over the
+document's indexed chunks), as recorded by the chat workers in Redis.
+
+Run from the backend directory:
+
+    python -m benchmarks.chat_latency_report
+"""
+
+import asyncio
+
+from config.redis import redis_pool
+from services.chat_latency import read_chat_latency_stats
+
+METRICS = ("retrieval_ms", "first_token_ms", "total_ms")
+
+
+async def main():
+    try:
+        stats = await read_chat_latency_stats(await redis_pool.get_client())
+    finally:
+        await redis_pool.close()
+
+    print(f"{'mode':<10} {'replies':>8}" + "".join(f" {m:>16}" for m in METRICS))
+    for mode, mode_stats in sorted(stats.items()):
+        row = f"{mode:<10} {mode_stats['replies']:>8,.0f}"
+        for metric in METRICS:
+            mean = mode_stats.get(f"mean_{metric}")
+            row += f" {'-' if mean is None else f'{mean:,.0f}':>16}"
+        print(row)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Messages per second, on one core, for the CPU work of forwarding a progress
+event from Redis to a websocket: before (validate, parse and re-encode with
+the json module) and after (`progress_event_message`, no parse).
+
+Run from the backend directory:
+
+    python -m benchmarks.progress_forwarding_benchmark [--messages N]
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import orjson
+
+from utils.progress_updater import progress_event_message
+from utils.valid_json import is_valid_json
+
+
+def make_events(count: int) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+    """Stream entries shaped like a streamed chat reply's progress events."""
+    events: List[Tuple[bytes, Dict[bytes, bytes]]] = []
+    for i in range(count):
+        event = {
+            "connection_id": "66f1c0ffee0ddba11c0ffee0",
+            "status": "IN_PROGRESS",
+            "progress": 50,
+            "payload": {"newText": f"token {i} of a coalesced chunk of streamed text "},
+        }
+        events.append(
+            (
+                f"1727000000000-{i}".encode(),
+                {b"status": b"IN_PROGRESS", b"data": orjson.dumps(event)},
+            )
+        )
+    return events
+
+
+def forward_before(stream_id: bytes, fields: Dict[bytes, bytes]) -> Tuple[str, Any]:
+    # The former RedisSubscriber.process_message: is_valid_json, json.loads
+    # and json.dumps of every message.
+    data = fields[b"data"]
+    if not is_valid_json(data):
+        raise ValueError("invalid")
+    event = json.loads(data)
+    event["stream_id"] = stream_id.decode()
+    event["channel"] = "chat"
+    return json.dumps(event), event["status"]
+
+
+def forward_after(stream_id: bytes, fields: Dict[bytes, bytes]) -> Tuple[str, Any]:
+    return progress_event_message(stream_id, fields, "chat")
+
+
+def measure(
+    forward: Callable[[bytes, Dict[bytes, bytes]], Tuple[str, Any]],
+    events: List[Tuple[bytes, Dict[bytes, bytes]]],
+    rounds: int,
+) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.process_time()
+        for stream_id, fields in events:
+            forward(stream_id, fields)
+        best = min(best, time.process_time() - started)
+    return len(events) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    events = make_events(args.messages)
+    before = measure(forward_before, events, args.rounds)
+    after = measure(forward_after, events, args.rounds)
+    print(f"before: {before:>12,.0f} msg/s per core")
+    print(f"after:  {after:>12,.0f} msg/s per core ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
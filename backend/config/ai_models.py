@@ -31,6 +31,11 @@ class AssistantConfig(TypedDict):
 
 ModelName = Literal["gpt-4o-mini"]
 
+# How chat replies are produced: an OpenAI Assistant run with file_search over
+# the uploaded file, or a chat completion over the document's chunks retrieved
+# from Elasticsearch.
+ChatMode = Literal["assistant", "retrieval"]
+
 
 class ModelPairConfig(TypedDict):
     model_name: ModelName
@@ -39,6 +44,7 @@ class ModelPairConfig(TypedDict):
     processing: ProcessingConfig
     pinecone: PineconeConfig
     assistant: AssistantConfig
+    chat_mode: ChatMode
 
 
 OPENAI_ASSISTANTS = {
@@ -65,6 +71,7 @@ MODEL_CONFIGS: Dict[str, ModelPairConfig] = {
             "type": "openai",
             "id": OPENAI_ASSISTANTS["gpt-4o-mini"]["assistant_id"],
         },
+        "chat_mode": "assistant",
         "processing": {
             "chunk_size": 1000,  # Chunking max_tokens
             "max_tokens_per_chunk": 512,  # Chunking max_tokens
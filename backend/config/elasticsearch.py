@@ -0,0 +1,46 @@
+from typing import Any, Dict
+from elasticsearch import AsyncElasticsearch
+from config.environment import ElasticsearchSettings
+from config.logger import get_logger
+
+logger = get_logger()
+
+es_settings = ElasticsearchSettings()
+
+
+def create_elasticsearch_client(
+    settings: ElasticsearchSettings = es_settings,
+) -> AsyncElasticsearch:
+    """Build an AsyncElasticsearch client from settings.
+
+    Handles HTTPS connections with the appropriate SSL configuration. The client
+    holds its own connection pool, so callers should create it once and reuse it.
+    """
+    client_kwargs: Dict[str, Any] = {
+        "hosts": [settings.elasticsearch_url],
+        "basic_auth": (
+            settings.elasticsearch_user,
+            settings.elasticsearch_password,
+        ),
+        "verify_certs": settings.elasticsearch_verify_certs,
+        "ssl_show_warn": True,  # Always show SSL warnings for debugging
+    }
+
+    # Add CA certificate path if provided
+    if settings.elasticsearch_ca_certs:
+        client_kwargs["ca_certs"] = settings.elasticsearch_ca_certs
+
+    return AsyncElasticsearch(**client_kwargs)
+
+
+async def check_elasticsearch_connection(es_client: AsyncElasticsearch) -> None:
+    """Log the cluster version, or a warning if it can't be reached yet."""
+    try:
+        info = await es_client.info()
+        logger.info(
+            f"Successfully connected to Elasticsearch: {info['version']['number']}"
+        )
+    except Exception as e:
+        logger.warning(
+            f"Elasticsearch connection warning (will retry operations): {str(e)}"
+        )
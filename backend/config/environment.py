@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing_extensions import Annotated, Optional
+from typing_extensions import Annotated, List, Literal, Optional
 
 
 class AppSettings(BaseSettings):
@@ -20,6 +20,26 @@ class S3Settings(BaseSettings):
         str, "S3 document uploads (public access, e.g., web_captures) bucket"
     ] = ""
     s3_host: Annotated[str, "S3 host"] = ""
+    s3_max_pool_connections: Annotated[
+        int, "Pooled HTTP connections to S3, also the number of threads running S3 calls"
+    ] = 50
+    s3_max_attempts: Annotated[
+        int, "Attempts per S3 request, including the first, for throttling and 5xx errors"
+    ] = 5
+    s3_connect_timeout: Annotated[float, "Seconds to wait for an S3 connection"] = 5.0
+    s3_read_timeout: Annotated[float, "Seconds to wait for S3 to send data"] = 60.0
+
+
+class PresignedUrlSettings(BaseSettings):
+    presigned_url_expires_in: Annotated[
+        int, "Seconds a presigned download URL stays valid"
+    ] = 3600
+    presigned_url_min_remaining: Annotated[
+        int, "Seconds of validity a cached presigned URL must still have when served"
+    ] = 600
+    presigned_url_cache_size: Annotated[
+        int, "Presigned URLs kept in each process's signing cache"
+    ] = 10000
 
 
 class MongoSettings(BaseSettings):
@@ -35,6 +55,16 @@ class PineconeSettings(BaseSettings):
 
 class OpenAISettings(BaseSettings):
     openai_api_key: Annotated[str, "OpenAI API key"] = ""
+    openai_max_connections: Annotated[
+        int, "Pooled HTTP connections per OpenAI client (one client per event loop)"
+    ] = 100
+    openai_max_keepalive_connections: Annotated[
+        int, "Idle OpenAI connections kept open for reuse"
+    ] = 20
+    openai_max_retries: Annotated[
+        int, "SDK retries for rate limits, timeouts and 5xx errors"
+    ] = 3
+    openai_timeout: Annotated[float, "Seconds before an OpenAI request times out"] = 600.0
 
 
 class PopplerSettings(BaseSettings):
@@ -94,3 +124,172 @@ class ElasticsearchSettings(BaseSettings):
         10
     )
     search_min_score: Annotated[float, "Minimum score for search results"] = 0.7
+
+
+class WorkerSettings(BaseSettings):
+    worker_http_pool_size: Annotated[
+        int, "Max open connections in each worker's shared aiohttp session"
+    ] = 100
+    worker_http_pool_size_per_host: Annotated[
+        int, "Max open connections per host in each worker's aiohttp session"
+    ] = 20
+    async_worker_concurrency: Annotated[
+        int, "Max I/O-bound jobs the async consumer runs at once per process"
+    ] = 100
+    cpu_worker_processes: Annotated[
+        int, "Size of the async consumer's process pool for CPU-heavy jobs"
+    ] = 2
+    async_worker_dequeue_timeout: Annotated[
+        int, "Seconds the async consumer blocks on the queue before re-checking"
+    ] = 1
+    docling_warm_up_on_startup: Annotated[
+        bool, "Load Docling models when a worker boots, before it takes jobs"
+    ] = True
+    docling_pool_processes: Annotated[
+        int, "Docling conversion processes per worker process (each loads its own models)"
+    ] = 2
+    docling_conversion_timeout: Annotated[
+        int, "Seconds a single document may spend in Docling conversion"
+    ] = 600
+    docling_page_parallel_min_pages: Annotated[
+        int, "PDFs with at least this many pages are converted in parallel page ranges"
+    ] = 100
+    docling_page_range_size: Annotated[
+        int, "Pages per range when a PDF is converted in parallel"
+    ] = 50
+
+
+class EmbeddingCacheSettings(BaseSettings):
+    embedding_cache_lru_size: Annotated[
+        int, "Embeddings kept in each process's in-memory LRU in front of Redis"
+    ] = 10000
+    embedding_cache_ttl_seconds: Annotated[
+        int, "Expiry of cached embeddings in Redis; 0 keeps them forever"
+    ] = 60 * 60 * 24 * 30
+
+
+class EmbeddingDispatchSettings(BaseSettings):
+    embedding_max_batch_tokens: Annotated[
+        int, "Token budget of a single embeddings request (OpenAI caps it at 300k)"
+    ] = 50000
+    embedding_max_batch_inputs: Annotated[
+        int, "Max texts in a single embeddings request (OpenAI caps it at 2048)"
+    ] = 2048
+    embedding_concurrency: Annotated[
+        int, "Embeddings requests in flight at once per embedding call"
+    ] = 4
+    embedding_tokens_per_minute: Annotated[
+        int, "Embedding tokens per minute allowed per process"
+    ] = 1000000
+    embedding_requests_per_minute: Annotated[
+        int, "Embeddings requests per minute allowed per process"
+    ] = 3000
+    embedding_max_retries: Annotated[
+        int, "Retries for a rate-limited or failed embeddings request"
+    ] = 6
+
+
+class IngestionPipelineSettings(BaseSettings):
+    ingestion_queue_size: Annotated[
+        int, "Chunks buffered between each stage of the streaming indexing pipeline"
+    ] = 256
+    ingestion_embed_workers: Annotated[
+        int, "Concurrent embedding workers in the streaming indexing pipeline"
+    ] = 2
+    ingestion_embed_batch_size: Annotated[
+        int, "Max chunks an embedding worker takes from the queue at once"
+    ] = 64
+    ingestion_bulk_size: Annotated[
+        int, "Chunks per batch written to the vector sinks"
+    ] = 200
+    ingestion_bulk_flush_interval: Annotated[
+        float, "Seconds a partial bulk request may wait for more chunks"
+    ] = 1.0
+    ingestion_vector_sinks: Annotated[
+        List[str], "Vector stores chunks are written to: elasticsearch, pinecone"
+    ] = ["elasticsearch", "pinecone"]
+    ingestion_source_memory_limit: Annotated[
+        int, "Bytes of a downloaded file held in memory per job before spilling to disk"
+    ] = 32 * 1024 * 1024
+    ingestion_retries: Annotated[
+        int, "Times a failed ingestion is retried, resuming from its checkpoints"
+    ] = 2
+    ingestion_retry_delay: Annotated[
+        int, "Seconds to wait before retrying a failed ingestion"
+    ] = 60
+
+
+class ProgressStreamSettings(BaseSettings):
+    progress_stream_flush_interval: Annotated[
+        float, "Seconds streamed text deltas are coalesced before being published"
+    ] = 0.04
+    progress_stream_max_chars: Annotated[
+        int, "Buffered characters that force a streamed text flush before the interval"
+    ] = 512
+    progress_stream_maxlen: Annotated[
+        int, "Approximate number of progress events kept per job stream"
+    ] = 1000
+    progress_stream_ttl: Annotated[
+        int, "Seconds a job's progress stream is kept after its last event"
+    ] = 24 * 60 * 60
+    progress_stream_block_ms: Annotated[
+        int, "Milliseconds the progress stream reader blocks waiting for events"
+    ] = 100
+    progress_stream_read_count: Annotated[
+        int, "Max events read from each progress stream per read"
+    ] = 100
+
+
+class WebSocketSettings(BaseSettings):
+    websocket_node_id: Annotated[
+        Optional[str], "ID of this API node in the connection registry; host:pid if unset"
+    ] = None
+    websocket_registry_ttl: Annotated[
+        int, "Seconds a node's claim on a websocket connection lasts without refresh"
+    ] = 60
+    websocket_registry_refresh_interval: Annotated[
+        float, "Seconds between a node refreshing the connections it holds"
+    ] = 20.0
+    websocket_send_queue_size: Annotated[
+        int, "Messages buffered per websocket before the queue-full policy applies"
+    ] = 1024
+    websocket_queue_full_policy: Annotated[
+        Literal["drop_progress", "disconnect"],
+        "On a full send queue: drop the oldest non-terminal progress message, or disconnect the client",
+    ] = "drop_progress"
+    websocket_send_timeout: Annotated[
+        float, "Seconds a single websocket send may take before the client is dropped"
+    ] = 10.0
+    websocket_max_subscriptions: Annotated[
+        int, "Topics a single multiplexed session websocket may subscribe to"
+    ] = 64
+
+
+class ChatRoutingCacheSettings(BaseSettings):
+    chat_routing_cache_ttl_seconds: Annotated[
+        int, "Expiry of cached assistant/chat/conversation IDs per document and model"
+    ] = 60 * 60
+
+
+class RetrievalChatSettings(BaseSettings):
+    retrieval_chat_top_k: Annotated[
+        int, "Chunks given to the model as context for a retrieval chat reply"
+    ] = 8
+    retrieval_chat_search_size: Annotated[
+        int, "Hits taken from each of the kNN and BM25 searches before fusing them"
+    ] = 20
+    retrieval_chat_num_candidates: Annotated[
+        int, "Nearest-neighbour candidates the kNN search considers per shard"
+    ] = 100
+    retrieval_chat_rrf_k: Annotated[
+        int, "Rank constant of the reciprocal rank fusion of kNN and BM25 hits"
+    ] = 60
+    retrieval_chat_history_messages: Annotated[
+        int, "Earlier messages of the conversation sent along with the question"
+    ] = 10
+
+
+class SummaryCacheSettings(BaseSettings):
+    summary_cache_ttl_seconds: Annotated[
+        int, "Expiry of cached chunk and document summaries in MongoDB"
+    ] = 60 * 60 * 24 * 90
@@ -5,8 +5,10 @@ from motor.motor_asyncio import (
 )
 from config.environment import MongoSettings
 from db.models.document_uploads import MongoDocumentUpload
-from db.models.chat import MongoChat
+from db.models.chat import MongoChat, MongoChatMessageBucket
 from db.models.user import MongoUser
+from db.models.content_cache import MongoContentCacheEntry, MongoContentCacheChunk
+from db.models.summary_cache import MongoChunkSummary, MongoDocumentSummary
 
 from typing import Optional, TypeVar, Generic, Dict, Any, AsyncIterator, cast
 
@@ -24,7 +26,12 @@ class TypedAsyncIOMotorDatabase(AsyncIOMotorDatabase):
     # List the collections in the database here
     document_uploads: AsyncIOMotorCollection[MongoDocumentUpload]
     chats: AsyncIOMotorCollection[MongoChat]
+    chat_message_buckets: AsyncIOMotorCollection[MongoChatMessageBucket]
     users: AsyncIOMotorCollection[MongoUser]
+    content_cache: AsyncIOMotorCollection[MongoContentCacheEntry]
+    content_cache_chunks: AsyncIOMotorCollection[MongoContentCacheChunk]
+    chunk_summaries: AsyncIOMotorCollection[MongoChunkSummary]
+    document_summaries: AsyncIOMotorCollection[MongoDocumentSummary]
 
 
 DBType = TypeVar("DBType", bound=TypedAsyncIOMotorDatabase)
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import weakref
+from typing import Dict
+
+import httpx
+from openai import AsyncOpenAI
+
+from config.environment import OpenAISettings
+
+openai_settings = OpenAISettings()
+
+# httpx connection pools are bound to the loop they were first used on, so each
+# loop (the API's, and each worker thread's) gets its own client and pool.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+
+
+def get_async_openai_client(
+    api_key: str = openai_settings.openai_api_key,
+) -> AsyncOpenAI:
+    """The shared AsyncOpenAI client for the running loop and API key."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None or client.is_closed():
+            client = AsyncOpenAI(
+                api_key=api_key,
+                max_retries=openai_settings.openai_max_retries,
+                timeout=openai_settings.openai_timeout,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=openai_settings.openai_max_connections,
+                        max_keepalive_connections=openai_settings.openai_max_keepalive_connections,
+                    ),
+                    timeout=openai_settings.openai_timeout,
+                    follow_redirects=True,
+                ),
+            )
+            clients[api_key] = client
+        return client
+
+
+async def close_async_openai_clients() -> None:
+    """Close the running loop's clients; call before the loop shuts down."""
+    with _clients_lock:
+        clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
@@ -46,6 +46,9 @@ class PubSubConfig:
     def get_channel_name(self, channel: PubSubChannel) -> str:
         return channel.value
 
+    def get_stream_name(self, channel: PubSubChannel, connection_id: str) -> str:
+        return f"progress:{channel.value}:{connection_id}"
+
     def get_channel_config(self, channel: PubSubChannel) -> Dict[str, Any]:
         return self.channels[channel]
 
@@ -1,3 +1,10 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, Optional, TypeVar
+
 import boto3
 from botocore.client import Config
 from config.environment import S3Settings
@@ -7,10 +14,92 @@ from mypy_boto3_s3.client import (
 
 s3_settings: S3Settings = S3Settings()
 
+T = TypeVar("T")
+
 s3_client: S3Client = boto3.client(  # type: ignore
     "s3",
     aws_access_key_id=s3_settings.s3_access_key,
     aws_secret_access_key=s3_settings.s3_secret_key,
     region_name=s3_settings.s3_region,
-    config=Config(signature_version="s3v4"),
+    config=Config(
+        signature_version="s3v4",
+        max_pool_connections=s3_settings.s3_max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=s3_settings.s3_connect_timeout,
+        read_timeout=s3_settings.s3_read_timeout,
+        retries={"max_attempts": s3_settings.s3_max_attempts, "mode": "standard"},
+    ),
 )
+
+
+class AsyncS3Client:
+    """
+    Awaitable S3 calls for code running on an event loop.
+
+    boto3 clients are thread-safe and pool their HTTP connections, so each call
+    runs the shared client on a dedicated thread pool with one thread per
+    pooled connection: S3 latency never blocks the loop, and concurrent calls
+    reuse warm connections instead of queueing behind each other or opening
+    new ones. The pool is created lazily per process, so forked workers get
+    their own.
+    """
+
+    def __init__(self, client: S3Client, max_workers: int):
+        self.client = client
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="s3"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run any blocking S3 work (e.g. reading a streaming body) on the S3 threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(fn, *args, **kwargs)
+        )
+
+    async def head_object(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self.run(self.client.head_object, **kwargs)
+
+    async def get_object(self, **kwargs: Any) -> Dict[str, Any]:
+        """The response's `Body` is a blocking stream; read it with `run`."""
+        return await self.run(self.client.get_object, **kwargs)
+
+    async def get_object_bytes(self, bucket: str, key: str) -> bytes:
+        def read() -> bytes:
+            return self.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+        return await self.run(read)
+
+    async def put_object(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self.run(self.client.put_object, **kwargs)
+
+    async def download_file(self, bucket: str, key: str, file_path: str) -> None:
+        await self.run(self.client.download_file, bucket, key, file_path)
+
+    async def download_fileobj(self, bucket: str, key: str, fileobj: IO[bytes]) -> None:
+        await self.run(
+            self.client.download_fileobj, Bucket=bucket, Key=key, Fileobj=fileobj
+        )
+
+    async def create_multipart_upload(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self.run(self.client.create_multipart_upload, **kwargs)
+
+    async def complete_multipart_upload(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self.run(self.client.complete_multipart_upload, **kwargs)
+
+    def generate_presigned_url(self, *args: Any, **kwargs: Any) -> str:
+        # Signing is local computation, no request is made
+        return self.client.generate_presigned_url(*args, **kwargs)
+
+
+async_s3_client = AsyncS3Client(s3_client, s3_settings.s3_max_pool_connections)
@@ -1,7 +1,10 @@
+from uuid import uuid4
 from bson import ObjectId
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from config.mongo import get_db, TypedAsyncIOMotorDatabase
+from config.redis import RedisType
+from api.utils.auth_helper import get_redis_client
 from config.ai_models import ModelName
 from motor.motor_asyncio import AsyncIOMotorCollection
 from db.models.document_uploads import MongoDocumentUpload
@@ -9,6 +12,8 @@ from services.chat_message_service import ChatMessageService
 from background.huey_jobs.summarize_document_job import summarize_document
 from background.huey_jobs.explain_text_job import explain_text
 from background.huey_jobs.chat_job import chat_with_rag
+from background.subscribers.redis_subscriber import SOCKET_PREFIX_TO_CHANNEL_MAP
+from utils.progress_updater import get_latest_progress
 from api.requests.ai import SummarizeRequest, ExplainRequest, ChatRequest
 from api.responses.ai import ChatHistoryResponse, ChatMessageResponse
 
@@ -31,8 +36,13 @@ async def create_summary(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    summarize_document(document_upload_id=document_upload_id, model_name=request.model)
-    return {"message": "Summary task started"}
+    job_id = uuid4().hex
+    summarize_document(
+        document_upload_id=document_upload_id,
+        model_name=request.model,
+        job_id=job_id,
+    )
+    return {"message": "Summary task started", "job_id": job_id}
 
 
 @router.post("/documents/{document_upload_id}/explanation")
@@ -50,12 +60,14 @@ async def create_explanation(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    job_id = uuid4().hex
     explain_text(
         document_upload_id=document_upload_id,
         highlighted_text=request.highlighted_text,
         model_name=request.model,
+        job_id=job_id,
     )
-    return {"message": "Explanation task started"}
+    return {"message": "Explanation task started", "job_id": job_id}
 
 
 @router.post("/documents/{document_upload_id}/chat/messages")
@@ -73,12 +85,14 @@ async def create_chat_message(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    job_id = uuid4().hex
     chat_with_rag(
         document_upload_id=document_upload_id,
         message_content=request.message_content,
         model_name=request.model,
+        job_id=job_id,
     )
-    return {"message": "Chat task started"}
+    return {"message": "Chat task started", "job_id": job_id}
 
 
 @router.get(
@@ -119,3 +133,26 @@ async def get_chat_messages(
         ],
         next_before=next_before,
     )
+
+
+@router.get("/documents/{document_upload_id}/progress/{task}")
+async def get_latest_task_progress(
+    document_upload_id: str,
+    task: str,
+    job_id: Optional[str] = Query(None),
+    redis: RedisType = Depends(get_redis_client),
+):
+    """
+    The last progress event of a task (document_upload, summary, explain_text or
+    chat), so a finished result can be read back without rerunning the task.
+    With `job_id` (as returned when the task was started) it is that job's last
+    event, otherwise the latest job's.
+    """
+    channel = SOCKET_PREFIX_TO_CHANNEL_MAP.get(task)
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Unknown task")
+
+    event = await get_latest_progress(redis, channel, document_upload_id, job_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="No progress recorded")
+    return event
@@ -1,6 +1,6 @@
 import traceback
 from fastapi import APIRouter, HTTPException, Body, Depends, Query
-from typing import Optional, List, Any, Union, Dict
+from typing import Optional, List, Any, Union, Dict, Tuple
 from bson import ObjectId
 from db.models.document_uploads import (
     MongoDocumentUpload,
@@ -35,9 +35,10 @@ from config.mongo import get_db, TypedAsyncIOMotorDatabase
 from motor.motor_asyncio import AsyncIOMotorCollection
 from pymongo.results import InsertOneResult
 from pymongo.errors import DuplicateKeyError
-from config.s3 import s3_client, S3Client
+from config.s3 import async_s3_client, AsyncS3Client
+from services.presigned_url_cache import presigned_url_cache
 from config.logger import get_logger
-from background.huey_jobs.process_document_job import process_document
+from background.huey_jobs.ingest_document_job import ingest_document
 from api.utils.auth_helper import get_current_user
 from db.models.user import MongoUser
 
@@ -112,7 +113,7 @@ async def upload_document(
 
         # Verify s3_url is valid
         if not await verify_s3_object(
-            s3_client, s3_settings.s3_document_bucket, reqBody.file_key
+            async_s3_client, s3_settings.s3_document_bucket, reqBody.file_key
         ):
             raise HTTPException(status_code=404, detail="File not found")
 
@@ -154,25 +155,13 @@ async def upload_document(
             note=None,
             directory_id=directory_id,
             directory_path=directory_path,
+            content_hash=None,
+            ingestion=None,
         )
 
-        # Kick off background jobs to process document
-
-        # Existing processor
-        process_document(document_id=str(doc_id))
-
-        # NEW: Add Docling processor for academic papers
-        # Only process PDFs and certain document types with Docling
-        if reqBody.file_type.lower() in [
-            "application/pdf",
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        ]:
-            from background.huey_jobs.process_document_v2_job import (
-                process_document_with_docling,
-            )
-
-            process_document_with_docling(document_id=str(doc_id))
-            logger.info(f"Scheduled Docling processing for document: {doc_id}")
+        # Kick off the ingestion pipeline: chunking, embedding, vector sinks,
+        # assistant thread and thumbnail in one resumable job
+        ingest_document(document_id=str(doc_id))
 
         try:
             result: InsertOneResult = await collection.insert_one(document)
@@ -247,7 +236,7 @@ async def get_document(
             else:
                 # Generate pre-signed URL
                 presigned_url = generate_presigned_url(
-                    document["file_details"], s3_client
+                    document["file_details"], async_s3_client
                 )
         except Exception as e:
             raise HTTPException(
@@ -343,9 +332,13 @@ async def get_document_uploads(
             next_cursor = str(documents[-1]["_id"])
             documents = documents[:limit]
 
+        # Sign the whole page's thumbnails at once
+        thumbnail_urls = generate_presigned_urls(
+            [doc.get("thumbnail", {}) for doc in documents], async_s3_client
+        )
+
         response_documents: List[DocumentRetrieveResponseForPage] = []
-        for doc in documents:
-            presigned_url = generate_presigned_url(doc.get("thumbnail", {}), s3_client)
+        for doc, presigned_url in zip(documents, thumbnail_urls):
             display_title = get_display_title(doc)
 
             response_doc = DocumentRetrieveResponseForPage(
@@ -385,30 +378,49 @@ async def get_document_uploads(
 
 
 def generate_presigned_url(
-    file_details: Union[MongoFileDetails, ThumbnailDetails, None], s3_client: S3Client
+    file_details: Union[MongoFileDetails, ThumbnailDetails, None],
+    s3_client: AsyncS3Client,
 ) -> str:
-    # conditional checks because file/thumbnail details are generated in the background and may not
-    # yet be present when this function is called
-    if file_details is None:
-        return ""
-    if "s3_bucket" not in file_details or "file_key" not in file_details:
-        return ""
-    try:
+    return generate_presigned_urls([file_details], s3_client)[0]
+
+
+def generate_presigned_urls(
+    file_details_list: List[Union[MongoFileDetails, ThumbnailDetails, None]],
+    s3_client: AsyncS3Client,
+) -> List[str]:
+    """Presigned URLs for a page of files in one pass through the signing cache."""
+    urls = [""] * len(file_details_list)
+    to_sign: List[int] = []
+    objects: List[Tuple[str, str]] = []
+    for i, file_details in enumerate(file_details_list):
+        # conditional checks because file/thumbnail details are generated in the background and may not
+        # yet be present when this function is called
+        if file_details is None:
+            continue
+        if "s3_bucket" not in file_details or "file_key" not in file_details:
+            continue
         if file_details["s3_bucket"] == AllowedS3Buckets.PUBLIC_BUCKET.value:
-            return file_details["s3_url"]
+            urls[i] = file_details["s3_url"]
         else:
-            return s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": file_details["s3_bucket"],
-                    "Key": file_details["file_key"],
-                },
-                ExpiresIn=3600,
-            )
+            to_sign.append(i)
+            objects.append((file_details["s3_bucket"], file_details["file_key"]))
+
+    if not to_sign:
+        return urls
+    try:
+        signed, stats = presigned_url_cache.presign_many(s3_client, objects)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating pre-signed URL: {str(e)}"
         )
+    for i, url in zip(to_sign, signed):
+        urls[i] = url
+
+    if stats.requested > 1:
+        logger.info(
+            f"Presigned {stats.requested} URLs: {stats.hits} cached, {stats.signed} signed in {stats.signing_seconds * 1000:.1f}ms, ~{stats.saved_seconds * 1000:.1f}ms saved"
+        )
+    return urls
 
 
 @router.put("/document-uploads/{document_upload_id}/note", response_model=NoteResponse)
@@ -563,7 +575,7 @@ async def update_document(
                 presigned_url = document["file_details"]["s3_url"]
             else:
                 presigned_url = generate_presigned_url(
-                    document["file_details"], s3_client
+                    document["file_details"], async_s3_client
                 )
         except Exception as e:
             raise HTTPException(
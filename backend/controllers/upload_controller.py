@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Path
 from bson import ObjectId
-from config.s3 import s3_client
+from config.s3 import async_s3_client
 from config.environment import S3Settings
 from api.requests.upload import (
     InitiateMultipartUploadRequest,
@@ -21,7 +21,7 @@ async def initiate_multipart_upload(request: InitiateMultipartUploadRequest):
     try:
         url_friendly_file_name = make_url_friendly(request.file_name)
         file_key = f"document_uploads/{ObjectId()}-{url_friendly_file_name}"
-        response = s3_client.create_multipart_upload(
+        response = await async_s3_client.create_multipart_upload(
             Bucket=settings.s3_document_bucket,
             Key=file_key,
             ContentType=request.file_type,
@@ -36,7 +36,7 @@ async def initiate_multipart_upload(request: InitiateMultipartUploadRequest):
 @router.post("/upload-url/", response_model=GetUploadUrlResponse)
 async def get_upload_url(request: GetUploadUrlRequest):
     try:
-        url = s3_client.generate_presigned_url(
+        url = async_s3_client.generate_presigned_url(
             "upload_part",
             Params={
                 "Bucket": settings.s3_document_bucket,
@@ -59,7 +59,7 @@ async def complete_multipart_upload(
     ],
 ):
     try:
-        s3_client.complete_multipart_upload(
+        await async_s3_client.complete_multipart_upload(
             Bucket=settings.s3_document_bucket,
             Key=request.file_key,
             UploadId=upload_id,
@@ -1,20 +1,90 @@
 # websocket_router.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+import json
+from typing import Any, Dict, Optional, Set, Tuple
+from uuid import uuid4
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from services.websocket_manager import get_websocket_manager, WebSocketManager
+from background.subscribers.redis_subscriber import (
+    RedisSubscriber,
+    SOCKET_PREFIX_TO_CHANNEL_MAP,
+)
+from config.environment import WebSocketSettings
 from config.logger import get_logger, logging
 
 router = APIRouter()
+websocket_settings = WebSocketSettings()
+
+
+def get_redis_subscriber(websocket: WebSocket) -> RedisSubscriber:
+    return websocket.app.state.redis_subscriber
+
+
+async def attach_progress(
+    redis_subscriber: RedisSubscriber,
+    document_upload_id: str,
+    prefix: str,
+    last_event_id: Optional[str],
+    logger: logging.Logger,
+    socket_key: Optional[str] = None,
+    job_id: Optional[str] = None,
+):
+    """
+    Forward a job's progress to a socket, its own `prefix:document_upload_id`
+    socket unless `socket_key` names a session socket. With `job_id`, only that
+    job's events are replayed.
+    """
+    if socket_key is None:
+        await redis_subscriber.claim(f"{prefix}:{document_upload_id}")
+    try:
+        await redis_subscriber.attach(
+            document_upload_id, prefix, last_event_id, socket_key, job_id
+        )
+    except ValueError:
+        logger.warning(
+            f"Ignoring invalid last_event_id={last_event_id} for {prefix}:{document_upload_id}"
+        )
+        await redis_subscriber.attach(
+            document_upload_id, prefix, None, socket_key, job_id
+        )
+
+
+async def detach_progress(
+    redis_subscriber: RedisSubscriber,
+    websocket_manager: WebSocketManager,
+    websocket: WebSocket,
+    document_upload_id: str,
+    prefix: str,
+):
+    """
+    Tear down a per-document socket when its handler exits. Each step is a
+    no-op if the client has already reconnected and `websocket` was replaced,
+    so a stale handler can't close the new socket or drop its subscription.
+    """
+    await redis_subscriber.detach(document_upload_id, prefix, websocket=websocket)
+    await redis_subscriber.release(f"{prefix}:{document_upload_id}", websocket)
+    await websocket_manager.disconnect(document_upload_id, prefix, websocket=websocket)
 
 
 @router.websocket("/ws/document-upload/{document_upload_id}")
 async def document_upload_websocket_endpoint(
     websocket: WebSocket,
     document_upload_id: str,
+    last_event_id: Optional[str] = Query(None),
+    job_id: Optional[str] = Query(None),
     websocket_manager: WebSocketManager = Depends(get_websocket_manager),
+    redis_subscriber: RedisSubscriber = Depends(get_redis_subscriber),
     logger: logging.Logger = Depends(get_logger),
 ):
     await websocket_manager.connect(websocket, document_upload_id, "document_upload")
     try:
+        await attach_progress(
+            redis_subscriber,
+            document_upload_id,
+            "document_upload",
+            last_event_id,
+            logger,
+            job_id=job_id,
+        )
         while True:
             # data = await websocket.receive_text()
             await websocket.receive_text()
@@ -24,18 +94,35 @@ async def document_upload_websocket_endpoint(
             f"/ws/document-upload/{document_upload_id}  --  Connection for document_upload={document_upload_id} disconnected"
         )
     finally:
-        await websocket_manager.disconnect(document_upload_id, "document_upload")
+        await detach_progress(
+            redis_subscriber,
+            websocket_manager,
+            websocket,
+            document_upload_id,
+            "document_upload",
+        )
 
 
 @router.websocket("/ws/document-upload/{document_upload_id}/summary")
 async def summarize_websocket_endpoint(
     websocket: WebSocket,
     document_upload_id: str,
+    last_event_id: Optional[str] = Query(None),
+    job_id: Optional[str] = Query(None),
     websocket_manager: WebSocketManager = Depends(get_websocket_manager),
+    redis_subscriber: RedisSubscriber = Depends(get_redis_subscriber),
     logger: logging.Logger = Depends(get_logger),
 ):
     await websocket_manager.connect(websocket, document_upload_id, "summary")
     try:
+        await attach_progress(
+            redis_subscriber,
+            document_upload_id,
+            "summary",
+            last_event_id,
+            logger,
+            job_id=job_id,
+        )
         while True:
             # data = await websocket.receive_text()
             await websocket.receive_text()
@@ -45,18 +132,35 @@ async def summarize_websocket_endpoint(
             f"/ws/document-upload/{document_upload_id}/summary  --  Connection for summary of document_upload={document_upload_id} disconnected"
         )
     finally:
-        await websocket_manager.disconnect(document_upload_id, "summary")
+        await detach_progress(
+            redis_subscriber,
+            websocket_manager,
+            websocket,
+            document_upload_id,
+            "summary",
+        )
 
 
 @router.websocket("/ws/document-upload/{document_upload_id}/text-explanation")
 async def text_explanation_websocket_endpoint(
     websocket: WebSocket,
     document_upload_id: str,
+    last_event_id: Optional[str] = Query(None),
+    job_id: Optional[str] = Query(None),
     websocket_manager: WebSocketManager = Depends(get_websocket_manager),
+    redis_subscriber: RedisSubscriber = Depends(get_redis_subscriber),
     logger: logging.Logger = Depends(get_logger),
 ):
     await websocket_manager.connect(websocket, document_upload_id, "explain_text")
     try:
+        await attach_progress(
+            redis_subscriber,
+            document_upload_id,
+            "explain_text",
+            last_event_id,
+            logger,
+            job_id=job_id,
+        )
         while True:
             # data = await websocket.receive_text()
             await websocket.receive_text()
@@ -66,18 +170,35 @@ async def text_explanation_websocket_endpoint(
             f"/ws/document-upload/{document_upload_id}/text-explanation  --  Connection for explain text socket of document_upload={document_upload_id} disconnected"
         )
     finally:
-        await websocket_manager.disconnect(document_upload_id, "summary")
+        await detach_progress(
+            redis_subscriber,
+            websocket_manager,
+            websocket,
+            document_upload_id,
+            "explain_text",
+        )
 
 
 @router.websocket("/ws/document-upload/{document_upload_id}/chat")
 async def chat_websocket_endpoint(
     websocket: WebSocket,
     document_upload_id: str,
+    last_event_id: Optional[str] = Query(None),
+    job_id: Optional[str] = Query(None),
     websocket_manager: WebSocketManager = Depends(get_websocket_manager),
+    redis_subscriber: RedisSubscriber = Depends(get_redis_subscriber),
     logger: logging.Logger = Depends(get_logger),
 ):
     await websocket_manager.connect(websocket, document_upload_id, "chat")
     try:
+        await attach_progress(
+            redis_subscriber,
+            document_upload_id,
+            "chat",
+            last_event_id,
+            logger,
+            job_id=job_id,
+        )
         while True:
             # data = await websocket.receive_text()
             await websocket.receive_text()
@@ -87,4 +208,107 @@ async def chat_websocket_endpoint(
             f"/ws/document-upload/{document_upload_id}/chat  --  Connection for chat socket of document_upload={document_upload_id} disconnected"
         )
     finally:
-        await websocket_manager.disconnect(document_upload_id, "summary")
+        await detach_progress(
+            redis_subscriber,
+            websocket_manager,
+            websocket,
+            document_upload_id,
+            "chat",
+        )
+
+
+async def handle_session_frame(
+    frame: Dict[str, Any],
+    session_key: str,
+    subscriptions: Set[Tuple[str, str]],
+    redis_subscriber: RedisSubscriber,
+    logger: logging.Logger,
+) -> Dict[str, Any]:
+    action = frame.get("action")
+    document_upload_id = frame.get("document_upload_id")
+    channel = frame.get("channel")
+    topic = {"document_upload_id": document_upload_id, "channel": channel}
+    if action not in ("subscribe", "unsubscribe"):
+        return {"type": "error", "detail": f"Unknown action: {action}", **topic}
+    if not isinstance(document_upload_id, str) or not document_upload_id:
+        return {"type": "error", "detail": "document_upload_id is required", **topic}
+    if channel not in SOCKET_PREFIX_TO_CHANNEL_MAP:
+        return {"type": "error", "detail": f"Unknown channel: {channel}", **topic}
+
+    subscription = (document_upload_id, channel)
+    if action == "unsubscribe":
+        if subscription in subscriptions:
+            subscriptions.discard(subscription)
+            await redis_subscriber.detach(document_upload_id, channel, session_key)
+        return {"type": "unsubscribed", **topic}
+
+    if subscription not in subscriptions:
+        if len(subscriptions) >= websocket_settings.websocket_max_subscriptions:
+            return {"type": "error", "detail": "Too many subscriptions", **topic}
+        subscriptions.add(subscription)
+    job_id = frame.get("job_id")
+    await attach_progress(
+        redis_subscriber,
+        document_upload_id,
+        channel,
+        frame.get("last_event_id"),
+        logger,
+        socket_key=session_key,
+        job_id=job_id if isinstance(job_id, str) else None,
+    )
+    return {"type": "subscribed", **topic}
+
+
+@router.websocket("/ws/session")
+async def session_websocket_endpoint(
+    websocket: WebSocket,
+    session_id: Optional[str] = Query(None),
+    websocket_manager: WebSocketManager = Depends(get_websocket_manager),
+    redis_subscriber: RedisSubscriber = Depends(get_redis_subscriber),
+    logger: logging.Logger = Depends(get_logger),
+):
+    """
+    One socket carrying the progress of any number of (document, channel)
+    topics. The client sends
+    `{"action": "subscribe" | "unsubscribe", "document_upload_id", "channel",
+    "last_event_id"?, "job_id"?}` frames, where channel is document_upload,
+    summary, explain_text or chat. Each is acknowledged, and progress messages
+    carry their `connection_id`, `job_id` and `channel`. Reconnecting with the
+    `session_id` from the opening frame keeps the session's identity across
+    nodes.
+    """
+    session_id = session_id or uuid4().hex
+    session_key = websocket_manager.connection_key(session_id, "session")
+    subscriptions: Set[Tuple[str, str]] = set()
+    await websocket_manager.connect(websocket, session_id, "session")
+    try:
+        await redis_subscriber.claim(session_key)
+        await websocket_manager.send_to(
+            session_key, json.dumps({"type": "session", "session_id": session_id})
+        )
+        while True:
+            data = await websocket.receive_text()
+            try:
+                frame = json.loads(data)
+            except json.JSONDecodeError:
+                frame = None
+            if not isinstance(frame, dict):
+                reply: Dict[str, Any] = {"type": "error", "detail": "Invalid frame"}
+            else:
+                reply = await handle_session_frame(
+                    frame,
+                    session_key,
+                    subscriptions,
+                    redis_subscriber,
+                    logger,
+                )
+            await websocket_manager.send_to(session_key, json.dumps(reply))
+    except WebSocketDisconnect:
+        logger.info(
+            f"/ws/session  --  Session {session_id} with {len(subscriptions)} subscriptions disconnected"
+        )
+    finally:
+        # A reconnect with this session_id may have replaced the socket already
+        await redis_subscriber.detach_socket(session_key, websocket)
+        await redis_subscriber.release(session_key, websocket)
+        await websocket_manager.disconnect(session_id, "session", websocket=websocket)
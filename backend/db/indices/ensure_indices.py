@@ -2,6 +2,7 @@ import asyncio
 from typing import Any, List, Coroutine
 from pymongo import IndexModel, ASCENDING, DESCENDING
 from pymongo.errors import PyMongoError
+from config.environment import SummaryCacheSettings
 from config.mongo import (
     TypedAsyncIOMotorDatabase,
     AsyncIOMotorCollection,
@@ -35,10 +36,9 @@ async def ensure_indices(db: TypedAsyncIOMotorDatabase):
             [
                 ("document_upload_id", ASCENDING),
                 ("model_name", ASCENDING),
-                ("messages.created_at", DESCENDING),
             ],
             background=True,
-            name="chats_document_model_message_date",
+            name="chats_document_model",
         ),
         # Add more indices for other collections as needed
     ]
@@ -47,6 +47,80 @@ async def ensure_indices(db: TypedAsyncIOMotorDatabase):
     for index in indices:
         tasks.append(create_index_with_logging(db.chats, index))
 
+    # Content cache chunks are read back in order per (content, chunker, model)
+    tasks.append(
+        create_index_with_logging(
+            db.content_cache_chunks,
+            IndexModel(
+                [
+                    ("content_hash", ASCENDING),
+                    ("chunker", ASCENDING),
+                    ("embedding_model", ASCENDING),
+                    ("chunk_index", ASCENDING),
+                ],
+                unique=True,
+                background=True,
+                name="content_cache_chunks_hash_chunker_model_index",
+            ),
+        )
+    )
+
+    # Chat history pages walk a document's message buckets newest first
+    tasks.append(
+        create_index_with_logging(
+            db.chat_message_buckets,
+            IndexModel(
+                [
+                    ("document_upload_id", ASCENDING),
+                    ("model_name", ASCENDING),
+                    ("last_message_id", DESCENDING),
+                ],
+                background=True,
+                name="chat_message_buckets_document_model_last_message",
+            ),
+        )
+    )
+    # New messages go to the open bucket of their chat and day
+    tasks.append(
+        create_index_with_logging(
+            db.chat_message_buckets,
+            IndexModel(
+                [("chat_id", ASCENDING), ("day", ASCENDING), ("count", ASCENDING)],
+                background=True,
+                name="chat_message_buckets_chat_day_count",
+            ),
+        )
+    )
+    # Conversation history walks one chat's buckets newest first
+    tasks.append(
+        create_index_with_logging(
+            db.chat_message_buckets,
+            IndexModel(
+                [("chat_id", ASCENDING), ("last_message_id", DESCENDING)],
+                background=True,
+                name="chat_message_buckets_chat_last_message",
+            ),
+        )
+    )
+
+    # Cached summaries are looked up by _id and expire after the cache TTL
+    summary_cache_ttl = SummaryCacheSettings().summary_cache_ttl_seconds
+    for collection, name in (
+        (db.chunk_summaries, "chunk_summaries_created_at_ttl"),
+        (db.document_summaries, "document_summaries_created_at_ttl"),
+    ):
+        tasks.append(
+            create_index_with_logging(
+                collection,
+                IndexModel(
+                    [("created_at", ASCENDING)],
+                    expireAfterSeconds=summary_cache_ttl,
+                    background=True,
+                    name=name,
+                ),
+            )
+        )
+
     # Add more collections here as needed
     # e.g., tasks.append(create_index_with_logging(db.another_collection, another_index))
 
@@ -0,0 +1,122 @@
+"""
+Moves messages embedded in `chats.messages` into `chat_message_buckets`.
+
+Each chat's messages are grouped into buckets per UTC day of up to
+CHAT_MESSAGE_BUCKET_SIZE messages. A bucket's _id is its first message's _id
+and is written with an upsert, so an interrupted run can simply be rerun.
+Once a chat's buckets are written, only the messages moved are pulled from
+its embedded array, so a message pushed meanwhile is never lost.
+
+Run it after the bucketed message store is deployed everywhere. If instances
+still running the old code pushed embedded messages during the run, run it
+again to move those too. It also drops the `chats_document_model_message_date`
+index, which ensure_indices replaced with `chats_document_model`.
+
+    python -m db.migrations.move_chat_messages_to_buckets
+"""
+
+import asyncio
+from typing import Any, Dict, List
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+from config.mongo import TypedAsyncIOMotorDatabase, mongo_manager
+from db.models.chat import (
+    CHAT_MESSAGE_BUCKET_SIZE,
+    MongoChatMessage,
+    MongoChatMessageBucket,
+    bucket_day,
+)
+from config.logger import get_logger
+
+logger = get_logger()
+
+# Index on the embedded messages' dates, superseded by the buckets' own
+OLD_CHATS_INDEX = "chats_document_model_message_date"
+
+
+def build_buckets(chat: Dict[str, Any]) -> List[MongoChatMessageBucket]:
+    messages: List[MongoChatMessage] = sorted(
+        chat.get("messages") or [], key=lambda message: message["_id"]
+    )
+    buckets: List[MongoChatMessageBucket] = []
+    for message in messages:
+        day = bucket_day(message["created_at"])
+        if (
+            not buckets
+            or buckets[-1]["day"] != day
+            or buckets[-1]["count"] >= CHAT_MESSAGE_BUCKET_SIZE
+        ):
+            buckets.append(
+                MongoChatMessageBucket(
+                    _id=message["_id"],
+                    chat_id=chat["_id"],
+                    document_upload_id=chat["document_upload_id"],
+                    model_name=chat["model_name"],
+                    day=day,
+                    count=0,
+                    first_message_id=message["_id"],
+                    last_message_id=message["_id"],
+                    messages=[],
+                )
+            )
+        bucket = buckets[-1]
+        bucket["messages"].append(message)
+        bucket["count"] += 1
+        bucket["last_message_id"] = message["_id"]
+    return buckets
+
+
+async def move_chat_messages_to_buckets(db: TypedAsyncIOMotorDatabase) -> int:
+    moved = 0
+    chats = db.chats.find({"messages.0": {"$exists": True}})
+    async for chat in chats:
+        buckets = build_buckets(chat)
+        await db.chat_message_buckets.bulk_write(
+            [
+                ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True)
+                for bucket in buckets
+            ],
+            ordered=False,
+        )
+        moved_ids = [
+            message["_id"] for bucket in buckets for message in bucket["messages"]
+        ]
+        await db.chats.update_one(
+            {"_id": chat["_id"]},
+            {"$pull": {"messages": {"_id": {"$in": moved_ids}}}},
+        )
+        count = len(moved_ids)
+        moved += count
+        logger.info(
+            f"Moved {count} messages of chat {chat['_id']} into {len(buckets)} buckets"
+        )
+    # Chats emptied by the move, or created empty before it, carry `messages: []`
+    await db.chats.update_many(
+        {"messages": {"$size": 0}}, {"$unset": {"messages": ""}}
+    )
+    return moved
+
+
+async def drop_old_chats_index(db: TypedAsyncIOMotorDatabase) -> None:
+    try:
+        await db.chats.drop_index(OLD_CHATS_INDEX)
+        logger.info(f"Dropped index {OLD_CHATS_INDEX}")
+    except OperationFailure as e:
+        # IndexNotFound: already dropped, or never created
+        if e.code != 27:
+            raise
+
+
+if __name__ == "__main__":
+
+    async def main():
+        await mongo_manager.connect()
+        try:
+            async with mongo_manager.get_database() as db:
+                moved = await move_chat_messages_to_buckets(db)
+                await drop_old_chats_index(db)
+            logger.info(f"Moved {moved} chat messages into buckets")
+        finally:
+            await mongo_manager.close()
+
+    asyncio.run(main())
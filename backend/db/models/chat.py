@@ -51,14 +51,28 @@ class MongoChat(TypedDict):
     conversations: Annotated[
         List[MongoConversation], "List of conversations in this chat"
     ]
-    messages: Annotated[
-        List[MongoChatMessage], "List of all chat messages across all conversations"
-    ]
+
+
+# Messages are stored in `chat_message_buckets`, up to this many per bucket,
+# one or more buckets per chat and UTC day, rather than embedded in the chat.
+CHAT_MESSAGE_BUCKET_SIZE = 100
+
+
+class MongoChatMessageBucket(TypedDict):
+    _id: Annotated[ObjectId, "MongoDB ObjectId"]
+    chat_id: Annotated[ObjectId, "Reference to the chat the messages belong to"]
+    document_upload_id: Annotated[ObjectId, "Reference to the chat's document"]
+    model_name: Annotated[ModelName, "Model of the chat"]
+    day: Annotated[datetime, "UTC day the bucket's messages were created on"]
+    count: Annotated[int, "Number of messages in the bucket"]
+    first_message_id: Annotated[ObjectId, "Lowest message ObjectId in the bucket"]
+    last_message_id: Annotated[ObjectId, "Highest message ObjectId in the bucket"]
+    messages: Annotated[List[MongoChatMessage], "Messages, oldest first"]
 
 
 def create_chat(
     document_upload: MongoDocumentUpload,
-    open_ai_assistant: OpenAIAssistantChat,
+    open_ai_assistant: Optional[OpenAIAssistantChat],
     model_name: ModelName,
 ) -> MongoChat:
     return MongoChat(
@@ -67,7 +81,6 @@ def create_chat(
         open_ai_assistant=open_ai_assistant,
         model_name=model_name,
         conversations=[],
-        messages=[],
     )
 
 
@@ -94,3 +107,7 @@ def create_chat_message(
         conversation_id=conversation_id,
     )
     # created_at=datetime.now(UTC),
+
+
+def bucket_day(created_at: datetime) -> datetime:
+    return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -0,0 +1,67 @@
+from datetime import datetime, UTC
+from typing import TypedDict, Annotated, Literal, Optional, Dict, Any, List
+from bson import ObjectId
+
+
+# Docling's HybridChunker for documents it can convert, the tiktoken text
+# chunker over `extracted_text` for everything else
+Chunker = Literal["docling", "text"]
+
+
+class MongoContentCacheEntry(TypedDict):
+    _id: Annotated[str, "SHA-256 of the S3 object's bytes"]
+    openai_file_id: Optional[
+        Annotated[str, "OpenAI file ID of the uploaded content, shared by threads"]
+    ]
+    docling_structured_data: Optional[
+        Annotated[Dict[str, Any], "Structured data extracted by Docling"]
+    ]
+    cached_chunk_sets: Annotated[
+        List[str], "Complete `chunker:embedding_model` chunk sets for this content"
+    ]
+    created_at: Annotated[datetime, "When the content was first seen"]
+
+
+class MongoContentCacheChunk(TypedDict):
+    _id: Annotated[ObjectId, "MongoDB ObjectId"]
+    content_hash: Annotated[str, "Reference to the content cache entry"]
+    chunker: Annotated[Chunker, "Chunker that produced the chunk"]
+    embedding_model: Annotated[str, "Embedding model used for `embedding`"]
+    chunk_index: Annotated[int, "Position of the chunk within the document"]
+    chunk: Annotated[
+        Dict[str, Any], "Chunk fields, without document-specific IDs or embedding"
+    ]
+    embedding: Annotated[List[float], "Embedding vector of the chunk text"]
+
+
+def chunk_set_key(chunker: Chunker, embedding_model: str) -> str:
+    return f"{chunker}:{embedding_model}"
+
+
+def create_content_cache_entry(content_hash: str) -> MongoContentCacheEntry:
+    return MongoContentCacheEntry(
+        _id=content_hash,
+        openai_file_id=None,
+        docling_structured_data=None,
+        cached_chunk_sets=[],
+        created_at=datetime.now(UTC),
+    )
+
+
+def create_content_cache_chunk(
+    content_hash: str,
+    chunker: Chunker,
+    embedding_model: str,
+    chunk_index: int,
+    chunk: Dict[str, Any],
+    embedding: List[float],
+) -> MongoContentCacheChunk:
+    return MongoContentCacheChunk(
+        _id=ObjectId(),
+        content_hash=content_hash,
+        chunker=chunker,
+        embedding_model=embedding_model,
+        chunk_index=chunk_index,
+        chunk=chunk,
+        embedding=embedding,
+    )
@@ -12,6 +12,7 @@ from typing import (
 )
 from api.utils.url_friendly import make_url_friendly
 from bson import ObjectId
+from datetime import datetime
 from enum import Enum
 from config.environment import S3Settings
 from config.ai_models import ModelName
@@ -87,6 +88,12 @@ class Note(TypedDict):
     content: Annotated[str, "Content of the note"]
 
 
+class IngestionState(TypedDict):
+    stages: Annotated[
+        Dict[str, datetime], "Completed ingestion stages and when each finished"
+    ]
+
+
 class MongoDocumentUpload(TypedDict):
     _id: Annotated[ObjectId, "MongoDB ObjectId"]
     user_id: Annotated[ObjectId, "ID of the user who owns this document"]
@@ -112,6 +119,12 @@ class MongoDocumentUpload(TypedDict):
     directory_path: Optional[
         Annotated[str, "Path of the directory this document belongs to"]
     ]
+    content_hash: Optional[
+        Annotated[str, "SHA-256 of the uploaded file, key into the content cache"]
+    ]
+    ingestion: Optional[
+        Annotated[IngestionState, "Checkpoints of the ingestion pipeline"]
+    ]
 
 
 def generate_s3_key_for_file(
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import TypedDict, Annotated
+from bson import ObjectId
+
+
+class MongoChunkSummary(TypedDict):
+    _id: Annotated[str, "model:prompt_version:target_tokens:chunk_hash"]
+    chunk_hash: Annotated[str, "SHA-256 of the text (and context) summarized"]
+    model: Annotated[str, "Chat model that wrote the summary"]
+    prompt_version: Annotated[str, "Version of the summarization prompt"]
+    target_tokens: Annotated[int, "Requested summary length in tokens; 0 if none"]
+    summary: Annotated[str, "The summary"]
+    created_at: Annotated[datetime, "When the summary was written"]
+
+
+class MongoDocumentSummary(TypedDict):
+    _id: Annotated[str, "document_upload_id:method:model:prompt_version"]
+    document_upload_id: Annotated[ObjectId, "Reference to the summarized document"]
+    method: Annotated[str, "Summarization method, e.g. map_reduce"]
+    model: Annotated[str, "Chat model that wrote the summary"]
+    prompt_version: Annotated[str, "Version of the summarization prompts"]
+    source_hash: Annotated[str, "SHA-256 of the input the final summary was made from"]
+    summary: Annotated[str, "The final summary"]
+    created_at: Annotated[datetime, "When the summary was written"]
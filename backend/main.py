@@ -16,6 +16,7 @@ from controllers import (
 from background.subscribers.redis_subscriber import RedisSubscriber
 from config.redis import redis_pool, RedisType
 from config.mongo import mongo_manager
+from config.openai_client import close_async_openai_clients
 from services.websocket_manager import get_websocket_manager
 import asyncio
 
@@ -26,6 +27,7 @@ from background.huey_jobs.capture_website_job import huey, capture_website  # ty
 from background.huey_jobs.process_document_job import process_document  # type: ignore
 from background.huey_jobs.summarize_document_job import summarize_document  # type: ignore
 from background.huey_jobs.process_document_v2_job import process_document_with_docling  # type: ignore
+from background.huey_jobs.ingest_document_job import ingest_document  # type: ignore
 
 from config.logger import setup_logging
 from db.indices.ensure_indices import ensure_indices_with_manager
@@ -73,6 +75,7 @@ async def lifespan(app: FastAPI):
     await FastAPILimiter.close()
 
     await mongo_manager.close()
+    await close_async_openai_clients()
     logger.info("Application shutdown complete")
 
 
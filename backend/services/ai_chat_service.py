@@ -1,5 +1,8 @@
+import asyncio
 from bson import ObjectId
-from typing import Optional, Dict, Any, List
+from datetime import datetime, UTC
+from typing import AsyncGenerator, Optional, Dict, Any, List
+from elasticsearch import AsyncElasticsearch
 from config.ai_models import ModelPairConfig, DEFAULT_MODEL_CONFIGS, ModelName
 from config.mongo import TypedAsyncIOMotorDatabase, AsyncIOMotorCollection
 from db.models.document_uploads import (
@@ -9,23 +12,43 @@ from db.models.document_uploads import (
 )
 from db.models.chat import (
     MongoChat,
+    MongoChatMessage,
+    OpenAIAssistantChat,
     ChatMessageRole,
     create_chat,
     create_chat_message,
     create_conversation,
     MongoConversation,
 )
-from utils.progress_updater import ProgressUpdater
+from utils.progress_updater import ProgressUpdater, StreamingTextPublisher
 from services.openai_assistant_service import (
     OpenAIAssistantService,
     OpenAIAssistantError,
 )
+from services.content_cache_service import ContentCacheService
+from services.chat_message_service import ChatMessageService
+from services.chat_routing_cache import ChatRouting, ChatRoutingCache, ChatRoutingChat
+from services.chat_latency import ChatLatency
+from services.retrieval_chat_service import RetrievalChatService, RetrievalChatError
+from config.redis import RedisType
 from fastapi import HTTPException
 
 from config.logger import get_logger
 
 logger = get_logger()
 
+# The fields the chat path needs to find or create its assistant and chat; the
+# full document (text, structured data) is only loaded to create a thread.
+ROUTING_PROJECTION = {"openai_assistants": 1, "chats": 1, "content_hash": 1}
+
+# The chat fields routing needs, including its conversations to find the active one
+CHAT_ROUTING_PROJECTION = {
+    "document_upload_id": 1,
+    "model_name": 1,
+    "open_ai_assistant": 1,
+    "conversations": 1,
+}
+
 
 class AIChatService:
     def __init__(
@@ -34,8 +57,11 @@ class AIChatService:
         model_pair_config: ModelPairConfig,
         progress_updater: ProgressUpdater,
         db: TypedAsyncIOMotorDatabase,
+        redis_client: Optional[RedisType] = None,
+        es_client: Optional[AsyncElasticsearch] = None,
     ):
         self.model_pair_config = model_pair_config
+        self.chat_mode = model_pair_config["chat_mode"]
         self.progress_updater = progress_updater
         self.openai_assistant_service = OpenAIAssistantService(
             openai_api_key=openai_api_key
@@ -45,14 +71,105 @@ class AIChatService:
         self.document_upoload_collection: AsyncIOMotorCollection[
             MongoDocumentUpload
         ] = self.db.document_uploads
+        self.content_cache = ContentCacheService(db)
+        self.chat_messages = ChatMessageService(db)
+        self.redis_client = redis_client
+        self.routing_cache = (
+            ChatRoutingCache(redis_client) if redis_client is not None else None
+        )
+        self.retrieval_chat: Optional[RetrievalChatService] = None
+        if self.chat_mode == "retrieval":
+            if es_client is None:
+                raise ValueError("Retrieval chat mode needs an Elasticsearch client")
+            self.retrieval_chat = RetrievalChatService(
+                openai_api_key=openai_api_key,
+                model_pair_config=model_pair_config,
+                es_client=es_client,
+                redis_client=redis_client,
+            )
 
-    async def _get_document(self, document_upload_id: str) -> MongoDocumentUpload:
+    async def _get_document(
+        self,
+        document_upload_id: str,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> MongoDocumentUpload:
         obj_id = ObjectId(document_upload_id)
-        document = await self.db.document_uploads.find_one({"_id": obj_id})
+        document = await self.db.document_uploads.find_one({"_id": obj_id}, projection)
         if not document:
             raise ValueError(f"Document with ID {document_upload_id} not found")
         return document
 
+    async def _invalidate_routing(
+        self, document_upload_id: ObjectId, model_name: ModelName
+    ) -> None:
+        if self.routing_cache is not None:
+            await self.routing_cache.invalidate(str(document_upload_id), model_name)
+
+    async def _get_routing(self, document_upload_id: str) -> ChatRouting:
+        """
+        The assistant, chat and active conversation for the document and this
+        model, from the routing cache or, on a miss, from Mongo (creating any
+        that don't exist yet). Retrieval mode needs no assistant or thread.
+        """
+        model_name = self.model_pair_config["model_name"]
+        generation = 0
+        if self.routing_cache is not None:
+            # Taken before the reads below, so they're only cached if nothing
+            # invalidated the entry in the meantime
+            generation = await self.routing_cache.generation(
+                document_upload_id, model_name
+            )
+            routing = await self.routing_cache.get(document_upload_id, model_name)
+            if (
+                routing
+                and "chat" in routing
+                and "conversation" in routing
+                and (
+                    self.chat_mode == "retrieval"
+                    or routing["conversation"]["open_ai_assistant"] is not None
+                )
+            ):
+                return routing
+
+        document = await self._get_document(document_upload_id, ROUTING_PROJECTION)
+        assistant = None
+        if self.chat_mode == "assistant":
+            assistant = await self._ensure_assistant_exists(
+                document, self.model_pair_config["model_name"]
+            )
+        chat = await self._ensure_chat_exists(document, assistant)
+        conversation = await self._get_or_create_conversation(chat=chat)
+
+        routing = ChatRouting(
+            chat=ChatRoutingChat(
+                _id=chat["_id"],
+                document_upload_id=chat["document_upload_id"],
+                model_name=chat["model_name"],
+                open_ai_assistant=chat["open_ai_assistant"],
+            ),
+            conversation=conversation,
+        )
+        if assistant is not None:
+            routing["assistant"] = assistant
+        if self.routing_cache is not None:
+            await self.routing_cache.set(
+                document_upload_id, model_name, routing, generation
+            )
+        return routing
+
+    async def _get_cached_file_id(self, document: MongoDocumentUpload) -> Optional[str]:
+        content_hash = document.get("content_hash")
+        if not content_hash:
+            return None
+        return await self.content_cache.get_openai_file_id(content_hash)
+
+    async def _cache_file_id(
+        self, document: MongoDocumentUpload, file_id: Optional[str]
+    ) -> None:
+        content_hash = document.get("content_hash")
+        if content_hash and file_id:
+            await self.content_cache.set_openai_file_id(content_hash, file_id)
+
     async def _ensure_assistant_exists(
         self, document: MongoDocumentUpload, model_name: ModelName
     ) -> OpenAIAssistantDetails:
@@ -65,37 +182,63 @@ class AIChatService:
             None,
         )
         if not assistant:
+            cached_file_id = await self._get_cached_file_id(document)
             assistant_details = (
                 await self.openai_assistant_service.create_assistant_thread(
                     model_config=DEFAULT_MODEL_CONFIGS[model_name],
-                    document=document,
+                    document=await self._get_document(str(document["_id"])),
                     mongo_collection=self.db.document_uploads,
+                    file_id=cached_file_id,
                 )
             )
+            if cached_file_id is None:
+                await self._cache_file_id(
+                    document, assistant_details["external_document_upload_id"]
+                )
             await self.db.document_uploads.update_one(
                 {"_id": document["_id"]},
                 {"$push": {"openai_assistants": assistant_details}},
             )
+            await self._invalidate_routing(document["_id"], model_name)
             return assistant_details
         return assistant
 
+    async def _create_chat_thread(
+        self, document: MongoDocumentUpload
+    ) -> OpenAIAssistantChat:
+        cached_file_id = await self._get_cached_file_id(document)
+        open_ai_assistant_details = await (
+            self.openai_assistant_service.create_chat_thread(
+                model_config=self.model_pair_config,
+                document=await self._get_document(str(document["_id"])),
+                file_id=cached_file_id,
+            )
+        )
+        if cached_file_id is None:
+            await self._cache_file_id(
+                document, open_ai_assistant_details["external_document_upload_id"]
+            )
+        return open_ai_assistant_details
+
     async def _ensure_chat_exists(
         self,
         document: MongoDocumentUpload,
-        assistant: OpenAIAssistantDetails,
+        assistant: Optional[OpenAIAssistantDetails],
     ) -> MongoChat:
+        """
+        The document's chat for this model. A chat gets an OpenAI thread only
+        when there is an assistant, i.e. in assistant mode; one started in
+        retrieval mode is given its thread on the first assistant-mode message.
+        """
+        model_name = self.model_pair_config["model_name"]
         chat_ref = next(
-            (
-                c
-                for c in document.get("chats", [])
-                if c["model_name"] == assistant["model"]
-            ),
+            (c for c in document.get("chats", []) if c["model_name"] == model_name),
             None,
         )
         chat = None
         if chat_ref:
             chat = await self.db.chats.find_one(
-                {"_id": ObjectId(chat_ref["chat_id"])}, {"messages": 0}
+                {"_id": ObjectId(chat_ref["chat_id"])}, CHAT_ROUTING_PROJECTION
             )
 
         if not chat_ref or not chat:
@@ -105,31 +248,36 @@ class AIChatService:
                     {"_id": document["_id"]},
                     {"$pull": {"chats": {"chat_id": chat_ref["chat_id"]}}},
                 )
+                await self._invalidate_routing(document["_id"], model_name)
                 logger.warning(
                     f"Removed orphaned chat reference for document {document['_id']}"
                 )
 
-            open_ai_assistant_details = (
-                await (
-                    self.openai_assistant_service.create_chat_thread(
-                        model_config=self.model_pair_config, document=document
-                    )
-                )
-            )
             new_chat = create_chat(
                 document_upload=document,
-                model_name=self.model_pair_config["model_name"],
-                open_ai_assistant=open_ai_assistant_details,
+                model_name=model_name,
+                open_ai_assistant=(
+                    await self._create_chat_thread(document)
+                    if assistant is not None
+                    else None
+                ),
             )
             result = await self.db.chats.insert_one(new_chat)
             chat_id = result.inserted_id
-            chat_ref = ChatReference(
-                chat_id=chat_id, model_name=self.model_pair_config["model_name"]
-            )
+            chat_ref = ChatReference(chat_id=chat_id, model_name=model_name)
             await self.db.document_uploads.update_one(
                 {"_id": document["_id"]}, {"$push": {"chats": chat_ref}}
             )
+            await self._invalidate_routing(document["_id"], model_name)
             return new_chat
+
+        if assistant is not None and chat.get("open_ai_assistant") is None:
+            chat["open_ai_assistant"] = await self._create_chat_thread(document)
+            await self.db.chats.update_one(
+                {"_id": chat["_id"]},
+                {"$set": {"open_ai_assistant": chat["open_ai_assistant"]}},
+            )
+            await self._invalidate_routing(document["_id"], model_name)
         return chat
 
     async def _get_or_create_conversation(self, chat: MongoChat) -> MongoConversation:
@@ -137,7 +285,17 @@ class AIChatService:
             (c for c in chat.get("conversations", []) if c["end_time"] is None), None
         )
         if active_conversation:
-            return active_conversation
+            if (
+                active_conversation["open_ai_assistant"] is not None
+                or chat["open_ai_assistant"] is None
+            ):
+                return active_conversation
+            # Started in retrieval mode; the assistant path needs a thread, so
+            # continue in a new conversation on the chat's thread.
+            await self.db.chats.update_one(
+                {"_id": chat["_id"], "conversations._id": active_conversation["_id"]},
+                {"$set": {"conversations.$.end_time": datetime.now(UTC)}},
+            )
 
         new_conversation = create_conversation(
             open_ai_assistant=chat["open_ai_assistant"]
@@ -145,68 +303,110 @@ class AIChatService:
         await self.db.chats.update_one(
             {"_id": chat["_id"]}, {"$push": {"conversations": new_conversation}}
         )
+        await self._invalidate_routing(chat["document_upload_id"], chat["model_name"])
         return new_conversation
 
     async def _add_message_to_chat(
         self,
-        chat: MongoChat,
+        chat: ChatRoutingChat,
         content: str,
         role: ChatMessageRole,
         conversation: MongoConversation,
-    ) -> None:
+    ) -> MongoChatMessage:
         message = create_chat_message(content, role, conversation["_id"])
-        await self.db.chats.update_one(
-            {"_id": chat["_id"]}, {"$push": {"messages": message}}
+        await self.chat_messages.add_message(chat, message)
+        return message
+
+    async def _get_conversation_history(
+        self,
+        chat: ChatRoutingChat,
+        conversation: MongoConversation,
+        before_message: MongoChatMessage,
+        limit: int,
+    ) -> List[MongoChatMessage]:
+        """The conversation's latest messages before `before_message`, oldest first."""
+        if limit <= 0:
+            return []
+        messages = await self.chat_messages.get_conversation_history(
+            chat_id=chat["_id"],
+            conversation_id=conversation["_id"],
+            before_id=before_message["_id"],
+            limit=limit,
         )
+        return list(reversed(messages))
 
-    async def send_chat_message(
+    async def _stream_reply(
         self,
         document_upload_id: str,
-        message_content: str,
-    ) -> Dict[str, Any]:
-        document = await self._get_document(document_upload_id)
+        chat: ChatRoutingChat,
+        conversation: MongoConversation,
+        user_message: MongoChatMessage,
+        latency: ChatLatency,
+    ) -> AsyncGenerator[str, None]:
+        if self.retrieval_chat is not None:
+            # Retrieval and history reads don't depend on each other
+            chunks, history = await asyncio.gather(
+                self.retrieval_chat.retrieve(
+                    document_upload_id, user_message["content"]
+                ),
+                self._get_conversation_history(
+                    chat,
+                    conversation,
+                    user_message,
+                    self.retrieval_chat.settings.retrieval_chat_history_messages,
+                ),
+            )
+            latency.retrieved()
+            async for text_chunk in self.retrieval_chat.stream_answer(
+                user_message["content"], chunks, history
+            ):
+                yield text_chunk
+            return
 
-        # Ensure assistant exists
-        assistant = await self._ensure_assistant_exists(
-            document, self.model_pair_config["model_name"]
+        # Send message to OpenAI
+        await self.openai_assistant_service.add_message_to_thread(
+            thread_id=conversation["open_ai_assistant"]["thread_id"],
+            content=user_message["content"],
         )
+        async for text_chunk in self.openai_assistant_service.run_assistant(
+            thread_id=conversation["open_ai_assistant"]["thread_id"],
+            assistant_id=conversation["open_ai_assistant"]["assistant_id"],
+            context_file_id=conversation["open_ai_assistant"][
+                "external_document_upload_id"
+            ],
+        ):
+            yield text_chunk
 
-        # Ensure chat exists
-        chat = await self._ensure_chat_exists(document, assistant)
-
-        conversation = await self._get_or_create_conversation(chat=chat)
+    async def send_chat_message(
+        self,
+        document_upload_id: str,
+        message_content: str,
+    ) -> Dict[str, Any]:
+        # Ensure assistant (in assistant mode), chat and conversation exist
+        routing = await self._get_routing(document_upload_id)
+        chat = routing["chat"]
+        conversation = routing["conversation"]
 
         # Add user message to chat
-        await self._add_message_to_chat(
+        user_message = await self._add_message_to_chat(
             chat=chat,
             content=message_content,
             role=ChatMessageRole.USER,
             conversation=conversation,
         )
 
-        # Send message to OpenAI
-        await self.openai_assistant_service.add_message_to_thread(
-            thread_id=conversation["open_ai_assistant"]["thread_id"],
-            content=message_content,
-        )
-
         try:
             full_text = ""
-            async for text_chunk in self.openai_assistant_service.run_assistant(
-                thread_id=conversation["open_ai_assistant"]["thread_id"],
-                assistant_id=conversation["open_ai_assistant"]["assistant_id"],
-                context_file_id=conversation["open_ai_assistant"][
-                    "external_document_upload_id"
-                ],
-            ):
-                full_text += text_chunk
-                await self.progress_updater.update(
-                    progress=50,  # You may want to calculate a more accurate progress
-                    status="IN_PROGRESS",
-                    payload={
-                        "newText": text_chunk,
-                    },
-                )
+            latency = ChatLatency(self.chat_mode)
+            async with StreamingTextPublisher(self.progress_updater) as text_publisher:
+                async for text_chunk in self._stream_reply(
+                    document_upload_id, chat, conversation, user_message, latency
+                ):
+                    latency.token()
+                    full_text += text_chunk
+                    await text_publisher.write(text_chunk)
+            latency.finished()
+            await latency.record(self.redis_client)
 
             # Add assistant's response to chat
             await self._add_message_to_chat(
@@ -218,7 +418,7 @@ class AIChatService:
 
             await self.progress_updater.complete(payload={"completeText": full_text})
 
-        except OpenAIAssistantError as e:
+        except (OpenAIAssistantError, RetrievalChatError) as e:
             logger.error(f"An error occurred: {str(e)}")
             await self.progress_updater.error()
             raise HTTPException(status_code=500, detail=str(e))
@@ -262,28 +462,12 @@ class AIChatService:
         limit: int = 50,
         before_message_id: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        document = await self._get_document(document_upload_id)
-        chat_ref = next(
-            (
-                c
-                for c in document.get("chats", [])
-                if c["model_name"] == self.model_pair_config["model_name"]
-            ),
-            None,
+        messages, _ = await self.chat_messages.get_chat_history(
+            document_upload_id=document_upload_id,
+            model=self.model_pair_config["model_name"],
+            before=before_message_id,
+            limit=limit,
         )
-        if not chat_ref:
-            return []
-
-        chat_id = chat_ref["chat_id"]
-        query = {"_id": chat_id}
-        if before_message_id:
-            query["messages"] = {"$lt": ObjectId(before_message_id)}
-
-        chat = await self.db.chats.find_one(query, {"messages": {"$slice": -limit}})
-
-        if not chat:
-            return []
-
         return [
             {
                 "message_id": str(msg["_id"]),
@@ -292,5 +476,5 @@ class AIChatService:
                 "created_at": msg["created_at"].isoformat(),
                 "conversation_id": str(msg["conversation_id"]),
             }
-            for msg in reversed(chat.get("messages", []))
+            for msg in messages
         ]
@@ -1,12 +1,19 @@
 from bson import ObjectId
-from config.ai_models import ModelPairConfig
+from typing import Optional
+from config.ai_models import ModelName, ModelPairConfig
 from config.mongo import TypedAsyncIOMotorDatabase, AsyncIOMotorCollection
-from db.models.document_uploads import MongoDocumentUpload, find_assistant_by_model
-from utils.progress_updater import ProgressUpdater
+from config.redis import RedisType
+from db.models.document_uploads import (
+    MongoDocumentUpload,
+    OpenAIAssistantDetails,
+    find_assistant_by_model,
+)
+from utils.progress_updater import ProgressUpdater, StreamingTextPublisher
 from services.openai_assistant_service import (
     OpenAIAssistantService,
     OpenAIAssistantError,
 )
+from services.chat_routing_cache import ChatRouting, ChatRoutingCache
 
 from config.logger import get_logger
 
@@ -20,6 +27,7 @@ class AIExplainTextService:
         model_pair_config: ModelPairConfig,
         progress_updater: ProgressUpdater,
         db: TypedAsyncIOMotorDatabase,
+        redis_client: Optional[RedisType] = None,
     ):
         self.model_pair_config = model_pair_config
         self.progress_updater = progress_updater
@@ -27,35 +35,55 @@ class AIExplainTextService:
             openai_api_key=openai_api_key
         )
         self.db = db
+        self.routing_cache = (
+            ChatRoutingCache(redis_client) if redis_client is not None else None
+        )
 
-    async def explain_text(
-        self,
-        document_upload_id: str,
-        highlighted_text: str,
-        model_pair_config: ModelPairConfig,
-    ):
+    async def _get_assistant(
+        self, document_upload_id: str, model_name: ModelName
+    ) -> Optional[OpenAIAssistantDetails]:
+        generation = 0
+        if self.routing_cache is not None:
+            generation = await self.routing_cache.generation(
+                document_upload_id, model_name
+            )
+            routing = await self.routing_cache.get(document_upload_id, model_name)
+            if routing and "assistant" in routing:
+                return routing["assistant"]
 
-        obj_id = ObjectId(document_upload_id)
         collection: AsyncIOMotorCollection[MongoDocumentUpload] = (
             self.db.document_uploads
         )
-        document = await collection.find_one({"_id": obj_id})
+        # Only the assistants; the document's text and structured data aren't needed
+        document = await collection.find_one(
+            {"_id": ObjectId(document_upload_id)}, {"openai_assistants": 1}
+        )
         if not document:
             raise ValueError(
                 f"AI Explain Text Service: Document with ID {document_upload_id} not found"
             )
 
-        # Print all document fields except extracted_text and docling_structured_data
-        debug_doc = {
-            k: v
-            for k, v in document.items()
-            if k not in ["extracted_text", "docling_structured_data"]
-        }
-        logger.debug(f"Document fields: {debug_doc}")
+        openai_assistant = find_assistant_by_model(document, model_name)
+        if openai_assistant is not None and self.routing_cache is not None:
+            await self.routing_cache.update(
+                document_upload_id,
+                model_name,
+                ChatRouting(assistant=openai_assistant),
+                generation,
+            )
+        return openai_assistant
+
+    async def explain_text(
+        self,
+        document_upload_id: str,
+        highlighted_text: str,
+        model_pair_config: ModelPairConfig,
+    ):
+
         logger.debug(f"Model pair config: {model_pair_config}")
 
-        openai_assistant = find_assistant_by_model(
-            document, model_pair_config["model_name"]
+        openai_assistant = await self._get_assistant(
+            document_upload_id, model_pair_config["model_name"]
         )
         if openai_assistant is None:
             # TODO: Dynamically create assistant IF user has account access
@@ -65,25 +93,20 @@ class AIExplainTextService:
 
         try:
             full_text = ""
-            async for (
-                text_chunk
-            ) in self.openai_assistant_service.explain_text_subsection(
-                thread_id=openai_assistant["thread_id"],
-                assistant_id=openai_assistant["assistant_id"],
-                text_subsection=highlighted_text,
-                context_file_id=openai_assistant.get("external_document_upload_id")
-                or "",
-                reading_level="intermediate",
-                output_length="medium",
-            ):
-                full_text += text_chunk
-                await self.progress_updater.update(
-                    progress=50,  # You may want to calculate a more accurate progress
-                    status="IN_PROGRESS",
-                    payload={
-                        "newText": text_chunk,
-                    },
-                )
+            async with StreamingTextPublisher(self.progress_updater) as text_publisher:
+                async for (
+                    text_chunk
+                ) in self.openai_assistant_service.explain_text_subsection(
+                    thread_id=openai_assistant["thread_id"],
+                    assistant_id=openai_assistant["assistant_id"],
+                    text_subsection=highlighted_text,
+                    context_file_id=openai_assistant.get("external_document_upload_id")
+                    or "",
+                    reading_level="intermediate",
+                    output_length="medium",
+                ):
+                    full_text += text_chunk
+                    await text_publisher.write(text_chunk)
 
             await self.progress_updater.complete(payload={"completeText": full_text})
 
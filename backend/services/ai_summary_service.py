@@ -1,5 +1,7 @@
 import asyncio
+import hashlib
 import random
+import re
 from motor.motor_asyncio import AsyncIOMotorCollection
 from bson import ObjectId
 from openai import AsyncOpenAI
@@ -20,6 +22,8 @@ from db.models.document_uploads import (
 )
 from utils.progress_updater import ProgressUpdater, SummaryProgressData
 from services.embedding_generator import EmbeddingGenerator
+from services.document_chunk_store import DocumentChunkStore
+from services.summary_cache_service import SummaryCacheService, summary_hash
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 
@@ -30,6 +34,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Part of every cached summary's key; bump a method's version when its prompts
+# change so summaries written with the old prompts aren't reused.
+SUMMARY_PROMPT_VERSIONS = {
+    "most_advanced": "1",
+    "map_reduce": "1",
+    "sequential": "1",
+}
+
+
+def split_stable_chunks(text: str, target_size: int) -> List[str]:
+    """Group paragraphs into chunks of roughly `target_size` characters.
+
+    Chunks end at paragraph breaks chosen from the paragraph's own content
+    (or once a chunk reaches `target_size`), so an edit only changes the
+    chunks around it and the rest keep their cached summaries.
+    """
+    paragraphs: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        # Paragraphs too long to fit a chunk are cut where they stand
+        for i in range(0, len(paragraph), target_size):
+            paragraphs.append(paragraph[i : i + target_size])
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_size = 0
+    for paragraph in paragraphs:
+        if current and current_size + len(paragraph) > 2 * target_size:
+            chunks.append("\n\n".join(current))
+            current, current_size = [], 0
+        current.append(paragraph)
+        current_size += len(paragraph)
+        digest = hashlib.sha256(paragraph.encode("utf-8")).digest()
+        if current_size >= target_size or (
+            current_size >= target_size // 2 and digest[0] % 4 == 0
+        ):
+            chunks.append("\n\n".join(current))
+            current, current_size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
 
 class AISummaryService:
     def __init__(
@@ -38,6 +84,7 @@ class AISummaryService:
         pinecone_api_key: str,
         model_pair_config: ModelPairConfig,
         progress_updater: ProgressUpdater,
+        db: TypedAsyncIOMotorDatabase,
     ):
         self.model_pair_config = model_pair_config
         self.openai_client = AsyncOpenAI(api_key=openai_api_key)
@@ -49,6 +96,13 @@ class AISummaryService:
         self.ensure_pinecone_index()
         self.semaphore = asyncio.Semaphore(10)  # Limit to 10 concurrent API calls
         self.progress_updater = progress_updater
+        # Documents without a cached chunk set are read from Pinecone
+        self.chunk_store = DocumentChunkStore(
+            db, model_pair_config["embedding_model"]["model_name"], self.index
+        )
+        self.summary_cache = SummaryCacheService(
+            db, model_pair_config["chat_model"]["model_name"]
+        )
 
     def ensure_pinecone_index(self):
         if self.index_name not in self.pinecone_client.list_indexes().names():
@@ -85,32 +139,24 @@ class AISummaryService:
         ]
 
     async def get_document_chunks(
-        self, document_id: str, top_k: int = 10
+        self, document_id: str, start: int = 0, end: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        # Retrieve all chunks for the document, sorted by chunk_index
-        results = await asyncio.to_thread(
-            self.index.query,
-            vector=[0]
-            * self.model_pair_config["embedding_model"]["dimension"],  # Dummy vector
-            filter={"document_id": document_id},
-            top_k=top_k,
-            include_metadata=True,
-        )
-        chunks = [
-            {
-                "chunk_id": match["id"],
-                "text": match["metadata"]["text"],
-                "document_id": match["metadata"]["document_id"],
-                "chunk_index": match["metadata"]["chunk_index"],
-            }
-            for match in results["matches"]
-        ]
-        return sorted(chunks, key=lambda x: x["chunk_index"])
+        # All of the document's chunks (or those in [start, end)), sorted by chunk_index
+        return await self.chunk_store.get_chunks(document_id, start, end)
 
     async def basic_summarize_text(self, document_id: str) -> Dict[str, str]:
-        chunks = await self.get_document_chunks(document_id, top_k=20)
+        chat_model = self.model_pair_config["chat_model"]
+        # Leave room for the instructions and the summary itself
+        token_budget = chat_model["max_context_tokens"] - chat_model["max_output_tokens"]
         prompt = "This is the document.  Keep in mind, this may be the whole document, or a fragment of it.  Please try to summarize the document as a whole the best you can:\n\n"
-        for chunk in chunks:
+        used_tokens = self.embedding_generator.num_tokens_from_string(prompt)
+        async for chunk in self.chunk_store.iter_chunks(document_id):
+            chunk_tokens = self.embedding_generator.num_tokens_from_string(
+                chunk["text"]
+            )
+            if used_tokens + chunk_tokens > token_budget:
+                break
+            used_tokens += chunk_tokens
             prompt += chunk["text"] + "\n\n"
 
         response = await self.openai_client.chat.completions.create(
@@ -138,7 +184,7 @@ class AISummaryService:
 
     # REMOVE?
     # async def recursive_summarize(self, document_id: str) -> Dict[str, str]:
-    #     chunks = await self.get_document_chunks(document_id, top_k=100)
+    #     chunks = await self.get_document_chunks(document_id)
     #     max_chunk_size = self.model_pair_config['processing']['max_tokens_per_chunk']
 
     #     async def summarize_chunk(chunk_text: str) -> str:
@@ -191,12 +237,14 @@ class AISummaryService:
         return response.choices[0].message.content or ""
 
     async def most_advanced_summarize(self, document_id: str) -> Dict[str, Any]:
-        chunks = await self.get_document_chunks(document_id, top_k=50)
+        chunks = await self.get_document_chunks(document_id)
         target_length = self.model_pair_config["chat_model"]["target_summary_length"]
 
         await self.progress_updater.update(progress=5, status="IN_PROGRESS")
 
-        async def summarize_with_context(
+        prompt_version = SUMMARY_PROMPT_VERSIONS["most_advanced"]
+
+        async def condense(
             text: str, context: str = "", target_tokens: Optional[int] = None
         ) -> str:
             prompt = f"Context: {context}\n\nSummarize the following text concisely, maintaining coherence with the context. Please provide the purpose, key points, and any other relevant information to understanding the document as a cohesive whole.  Be intelligible.\n\n"
@@ -214,6 +262,16 @@ class AISummaryService:
                 or self.model_pair_config["chat_model"]["max_output_tokens"],
             )
 
+        async def summarize_with_context(
+            text: str, context: str = "", target_tokens: Optional[int] = None
+        ) -> str:
+            return await self.summary_cache.chunk_summary(
+                summary_hash(context, text),
+                prompt_version,
+                target_tokens,
+                lambda: condense(text, context, target_tokens),
+            )
+
         async def rate_limited_summarize(
             chunk: str, context: str, target_tokens: Optional[int] = None
         ) -> str:
@@ -263,70 +321,90 @@ class AISummaryService:
 
             return result
 
-        # First level of summarization with adaptive chunking
-        chunk_texts = [chunk["text"] for chunk in chunks]
-        adaptive_chunks = await adaptive_chunk(chunk_texts)
+        # Unknown when the final summary comes from the cache
+        first_level_count: Optional[int] = None
 
-        await self.progress_updater.update(progress=10, status="IN_PROGRESS")
+        async def summarize_document() -> str:
+            nonlocal first_level_count
+            # First level of summarization with adaptive chunking
+            adaptive_chunks = await adaptive_chunk(chunk_texts)
 
-        # Fully parallelized summarization with rate limiting
-        summarization_tasks: List[Coroutine[Any, Any, str]] = []
-        for i, chunk in enumerate(adaptive_chunks):
-            summarization_tasks.append(
-                rate_limited_summarize(
-                    chunk[0], adaptive_chunks[i - 1][0] if i > 0 else ""
-                )
-            )
-            # Update progress for each chunk
-            await self.progress_updater.update(
-                progress=10 + (30 * (i + 1) / len(adaptive_chunks)),
-                status="IN_PROGRESS",
-            )
-
-        first_level_summaries = await asyncio.gather(*summarization_tasks)
-
-        await self.progress_updater.update(progress=40, status="IN_PROGRESS")
-
-        # Determine if we need a second level of summarization
-        total_tokens = sum(
-            self.embedding_generator.num_tokens_from_string(summary)
-            for summary in first_level_summaries
-        )
-        if total_tokens > target_length:
-            num_second_level_chunks = max(1, total_tokens // target_length)
-            target_chunk_length = target_length // num_second_level_chunks
+            await self.progress_updater.update(progress=10, status="IN_PROGRESS")
 
-            second_level_chunks = await adaptive_chunk(first_level_summaries)
+            # Fully parallelized summarization with rate limiting
             summarization_tasks: List[Coroutine[Any, Any, str]] = []
-            for i, chunk in enumerate(second_level_chunks):
+            for i, chunk in enumerate(adaptive_chunks):
                 summarization_tasks.append(
                     rate_limited_summarize(
-                        chunk[0],
-                        second_level_chunks[i - 1][0] if i > 0 else "",
-                        target_chunk_length,
+                        chunk[0], adaptive_chunks[i - 1][0] if i > 0 else ""
                     )
                 )
+                # Update progress for each chunk
                 await self.progress_updater.update(
-                    progress=40 + (30 * (i + 1) / len(second_level_chunks)),
+                    progress=10 + (30 * (i + 1) / len(adaptive_chunks)),
                     status="IN_PROGRESS",
                 )
 
-            second_level_summaries = await asyncio.gather(*summarization_tasks)
-            final_summary = "\n\n".join(second_level_summaries)
-        else:
-            final_summary = "\n\n".join(first_level_summaries)
+            first_level_summaries = await asyncio.gather(*summarization_tasks)
+            first_level_count = len(first_level_summaries)
 
-        await self.progress_updater.update(progress=70, status="IN_PROGRESS")
+            await self.progress_updater.update(progress=40, status="IN_PROGRESS")
 
-        # Final condensation if still too long
-        final_summary_tokens = self.embedding_generator.num_tokens_from_string(
-            final_summary
-        )
-        if final_summary_tokens > target_length:
-            final_summary = await summarize_with_context(
-                final_summary, target_tokens=target_length
+            # Determine if we need a second level of summarization
+            total_tokens = sum(
+                self.embedding_generator.num_tokens_from_string(summary)
+                for summary in first_level_summaries
+            )
+            if total_tokens > target_length:
+                num_second_level_chunks = max(1, total_tokens // target_length)
+                target_chunk_length = target_length // num_second_level_chunks
+
+                second_level_chunks = await adaptive_chunk(first_level_summaries)
+                summarization_tasks: List[Coroutine[Any, Any, str]] = []
+                for i, chunk in enumerate(second_level_chunks):
+                    summarization_tasks.append(
+                        rate_limited_summarize(
+                            chunk[0],
+                            second_level_chunks[i - 1][0] if i > 0 else "",
+                            target_chunk_length,
+                        )
+                    )
+                    await self.progress_updater.update(
+                        progress=40 + (30 * (i + 1) / len(second_level_chunks)),
+                        status="IN_PROGRESS",
+                    )
+
+                second_level_summaries = await asyncio.gather(*summarization_tasks)
+                final_summary = "\n\n".join(second_level_summaries)
+            else:
+                final_summary = "\n\n".join(first_level_summaries)
+
+            await self.progress_updater.update(progress=70, status="IN_PROGRESS")
+
+            # Final condensation if still too long
+            final_summary_tokens = self.embedding_generator.num_tokens_from_string(
+                final_summary
             )
-            await self.progress_updater.update(progress=90, status="IN_PROGRESS")
+            if final_summary_tokens > target_length:
+                final_summary = await condense(
+                    final_summary, target_tokens=target_length
+                )
+                await self.progress_updater.update(progress=90, status="IN_PROGRESS")
+            return final_summary
+
+        # The first-level inputs are TF-IDF groups of all of the document's
+        # chunks, so editing any chunk regroups them and their chunk cache
+        # entries rarely hit across versions. Reuse is effectively per
+        # document: an unchanged document is answered from its cached final
+        # summary before anything is grouped or sent to the model.
+        chunk_texts = [chunk["text"] for chunk in chunks]
+        final_summary = await self.summary_cache.document_summary(
+            document_id,
+            "most_advanced",
+            prompt_version,
+            summary_hash(*chunk_texts, str(target_length)),
+            summarize_document,
+        )
 
         remaining_text = final_summary
         while remaining_text:
@@ -352,7 +430,7 @@ class AISummaryService:
             "summary": final_summary,
             "metadata": {
                 "original_chunks": len(chunks),
-                "first_level_summaries": len(first_level_summaries),
+                "first_level_summaries": first_level_count,
                 "final_summary_length": self.embedding_generator.num_tokens_from_string(
                     final_summary
                 ),
@@ -376,32 +454,37 @@ class AISummaryService:
 
         await self.progress_updater.update(progress=5, status="IN_PROGRESS")
 
-        # Split text into chunks
+        # Split text into chunks at stable paragraph boundaries so unchanged
+        # parts of an edited document keep their cached summaries
         chunk_size = 4000  # Adjust based on your needs and model limits
-        chunks = [
-            entire_text[i : i + chunk_size]
-            for i in range(0, len(entire_text), chunk_size)
-        ]
+        chunks = split_stable_chunks(entire_text, chunk_size)
         total_chunks = len(chunks)
+        prompt_version = SUMMARY_PROMPT_VERSIONS["map_reduce"]
+        chunk_max_tokens = (
+            self.model_pair_config["chat_model"]["max_output_tokens"] // 2
+        )
 
         async def summarize_chunk(chunk: str, chunk_index: int) -> str:
-            async with self.semaphore:
-                messages: List[ChatCompletionMessageParam] = [
-                    {
-                        "role": "system",
-                        "content": "You are an expert agent in information extraction and summarization",
-                    },
-                    {"role": "user", "content": chunk},
-                ]
-                summary = await self._make_api_call(
-                    messages,
-                    self.model_pair_config["chat_model"]["max_output_tokens"] // 2,
-                )
-                await self.progress_updater.update(
-                    progress=5 + (60 * (chunk_index + 1) / total_chunks),
-                    status="IN_PROGRESS",
-                )
-                return summary
+            async def summarize() -> str:
+                async with self.semaphore:
+                    messages: List[ChatCompletionMessageParam] = [
+                        {
+                            "role": "system",
+                            "content": "You are an expert agent in information extraction and summarization",
+                        },
+                        {"role": "user", "content": chunk},
+                    ]
+                    return await self._make_api_call(messages, chunk_max_tokens)
+
+            # Only chunks not summarized before with this prompt are sent
+            summary = await self.summary_cache.chunk_summary(
+                summary_hash(chunk), prompt_version, chunk_max_tokens, summarize
+            )
+            await self.progress_updater.update(
+                progress=5 + (60 * (chunk_index + 1) / total_chunks),
+                status="IN_PROGRESS",
+            )
+            return summary
 
         def final_summary_prompt(
             combined_summary: str, document: Dict[str, Any]
@@ -464,9 +547,15 @@ class AISummaryService:
             {"role": "user", "content": combined_summary_prompt},
         ]
 
-        final_summary = await self._make_api_call(
-            final_summary_messages,
-            self.model_pair_config["chat_model"]["max_output_tokens"],
+        final_summary = await self.summary_cache.document_summary(
+            document_id,
+            "map_reduce",
+            prompt_version,
+            summary_hash(combined_summary_prompt),
+            lambda: self._make_api_call(
+                final_summary_messages,
+                self.model_pair_config["chat_model"]["max_output_tokens"],
+            ),
         )
 
         await self.progress_updater.update(progress=90, status="IN_PROGRESS")
@@ -511,6 +600,10 @@ class AISummaryService:
             for i in range(0, len(entire_text), chunk_size)
         ]
         total_chunks = len(chunks)
+        prompt_version = SUMMARY_PROMPT_VERSIONS["sequential"]
+        chunk_max_tokens = (
+            self.model_pair_config["chat_model"]["max_output_tokens"] // 2
+        )
 
         summary_so_far = ""
         final_summary = ""
@@ -527,8 +620,13 @@ class AISummaryService:
                 },
             ]
 
-            chunk_summary = await self._make_api_call(
-                messages, self.model_pair_config["chat_model"]["max_output_tokens"] // 2
+            # Each part depends on the summary so far, so parts are reused up
+            # to the first one that changed
+            chunk_summary = await self.summary_cache.chunk_summary(
+                summary_hash(summary_so_far, chunk),
+                prompt_version,
+                chunk_max_tokens,
+                lambda: self._make_api_call(messages, chunk_max_tokens),
             )
 
             summary_so_far += chunk_summary + " "
@@ -551,8 +649,15 @@ class AISummaryService:
             {"role": "user", "content": final_summary},
         ]
 
-        final_summary = await self._make_api_call(
-            final_messages, self.model_pair_config["chat_model"]["max_output_tokens"]
+        final_summary = await self.summary_cache.document_summary(
+            document_id,
+            "sequential",
+            prompt_version,
+            summary_hash(final_summary),
+            lambda: self._make_api_call(
+                final_messages,
+                self.model_pair_config["chat_model"]["max_output_tokens"],
+            ),
         )
 
         await self.progress_updater.complete(
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from config.ai_models import ChatMode
+from config.redis import RedisType
+from config.logger import get_logger
+
+logger = get_logger()
+
+# Aggregated across every process, readable with `read_chat_latency_stats`
+STATS_KEY = "chat_latency:stats"
+
+_stats: Dict[str, int] = {}
+_stats_lock = threading.Lock()
+
+
+def get_chat_latency_stats() -> Dict[str, int]:
+    """Reply counts and summed milliseconds per `mode:metric` for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+async def read_chat_latency_stats(
+    redis_client: RedisType,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Replies and mean milliseconds to first token, to the full reply and, for
+    retrieval, spent retrieving, per chat mode over all processes.
+    """
+    raw = await redis_client.hgetall(STATS_KEY)
+    totals = {key.decode(): int(value) for key, value in raw.items()}
+    stats: Dict[str, Dict[str, float]] = {}
+    for key, value in totals.items():
+        mode, metric = key.split(":", 1)
+        if metric == "replies":
+            continue
+        replies = totals.get(f"{mode}:replies", 0)
+        mode_stats = stats.setdefault(mode, {"replies": replies})
+        mode_stats[f"mean_{metric}"] = value / replies if replies else 0.0
+    return stats
+
+
+class ChatLatency:
+    """
+    Timings of one chat reply, from the question being sent to the model (or
+    to retrieval) until the first streamed token and the end of the reply.
+    """
+
+    def __init__(self, mode: ChatMode):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.retrieval: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.total: Optional[float] = None
+
+    def retrieved(self) -> None:
+        self.retrieval = time.perf_counter() - self.started
+
+    def token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+
+    def finished(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    def milliseconds(self) -> Dict[str, int]:
+        timings = {
+            "retrieval_ms": self.retrieval,
+            "first_token_ms": self.first_token,
+            "total_ms": self.total,
+        }
+        return {
+            name: round(seconds * 1000)
+            for name, seconds in timings.items()
+            if seconds is not None
+        }
+
+    async def record(self, redis_client: Optional[RedisType]) -> None:
+        timings = self.milliseconds()
+        logger.info(
+            f"Chat reply via {self.mode}: "
+            + ", ".join(f"{name}={value}" for name, value in timings.items())
+        )
+        counts = {"replies": 1, **timings}
+        with _stats_lock:
+            for name, value in counts.items():
+                key = f"{self.mode}:{name}"
+                _stats[key] = _stats.get(key, 0) + value
+        if redis_client is None:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for name, value in counts.items():
+                    pipe.hincrby(STATS_KEY, f"{self.mode}:{name}", value)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Chat latency stats update failed: {str(e)}")
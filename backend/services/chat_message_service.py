@@ -1,9 +1,16 @@
 from bson import ObjectId
 from datetime import datetime, UTC
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Union
 from config.mongo import TypedAsyncIOMotorDatabase, AsyncIOMotorCollection
 from config.ai_models import ModelName
-from db.models.chat import MongoChat, MongoChatMessage
+from services.chat_routing_cache import ChatRoutingChat
+from db.models.chat import (
+    CHAT_MESSAGE_BUCKET_SIZE,
+    MongoChat,
+    MongoChatMessage,
+    MongoChatMessageBucket,
+    bucket_day,
+)
 
 
 class ChatMessageService:
@@ -13,6 +20,35 @@ class ChatMessageService:
     ):
         self.db = db
         self.chat_collection: AsyncIOMotorCollection[MongoChat] = self.db.chats
+        self.bucket_collection: AsyncIOMotorCollection[MongoChatMessageBucket] = (
+            self.db.chat_message_buckets
+        )
+
+    async def add_message(
+        self, chat: Union[MongoChat, ChatRoutingChat], message: MongoChatMessage
+    ) -> None:
+        """
+        Append a message to the chat's bucket for the message's day, starting a
+        new bucket when that one is full.
+        """
+        await self.bucket_collection.update_one(
+            {
+                "chat_id": chat["_id"],
+                "day": bucket_day(message["created_at"]),
+                "count": {"$lt": CHAT_MESSAGE_BUCKET_SIZE},
+            },
+            {
+                "$push": {"messages": message},
+                "$inc": {"count": 1},
+                "$min": {"first_message_id": message["_id"]},
+                "$max": {"last_message_id": message["_id"]},
+                "$setOnInsert": {
+                    "document_upload_id": chat["document_upload_id"],
+                    "model_name": chat["model_name"],
+                },
+            },
+            upsert=True,
+        )
 
     async def get_chat_history(
         self,
@@ -21,43 +57,95 @@ class ChatMessageService:
         before: Optional[str],
         limit: int,
     ) -> tuple[List[MongoChatMessage], Optional[str]]:
+        """
+        A page of messages, newest first, older than the `before` message ID.
+        Only the buckets the page spans are read. `next_before` is the ID to
+        pass for the following page, or None on the last one.
+        """
         match_stage: Dict[str, Any] = {
             "document_upload_id": ObjectId(document_upload_id),
             "model_name": model,
         }
 
-        if before:
-            before_date = datetime.fromisoformat(before)
-        else:
-            # If no 'before' is provided, use the current time
-            before_date = datetime.now(UTC)
-
-        pipeline = [
-            {"$match": match_stage},
-            {"$unwind": "$messages"},
-            {"$match": {"messages.created_at": {"$lt": before_date}}},
-            {"$sort": {"messages.created_at": -1}},
-            {
-                "$limit": limit + 1
-            },  # Fetch one extra to determine if there are more results
-            {
-                "$project": {
-                    "_id": "$messages._id",
-                    "content": "$messages.content",
-                    "role": "$messages.role",
-                    "created_at": "$messages.created_at",
-                    "conversation_id": "$messages.conversation_id",
-                }
-            },
-        ]
+        before_id = self._before_message_id(before)
+        if before_id is not None:
+            match_stage["first_message_id"] = {"$lt": before_id}
 
-        results: List[MongoChatMessage] = await self.chat_collection.aggregate(
-            pipeline
-        ).to_list(length=None)
+        buckets = self.bucket_collection.find(
+            match_stage, {"messages": 1, "last_message_id": 1, "_id": 0}
+        ).sort("last_message_id", -1)
+
+        # Fetch one extra to determine if there are more results. Buckets of
+        # one chat never overlap, but those of a document's older chats might,
+        # so stop only once a bucket can't hold anything newer than the page.
+        results: List[MongoChatMessage] = []
+        async for bucket in buckets:
+            if (
+                len(results) > limit
+                and bucket["last_message_id"] < results[limit]["_id"]
+            ):
+                break
+            results.extend(
+                message
+                for message in bucket["messages"]
+                if before_id is None or message["_id"] < before_id
+            )
+            results.sort(key=lambda message: message["_id"], reverse=True)
 
         messages = results[:limit]
-        next_before = (
-            results[limit]["created_at"].isoformat() if len(results) > limit else None
-        )
+        next_before = str(messages[-1]["_id"]) if len(results) > limit else None
 
         return messages, next_before
+
+    async def get_conversation_history(
+        self,
+        chat_id: ObjectId,
+        conversation_id: ObjectId,
+        before_id: ObjectId,
+        limit: int,
+    ) -> List[MongoChatMessage]:
+        """
+        The conversation's latest `limit` messages older than `before_id`,
+        newest first. Only the chat's buckets holding messages of the
+        conversation are read, newest first, until `limit` are found.
+        """
+        buckets = self.bucket_collection.find(
+            {
+                "chat_id": chat_id,
+                "messages.conversation_id": conversation_id,
+                "first_message_id": {"$lt": before_id},
+            },
+            {"messages": 1, "_id": 0},
+        ).sort("last_message_id", -1)
+
+        # Buckets of one chat never overlap, so the first `limit` messages
+        # found walking them newest first are the latest ones
+        results: List[MongoChatMessage] = []
+        async for bucket in buckets:
+            results.extend(
+                sorted(
+                    (
+                        message
+                        for message in bucket["messages"]
+                        if message["conversation_id"] == conversation_id
+                        and message["_id"] < before_id
+                    ),
+                    key=lambda message: message["_id"],
+                    reverse=True,
+                )
+            )
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def _before_message_id(self, before: Optional[str]) -> Optional[ObjectId]:
+        if not before:
+            return None
+        if ObjectId.is_valid(before):
+            return ObjectId(before)
+        # Cursors used to be ISO timestamps; the ObjectId for that instant
+        # sorts before every message created at or after it.
+        before_date = datetime.fromisoformat(before)
+        if before_date.tzinfo is None:
+            before_date = before_date.replace(tzinfo=UTC)
+        return ObjectId.from_datetime(before_date)
@@ -0,0 +1,190 @@
+import threading
+from typing import Dict, List, Optional, TypedDict, Annotated, Union
+
+import bson
+from bson import ObjectId
+
+from config.ai_models import ModelName
+from config.environment import ChatRoutingCacheSettings
+from config.redis import RedisType
+from db.models.chat import MongoConversation, OpenAIAssistantChat
+from db.models.document_uploads import OpenAIAssistantDetails
+from config.logger import get_logger
+
+logger = get_logger()
+
+chat_routing_cache_settings = ChatRoutingCacheSettings()
+
+
+class ChatRoutingChat(TypedDict):
+    _id: Annotated[ObjectId, "MongoDB ObjectId of the chat"]
+    document_upload_id: Annotated[ObjectId, "Reference to the chat's document"]
+    model_name: Annotated[ModelName, "Model of the chat"]
+    open_ai_assistant: Optional[OpenAIAssistantChat]
+
+
+class ChatRouting(TypedDict, total=False):
+    assistant: Annotated[
+        OpenAIAssistantDetails, "The document's assistant thread for the model"
+    ]
+    chat: Annotated[ChatRoutingChat, "The document's chat for the model"]
+    conversation: Annotated[MongoConversation, "The chat's active conversation"]
+
+
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def get_chat_routing_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _encode(routing: ChatRouting) -> Dict[str, bytes]:
+    # BSON documents need a top-level mapping, so each part is wrapped in one
+    return {name: bson.encode({"value": part}) for name, part in routing.items()}
+
+
+def chat_routing_key(document_upload_id: str, model_name: ModelName) -> str:
+    # Entries were single BSON strings under `chat_routing:`; hashes use their
+    # own prefix so they never meet one of those before its TTL runs out
+    return f"chat_routing_hash:{document_upload_id}:{model_name}"
+
+
+def chat_routing_generation_key(
+    document_upload_id: str, model_name: ModelName
+) -> str:
+    return f"chat_routing_gen:{document_upload_id}:{model_name}"
+
+
+# Writes parts (ARGV[4..], name/value pairs) only while the generation is still
+# the one read before Mongo was, so nothing read before an invalidation is
+# written after it. ARGV[1] is that generation, ARGV[2] "1" to replace the
+# entry rather than add to it, ARGV[3] the TTL. Returns 1 if written.
+WRITE_SCRIPT = """
+local generation = redis.call('GET', KEYS[2]) or '0'
+if generation ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '1' then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class ChatRoutingCache:
+    """
+    Read-through cache, in Redis, of the small routing data the chat and
+    explain paths need before calling OpenAI: the assistant and thread IDs, the
+    chat and its active conversation, per (document, model).
+
+    An entry is a hash with one BSON-encoded field per part (assistant, chat,
+    conversation), so ObjectIds and datetimes round-trip and a part can be
+    added with HSET without reading the rest back, which could otherwise write
+    back parts invalidated in between. Whoever `$push`es or `$pull`s
+    assistants, chats or conversations invalidates the entry, and the next
+    request reads Mongo and repopulates it.
+
+    Invalidating also bumps a generation counter. Readers take the
+    `generation()` before reading Mongo and pass it to `set()`/`update()`,
+    which write only if no invalidation happened in between, so a slow reader
+    can't put back what was just invalidated.
+    """
+
+    def __init__(
+        self,
+        redis_client: RedisType,
+        ttl_seconds: int = chat_routing_cache_settings.chat_routing_cache_ttl_seconds,
+    ):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self._write = self.redis_client.register_script(WRITE_SCRIPT)
+
+    async def generation(self, document_upload_id: str, model_name: ModelName) -> int:
+        """The entry's invalidation count; read it before reading Mongo."""
+        generation = await self.redis_client.get(
+            chat_routing_generation_key(document_upload_id, model_name)
+        )
+        return int(generation) if generation is not None else 0
+
+    async def get(
+        self, document_upload_id: str, model_name: ModelName
+    ) -> Optional[ChatRouting]:
+        fields = await self.redis_client.hgetall(
+            chat_routing_key(document_upload_id, model_name)
+        )
+        if not fields:
+            _count("misses")
+            return None
+        _count("hits")
+        parts = {}
+        for name, data in fields.items():
+            name = name.decode() if isinstance(name, bytes) else name
+            parts[name] = bson.decode(data)["value"]
+        return ChatRouting(**parts)
+
+    async def set(
+        self,
+        document_upload_id: str,
+        model_name: ModelName,
+        routing: ChatRouting,
+        generation: int,
+    ) -> bool:
+        """Replace the entry unless it was invalidated since `generation`."""
+        return await self._write_parts(
+            document_upload_id, model_name, routing, generation, replace=True
+        )
+
+    async def update(
+        self,
+        document_upload_id: str,
+        model_name: ModelName,
+        routing: ChatRouting,
+        generation: int,
+    ) -> bool:
+        """
+        Add or replace parts of an entry, leaving its other parts as they are,
+        unless it was invalidated since `generation`.
+        """
+        return await self._write_parts(
+            document_upload_id, model_name, routing, generation, replace=False
+        )
+
+    async def _write_parts(
+        self,
+        document_upload_id: str,
+        model_name: ModelName,
+        routing: ChatRouting,
+        generation: int,
+        replace: bool,
+    ) -> bool:
+        parts: List[Union[str, bytes]] = []
+        for name, data in _encode(routing).items():
+            parts += [name, data]
+        written = await self._write(
+            keys=[
+                chat_routing_key(document_upload_id, model_name),
+                chat_routing_generation_key(document_upload_id, model_name),
+            ],
+            args=[generation, "1" if replace else "0", self.ttl_seconds, *parts],
+        )
+        return bool(written)
+
+    async def invalidate(self, document_upload_id: str, model_name: ModelName) -> None:
+        _count("invalidations")
+        generation_key = chat_routing_generation_key(document_upload_id, model_name)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(generation_key)
+            # Outlives any reader that took the generation before this bump
+            pipe.expire(generation_key, self.ttl_seconds)
+            pipe.delete(chat_routing_key(document_upload_id, model_name))
+            await pipe.execute()
@@ -0,0 +1,154 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from config.environment import IngestionPipelineSettings
+from services.embedding_generator import EmbeddingGenerator
+from services.vector_sinks import ChunkSink
+from config.logger import get_logger
+
+logger = get_logger()
+
+pipeline_settings = IngestionPipelineSettings()
+
+# Marks the end of a stage's input
+_DONE: Any = object()
+
+
+class ChunkIndexingPipeline:
+    """
+    Streams chunks through bounded queues into embedding workers and then a
+    batch writer, so chunks become searchable while later ones are still being
+    produced and only a bounded number are held in memory.
+
+        chunks -> [queue] -> embedding workers -> [queue] -> writer -> sinks
+
+    Each batch is written to every sink concurrently. Chunks that already carry
+    a `vector` skip embedding.
+    """
+
+    def __init__(
+        self,
+        embedding_generator: EmbeddingGenerator,
+        sinks: Sequence[ChunkSink],
+        settings: IngestionPipelineSettings = pipeline_settings,
+    ):
+        self.embedding_generator = embedding_generator
+        self.sinks = list(sinks)
+        self.settings = settings
+        self.produced = 0
+        self.written: Dict[str, int] = {sink.name: 0 for sink in self.sinks}
+
+    async def run(self, chunks: AsyncIterator[Dict[str, Any]]) -> int:
+        """Write every chunk from `chunks` to the sinks; returns the number produced."""
+        await asyncio.gather(*(sink.prepare() for sink in self.sinks))
+
+        embed_queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(
+            self.settings.ingestion_queue_size
+        )
+        index_queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(
+            self.settings.ingestion_queue_size
+        )
+        workers = self.settings.ingestion_embed_workers
+
+        tasks = [
+            asyncio.create_task(self._produce(chunks, embed_queue, workers)),
+            *(
+                asyncio.create_task(self._embed(embed_queue, index_queue))
+                for _ in range(workers)
+            ),
+            asyncio.create_task(self._index(index_queue, workers)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.produced
+
+    async def _produce(
+        self,
+        chunks: AsyncIterator[Dict[str, Any]],
+        embed_queue: "asyncio.Queue[Dict[str, Any]]",
+        workers: int,
+    ) -> None:
+        async for chunk in chunks:
+            await embed_queue.put(chunk)
+            self.produced += 1
+        for _ in range(workers):
+            await embed_queue.put(_DONE)
+
+    async def _embed(
+        self,
+        embed_queue: "asyncio.Queue[Dict[str, Any]]",
+        index_queue: "asyncio.Queue[Dict[str, Any]]",
+    ) -> None:
+        done = False
+        while not done:
+            # Take whatever is already queued, up to a batch, without waiting for more
+            batch: List[Dict[str, Any]] = []
+            item = await embed_queue.get()
+            while item is not _DONE:
+                batch.append(item)
+                if (
+                    len(batch) >= self.settings.ingestion_embed_batch_size
+                    or embed_queue.empty()
+                ):
+                    break
+                item = embed_queue.get_nowait()
+            else:
+                done = True
+
+            pending = [chunk for chunk in batch if "vector" not in chunk]
+            if pending:
+                try:
+                    embeddings = (
+                        await self.embedding_generator.generate_embeddings_batch(
+                            [chunk["text"] for chunk in pending]
+                        )
+                    )
+                except Exception as e:
+                    # Continue with other batches rather than failing completely
+                    logger.error(
+                        f"Error generating embeddings for {len(pending)} chunks: {str(e)}"
+                    )
+                    batch = [chunk for chunk in batch if "vector" in chunk]
+                else:
+                    for chunk, embedding in zip(pending, embeddings):
+                        chunk["vector"] = embedding
+
+            for chunk in batch:
+                await index_queue.put(chunk)
+
+        await index_queue.put(_DONE)
+
+    async def _index(
+        self, index_queue: "asyncio.Queue[Dict[str, Any]]", workers: int
+    ) -> None:
+        finished = 0
+        buffer: List[Dict[str, Any]] = []
+        while finished < workers:
+            try:
+                item = await asyncio.wait_for(
+                    index_queue.get(), self.settings.ingestion_bulk_flush_interval
+                )
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _DONE:
+                finished += 1
+            elif item is not None:
+                buffer.append(item)
+
+            # Flush when full, when input stalls, or at the end
+            if buffer and (
+                item is None
+                or len(buffer) >= self.settings.ingestion_bulk_size
+                or finished == workers
+            ):
+                await self._write(buffer)
+                buffer = []
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        counts = await asyncio.gather(*(sink.write(batch) for sink in self.sinks))
+        for sink, count in zip(self.sinks, counts):
+            self.written[sink.name] += count
@@ -0,0 +1,97 @@
+import os
+import socket
+import time
+from typing import List, Optional, TYPE_CHECKING
+
+from config.redis import Redis
+from config.environment import WebSocketSettings
+from config.logger import get_logger
+
+logger = get_logger()
+
+if TYPE_CHECKING:
+    RedisType = Redis[bytes]
+else:
+    RedisType = Redis
+
+# Hash per connection of node id -> unix time its claim expires; a connection
+# can be held by several nodes at once, e.g. while a reconnect is in flight.
+REGISTRY_KEY_PREFIX = "websocket:connection_holders"
+
+# Sets this node's claim on each key to expire in ARGV[3] seconds, drops other
+# nodes' claims that have run out, and keeps each key as long as its newest claim.
+CLAIM_SCRIPT = """
+local now = tonumber(ARGV[2])
+local expires_at = now + tonumber(ARGV[3])
+for _, key in ipairs(KEYS) do
+    local holders = redis.call('HGETALL', key)
+    for i = 1, #holders, 2 do
+        if tonumber(holders[i + 1]) <= now then
+            redis.call('HDEL', key, holders[i])
+        end
+    end
+    redis.call('HSET', key, ARGV[1], expires_at)
+    redis.call('EXPIRE', key, ARGV[3])
+end
+return #KEYS
+"""
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ConnectionRegistry:
+    """
+    Records in Redis which API nodes hold each websocket connection.
+
+    A node claims a connection when a socket attaches and keeps its claim alive
+    while it holds the socket. Claims are per node, so a client reconnecting
+    through another node adds a holder instead of taking the connection over;
+    each node only gives up its own claim, when its socket goes away, and a
+    node that dies without releasing drops out once its claim expires.
+    """
+
+    def __init__(
+        self, redis_client: RedisType, settings: Optional[WebSocketSettings] = None
+    ):
+        self.redis_client = redis_client
+        self.settings = settings or WebSocketSettings()
+        self.node_id = self.settings.websocket_node_id or default_node_id()
+        self._claim = self.redis_client.register_script(CLAIM_SCRIPT)
+
+    def registry_key(self, connection_key: str) -> str:
+        return f"{REGISTRY_KEY_PREFIX}:{connection_key}"
+
+    async def _claim_keys(self, connection_keys: List[str]):
+        await self._claim(
+            keys=[self.registry_key(key) for key in connection_keys],
+            args=[
+                self.node_id,
+                int(time.time()),
+                self.settings.websocket_registry_ttl,
+            ],
+        )
+
+    async def register(self, connection_key: str):
+        """Add this node to the connection's holders."""
+        await self._claim_keys([connection_key])
+
+    async def unregister(self, connection_key: str):
+        await self.redis_client.hdel(self.registry_key(connection_key), self.node_id)
+
+    async def holders(self, connection_key: str) -> List[str]:
+        """Nodes whose claim on the connection hasn't expired."""
+        claims = await self.redis_client.hgetall(self.registry_key(connection_key))
+        now = time.time()
+        return [
+            node_id.decode() if isinstance(node_id, bytes) else node_id
+            for node_id, expires_at in claims.items()
+            if float(expires_at) > now
+        ]
+
+    async def refresh(self, connection_keys: List[str]):
+        """Extend this node's claims; other nodes' claims are left alone."""
+        if not connection_keys:
+            return
+        await self._claim_keys(connection_keys)
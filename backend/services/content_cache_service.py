@@ -0,0 +1,224 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config.mongo import TypedAsyncIOMotorDatabase
+from db.models.content_cache import (
+    Chunker,
+    chunk_set_key,
+    create_content_cache_chunk,
+    create_content_cache_entry,
+)
+from db.models.document_uploads import MongoDocumentUpload
+from config.logger import get_logger
+
+logger = get_logger()
+
+# Chunk fields that identify the document rather than the content, or are
+# derived after the fact; they are stripped before caching and rewritten for
+# the document that reuses a chunk. Embeddings are stored separately.
+DOCUMENT_SPECIFIC_CHUNK_FIELDS = (
+    "chunk_id",
+    "document_id",
+    "position_in_document",
+    "vector",
+    "embedding",
+)
+
+
+class ContentCacheService:
+    """
+    Ingestion results shared by every document upload with identical bytes.
+
+    Entries in `content_cache` are keyed by the SHA-256 of the S3 object.
+    Docling structured data and the OpenAI file ID live on the entry; chunks
+    with their embeddings live in `content_cache_chunks`, one row per chunk per
+    chunker and model. Entries aren't reference-counted: documents can't be
+    deleted yet, so nothing would ever release one.
+    """
+
+    def __init__(self, db: TypedAsyncIOMotorDatabase):
+        self.db = db
+
+    async def ensure_content_hash(
+        self,
+        document: MongoDocumentUpload,
+        hash_content: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        The document's content hash, computed by `hash_content` the first time,
+        and make sure its cache entry exists.
+        """
+        content_hash = document.get("content_hash")
+        if not content_hash:
+            content_hash = await hash_content()
+            await self.db.document_uploads.update_one(
+                {"_id": document["_id"]}, {"$set": {"content_hash": content_hash}}
+            )
+            document["content_hash"] = content_hash
+        entry = create_content_cache_entry(content_hash)
+        try:
+            await self.db.content_cache.update_one(
+                {"_id": content_hash},
+                {"$setOnInsert": {k: v for k, v in entry.items() if k != "_id"}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # A concurrent upload of the same content created the entry first
+            pass
+        return content_hash
+
+    async def get_openai_file_id(self, content_hash: str) -> Optional[str]:
+        entry = await self.db.content_cache.find_one(
+            {"_id": content_hash}, {"openai_file_id": 1}
+        )
+        return entry.get("openai_file_id") if entry else None
+
+    async def set_openai_file_id(self, content_hash: str, file_id: str) -> str:
+        """Record an uploaded file unless another upload won the race; returns the kept ID."""
+        entry = await self.db.content_cache.find_one_and_update(
+            {"_id": content_hash, "openai_file_id": None},
+            {"$set": {"openai_file_id": file_id}},
+            projection={"openai_file_id": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if entry is not None:
+            return file_id
+        return await self.get_openai_file_id(content_hash) or file_id
+
+    async def get_docling_structured_data(
+        self, content_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        entry = await self.db.content_cache.find_one(
+            {"_id": content_hash}, {"docling_structured_data": 1}
+        )
+        return entry.get("docling_structured_data") if entry else None
+
+    async def set_docling_structured_data(
+        self, content_hash: str, structured_data: Dict[str, Any]
+    ) -> None:
+        await self.db.content_cache.update_one(
+            {"_id": content_hash},
+            {"$set": {"docling_structured_data": structured_data}},
+        )
+
+    async def has_chunks(
+        self, content_hash: str, chunker: Chunker, embedding_model: str
+    ) -> bool:
+        """Whether a complete chunk set is cached for this chunker and model."""
+        entry = await self.db.content_cache.find_one(
+            {
+                "_id": content_hash,
+                "cached_chunk_sets": chunk_set_key(chunker, embedding_model),
+            },
+            {"_id": 1},
+        )
+        return entry is not None
+
+    async def get_cached_chunker(
+        self, content_hash: str, embedding_model: str
+    ) -> Optional[Chunker]:
+        """The chunker of the content's complete chunk set for the model, if any."""
+        entry = await self.db.content_cache.find_one(
+            {"_id": content_hash}, {"cached_chunk_sets": 1}
+        )
+        cached_chunk_sets = entry.get("cached_chunk_sets", []) if entry else []
+        chunkers: Tuple[Chunker, ...] = ("docling", "text")
+        return next(
+            (
+                chunker
+                for chunker in chunkers
+                if chunk_set_key(chunker, embedding_model) in cached_chunk_sets
+            ),
+            None,
+        )
+
+    async def iter_chunks(
+        self,
+        content_hash: str,
+        chunker: Chunker,
+        embedding_model: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        with_embeddings: bool = True,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Cached chunks with `start <= chunk_index < end`, in order, with their
+        embedding as `vector` unless `with_embeddings` is False. The range is a
+        single scan of the (content, chunker, model, chunk_index) index.
+        """
+        chunk_index: Dict[str, int] = {"$gte": start}
+        if end is not None:
+            chunk_index["$lt"] = end
+        cursor = self.db.content_cache_chunks.find(
+            {
+                "content_hash": content_hash,
+                "chunker": chunker,
+                "embedding_model": embedding_model,
+                "chunk_index": chunk_index,
+            },
+            None if with_embeddings else {"embedding": 0},
+        ).sort("chunk_index", 1)
+        async for row in cursor:
+            if with_embeddings:
+                yield {**row["chunk"], "vector": row["embedding"]}
+            else:
+                yield row["chunk"]
+
+    async def mark_chunks_cached(
+        self, content_hash: str, chunker: Chunker, embedding_model: str
+    ) -> None:
+        """Call once every chunk is stored, so readers never see a partial set."""
+        await self.db.content_cache.update_one(
+            {"_id": content_hash},
+            {
+                "$addToSet": {
+                    "cached_chunk_sets": chunk_set_key(chunker, embedding_model)
+                }
+            },
+        )
+
+    async def store_chunks(
+        self,
+        content_hash: str,
+        chunker: Chunker,
+        embedding_model: str,
+        chunks: List[Dict[str, Any]],
+    ) -> None:
+        """Cache a batch of chunks, each carrying its embedding as `vector`."""
+        rows = [
+            create_content_cache_chunk(
+                content_hash=content_hash,
+                chunker=chunker,
+                embedding_model=embedding_model,
+                chunk_index=chunk["chunk_index"],
+                chunk={
+                    k: v
+                    for k, v in chunk.items()
+                    if k not in DOCUMENT_SPECIFIC_CHUNK_FIELDS
+                },
+                embedding=chunk["vector"],
+            )
+            for chunk in chunks
+        ]
+        if not rows:
+            return
+        try:
+            await self.db.content_cache_chunks.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates mean a concurrent ingestion of the same content got there first
+            if any(
+                error.get("code") != 11000
+                for error in e.details.get("writeErrors", [])
+            ):
+                raise
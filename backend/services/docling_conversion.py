@@ -0,0 +1,729 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, UTC
+from multiprocessing.queues import SimpleQueue
+from typing import (
+    List,
+    Dict,
+    Any,
+    Callable,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import pypdfium2 as pdfium
+from docling.chunking import HybridChunker
+from docling.datamodel.base_models import DocumentStream
+from docling.document_converter import DocumentConverter
+from docling_core.types.doc import DoclingDocument
+
+from config.environment import WorkerSettings
+from config.logger import get_logger, setup_logging
+from services.docling_models import (
+    get_document_converter,
+    get_chunker,
+    warm_up_docling,
+)
+from services.document_source import DoclingInput
+
+logger = get_logger()
+
+worker_settings = WorkerSettings()
+
+
+class DoclingConversionTimeout(Exception):
+    pass
+
+
+class DoclingExtractor:
+    """
+    The CPU-bound half of Docling processing: converting a file and turning the
+    resulting DoclingDocument into structured data and chunks. Holds no
+    connections, so conversion can run inside a conversion pool process.
+    """
+
+    @property
+    def converter(self) -> DocumentConverter:
+        return get_document_converter()
+
+    @property
+    def chunker(self) -> HybridChunker:
+        return get_chunker()
+
+    def convert_file(self, source: DoclingInput) -> Dict[str, Any]:
+        """Convert a file with Docling and extract its structured data."""
+        return self.analyze(self.convert_pages(source))
+
+    def convert_pages(
+        self, source: DoclingInput, page_range: Optional[Tuple[int, int]] = None
+    ) -> DoclingDocument:
+        """Convert a file, or only the given 1-based inclusive page range of a PDF."""
+        if isinstance(source, tuple):
+            name, data = source
+            source = DocumentStream(name=name, stream=io.BytesIO(data))  # type: ignore[assignment]
+        if page_range is None:
+            conversion_result = self.converter.convert(source)
+        else:
+            conversion_result = self.converter.convert(source, page_range=page_range)
+        return conversion_result.document
+
+    def analyze(self, docling_doc: DoclingDocument) -> Dict[str, Any]:
+        if logger.isEnabledFor(logging.DEBUG):
+            for item, level in docling_doc.iterate_items():
+                logger.debug(f"Item type: {type(item)}, Level: {level}")
+
+        return {
+            # Extract structured data from the document
+            "structured_data": self._extract_structured_data(docling_doc),
+            # Chunked later, as a stream, by whoever indexes it
+            "document": docling_doc,
+        }
+
+    def _extract_structured_data(self, docling_doc) -> Dict[str, Any]:
+        """Extract structured data from Docling document including document outline."""
+        # Initialize with safe defaults
+        structured_data = {
+            "title": "Untitled Document",
+            "num_pages": 0,
+            "headings": [],
+            "tables_count": 0,
+            "tables": [],
+            "figures_count": 0,
+            "figures": [],
+            "document_metadata": {},
+            "outline": [],  # New field for document outline/skeleton
+            "processed_at": datetime.now(UTC).isoformat(),
+        }
+
+        # Extract document metadata
+        if hasattr(docling_doc, "origin"):
+            try:
+                metadata = {}
+                if hasattr(docling_doc.origin, "model_dump"):
+                    metadata = docling_doc.origin.model_dump()
+                elif hasattr(docling_doc.origin, "dict"):
+                    metadata = docling_doc.origin.dict()
+                else:
+                    # Extract individual attributes
+                    for attr in ["mimetype", "binary_hash", "filename", "uri"]:
+                        if hasattr(docling_doc.origin, attr):
+                            metadata[attr] = getattr(docling_doc.origin, attr)
+                            if attr == "binary_hash" and metadata[attr] is not None:
+                                metadata[attr] = str(metadata[attr])
+                structured_data["document_metadata"] = metadata
+            except Exception as e:
+                logger.warning(f"Error extracting metadata: {str(e)}")
+
+        # Get document title
+        if hasattr(docling_doc, "name") and docling_doc.name:
+            structured_data["title"] = docling_doc.name
+
+        # Get number of pages
+        if hasattr(docling_doc, "num_pages"):
+            try:
+                # Check if it's a method or an attribute
+                if callable(docling_doc.num_pages):
+                    structured_data["num_pages"] = docling_doc.num_pages()
+                else:
+                    structured_data["num_pages"] = docling_doc.num_pages
+            except Exception as e:
+                logger.warning(f"Error getting page count: {str(e)}")
+
+        # Extract document outline/skeleton
+        outline = self._extract_document_outline(docling_doc)
+        structured_data["outline"] = outline
+
+        # Extract headings from the outline for backward compatibility
+        structured_data["headings"] = [
+            item["text"]
+            for item in outline
+            if item["type"] in ["title", "section_header"]
+        ]
+
+        # Extract table data
+        if hasattr(docling_doc, "tables"):
+            try:
+                tables = list(docling_doc.tables)
+                structured_data["tables_count"] = len(tables)
+
+                for table in tables:
+                    table_info = {"caption": "", "rows": 0, "cols": 0, "data": []}
+
+                    # Get caption_text
+                    if hasattr(table, "caption_text") and callable(table.caption_text):
+                        try:
+                            table_info["caption"] = table.caption_text(docling_doc)
+                        except Exception:
+                            if hasattr(table, "captions") and table.captions:
+                                # Try to get first caption
+                                table_info["caption"] = "Table Caption"
+
+                    # Try to get table data
+                    if hasattr(table, "data") and table.data:
+                        try:
+                            if hasattr(table.data, "__iter__"):
+                                table_data = []
+                                for row_idx, row in enumerate(table.data):
+                                    if hasattr(row, "__iter__"):
+                                        row_data = []
+                                        for col_idx, cell in enumerate(row):
+                                            cell_text = (
+                                                str(cell) if cell is not None else ""
+                                            )
+                                            row_data.append(cell_text)
+                                        table_data.append(row_data)
+
+                                if table_data:
+                                    table_info["data"] = table_data
+                                    table_info["rows"] = len(table_data)
+                                    table_info["cols"] = (
+                                        max(len(row) for row in table_data)
+                                        if table_data
+                                        else 0
+                                    )
+                        except Exception as e:
+                            logger.warning(f"Error extracting table data: {str(e)}")
+
+                    structured_data["tables"].append(table_info)
+            except Exception as e:
+                logger.warning(f"Error processing tables: {str(e)}")
+
+        # Extract figure data
+        if hasattr(docling_doc, "pictures"):
+            try:
+                figures = list(docling_doc.pictures)
+                structured_data["figures_count"] = len(figures)
+
+                for figure in figures:
+                    figure_info = {"caption": "", "image_info": {}}
+
+                    # Get caption_text
+                    if hasattr(figure, "caption_text") and callable(
+                        figure.caption_text
+                    ):
+                        try:
+                            figure_info["caption"] = figure.caption_text(docling_doc)
+                        except Exception:
+                            if hasattr(figure, "captions") and figure.captions:
+                                # Try to get first caption
+                                figure_info["caption"] = "Figure Caption"
+
+                    # Try to get image details
+                    if hasattr(figure, "image") and figure.image:
+                        try:
+                            if hasattr(figure.image, "width") and hasattr(
+                                figure.image, "height"
+                            ):
+                                figure_info["image_info"]["width"] = figure.image.width
+                                figure_info["image_info"][
+                                    "height"
+                                ] = figure.image.height
+
+                            # Try to get other potentially useful image properties
+                            for attr in ["format", "page", "dpi"]:
+                                if hasattr(figure.image, attr):
+                                    value = getattr(figure.image, attr)
+                                    if value is not None:
+                                        figure_info["image_info"][attr] = value
+                        except Exception as e:
+                            logger.warning(f"Error extracting image details: {str(e)}")
+
+                    structured_data["figures"].append(figure_info)
+            except Exception as e:
+                logger.warning(f"Error processing figures: {str(e)}")
+
+        return structured_data
+
+    def _extract_document_outline(self, docling_doc) -> List[Dict[str, Any]]:
+        """
+        Extract document outline/skeleton from Docling document.
+
+        Creates a hierarchical representation of the document structure,
+        including title, sections, subsections, and their page numbers.
+        """
+        outline = []
+        current_section_stack = []  # Track section nesting using a stack
+        item_counter = 0  # Global counter for unique IDs
+
+        # First pass: collect all section headers and their levels
+        for item, level in docling_doc.iterate_items():
+            item_type = type(item).__name__
+
+            # Extract page number from item's provenance if available
+            page_number = None
+            if hasattr(item, "prov") and item.prov:
+                for prov in item.prov:
+                    if hasattr(prov, "page_no"):
+                        page_number = prov.page_no
+                        break
+
+            # Process title and section headers for the outline
+            if (
+                item_type == "TitleItem"
+                or hasattr(item, "label")
+                and item.label == "title"
+            ):
+                outline_item = {
+                    "id": f"outline_item_{item_counter}",  # Use global counter
+                    "type": "title",
+                    "text": item.text if hasattr(item, "text") else "Untitled",
+                    "level": 0,  # Title is always top level
+                    "page_number": page_number or 1,  # Default to page 1 if not found
+                    "parent_id": None,  # Titles are top-level
+                }
+                item_counter += 1
+                outline.append(outline_item)
+
+            elif item_type == "SectionHeaderItem" or (
+                hasattr(item, "label") and item.label == "section_header"
+            ):
+                # Get section level (defaults to 1 if not available)
+                section_level = (
+                    getattr(item, "level", 1) if hasattr(item, "level") else 1
+                )
+
+                outline_item = {
+                    "id": f"outline_item_{item_counter}",  # Use global counter
+                    "type": "section_header",
+                    "text": item.text if hasattr(item, "text") else "Untitled Section",
+                    "level": section_level,
+                    "page_number": page_number or 1,  # Default to page 1 if not found
+                    "parent_id": None,  # Will be set below if there's a parent
+                }
+                item_counter += 1
+
+                # Update the section stack based on the current section's level
+                while (
+                    current_section_stack
+                    and current_section_stack[-1]["level"] >= section_level
+                ):
+                    current_section_stack.pop()
+
+                # Set parent_id if we have a parent section
+                if current_section_stack:
+                    outline_item["parent_id"] = current_section_stack[-1]["id"]
+
+                # Add to outline and update the stack
+                outline.append(outline_item)
+                current_section_stack.append(outline_item)
+
+            # Optionally track other significant elements like tables and figures
+            elif item_type == "TableItem" or (
+                hasattr(item, "label") and item.label == "table"
+            ):
+                caption = (
+                    item.caption_text(docling_doc)
+                    if hasattr(item, "caption_text") and callable(item.caption_text)
+                    else ""
+                )
+
+                table_item = {
+                    "id": f"outline_item_{item_counter}",  # Use global counter
+                    "type": "table",
+                    "text": f"Table: {caption}",
+                    "page_number": page_number or 1,  # Default to page 1 if not found
+                    "parent_id": (
+                        current_section_stack[-1]["id"]
+                        if current_section_stack
+                        else None
+                    ),
+                }
+                item_counter += 1
+                outline.append(table_item)
+
+            elif item_type == "PictureItem" or (
+                hasattr(item, "label") and item.label == "picture"
+            ):
+                caption = (
+                    item.caption_text(docling_doc)
+                    if hasattr(item, "caption_text") and callable(item.caption_text)
+                    else ""
+                )
+
+                figure_item = {
+                    "id": f"outline_item_{item_counter}",  # Use global counter
+                    "type": "figure",
+                    "text": f"Figure: {caption}",
+                    "page_number": page_number or 1,  # Default to page 1 if not found
+                    "parent_id": (
+                        current_section_stack[-1]["id"]
+                        if current_section_stack
+                        else None
+                    ),
+                }
+                item_counter += 1
+                outline.append(figure_item)
+
+        # Return the flat outline with explicit parent-child relationships
+        return outline
+
+    def _flatten_outline(self, nested_outline, parent_id=None, result=None):
+        """
+        Convert a nested outline to a flat list with parent/child relationships.
+        This format may be easier to work with in some applications.
+        """
+        if result is None:
+            result = []
+
+        for item in nested_outline:
+            # Create a copy without the children
+            flat_item = {k: v for k, v in item.items() if k != "children"}
+            flat_item["parent_id"] = parent_id
+
+            result.append(flat_item)
+
+            # Process children recursively
+            if "children" in item and item["children"]:
+                self._flatten_outline(item["children"], item["id"], result)
+
+        return result
+
+    def iter_chunks(self, docling_doc, document_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily create chunks from Docling document using the HybridChunker.
+
+        The total isn't known while streaming, so `position_in_document` is left
+        unset; set it once every chunk has been produced.
+        """
+        # Get chunks from the document using the Docling chunker, one at a time
+        doc_chunks = self.chunker.chunk(docling_doc)
+
+        # Process each chunk
+        for i, chunk in enumerate(doc_chunks):
+            # Get chunk text using the serialize method of the chunker
+            text = self.chunker.serialize(chunk)
+
+            # Extract metadata
+            metadata = {}
+            if hasattr(chunk, "metadata") and chunk.metadata:
+                # Convert metadata to a serializable format
+                metadata = self._ensure_serializable(chunk.metadata)
+
+            # Extract headings path if available in chunk
+            heading_path = []
+            if hasattr(chunk, "heading_path"):
+                heading_path = chunk.heading_path
+            elif (
+                hasattr(chunk, "metadata")
+                and chunk.metadata
+                and "headings" in chunk.metadata
+            ):
+                heading_path = chunk.metadata["headings"]
+
+            # Extract page number if available
+            page_number = None
+            if hasattr(chunk, "page_no"):
+                page_number = chunk.page_no
+            elif (
+                hasattr(chunk, "metadata")
+                and chunk.metadata
+                and "page_no" in chunk.metadata
+            ):
+                page_number = chunk.metadata["page_no"]
+
+            # Create chunk data
+            chunk_data = {
+                "chunk_id": f"{document_id}_chunk_{i}",
+                "document_id": document_id,
+                "text": text,
+                "heading_path": heading_path if heading_path else [],
+                "chunk_index": i,
+                "chunk_type": (
+                    getattr(chunk, "label", "text")
+                    if hasattr(chunk, "label")
+                    else "text"
+                ),
+                "page_number": page_number,
+                "section_path": (
+                    "/".join(str(h) for h in heading_path) if heading_path else ""
+                ),
+                "position_in_document": None,  # Set to 0-1 once the total is known
+                "metadata": metadata,
+            }
+
+            yield chunk_data
+
+    def _ensure_serializable(self, obj):
+        """Make sure objects are serializable for MongoDB and handle large integers."""
+        if hasattr(obj, "model_dump"):
+            # For Pydantic v2
+            return self._ensure_serializable(obj.model_dump())
+        elif hasattr(obj, "dict"):
+            # For Pydantic v1
+            return self._ensure_serializable(obj.dict())
+        elif isinstance(obj, dict):
+            return {k: self._ensure_serializable(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [self._ensure_serializable(item) for item in obj]
+        elif isinstance(obj, (str, float, bool, type(None))):
+            return obj
+        elif isinstance(obj, int):
+            # Handle large integers that exceed MongoDB's 8-byte limit
+            try:
+                # Check if the int fits within MongoDB's limits
+                # Max 64-bit signed int: 9,223,372,036,854,775,807
+                if obj > 9223372036854775807 or obj < -9223372036854775808:
+                    # Convert to string if too large
+                    return str(obj)
+                return obj
+            except OverflowError:
+                # Handle any overflow errors by converting to string
+                return str(obj)
+        else:
+            # For any other objects, convert to string representation
+            return str(obj)
+
+
+# In a conversion process: where it reports the jobs it starts and finishes
+_job_events: Optional[SimpleQueue] = None
+
+
+def _init_conversion_process(job_events: SimpleQueue) -> None:
+    global _job_events
+    _job_events = job_events
+    setup_logging()
+    warm_up_docling()
+
+
+def _run_job(token: str, fn: Callable[..., Any], *args: Any) -> Any:
+    # Lets the parent find, and kill, the process of a job that times out
+    assert _job_events is not None
+    _job_events.put((token, os.getpid()))
+    try:
+        return fn(*args)
+    finally:
+        _job_events.put((token, None))
+
+
+def _convert_in_pool(source: DoclingInput) -> Dict[str, Any]:
+    return DoclingExtractor().convert_file(source)
+
+
+def _convert_pages_in_pool(
+    source: DoclingInput, page_range: Tuple[int, int]
+) -> DoclingDocument:
+    return DoclingExtractor().convert_pages(source, page_range)
+
+
+def _merge_in_pool(
+    docs: Sequence[DoclingDocument], num_pages: int
+) -> Dict[str, Any]:
+    # Page ranges are contiguous, so concatenation keeps the original page
+    # numbers; the outline, tables and figures are then extracted from the
+    # merged document exactly as for a single-pass conversion.
+    merged = DoclingDocument.concatenate(docs)
+    # concatenate() starts from a blank document, so the title and file
+    # metadata come from the first page range, which has the same source
+    merged.name = docs[0].name
+    merged.origin = docs[0].origin
+    if merged.num_pages() != num_pages:
+        logger.warning(
+            f"Merged document has {merged.num_pages()} pages, expected {num_pages}"
+        )
+    return DoclingExtractor().analyze(merged)
+
+
+def count_pdf_pages(source: DoclingInput) -> Optional[int]:
+    """Page count of a PDF, or None if the file isn't one."""
+    try:
+        # pdfium reads a path or the bytes themselves
+        pdf = pdfium.PdfDocument(source[1] if isinstance(source, tuple) else source)
+    except pdfium.PdfiumError:
+        return None
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def split_page_ranges(num_pages: int, range_size: int) -> List[Tuple[int, int]]:
+    return [
+        (start, min(start + range_size - 1, num_pages))
+        for start in range(1, num_pages + 1, range_size)
+    ]
+
+
+# One conversion pool per worker process, shared by all of its worker threads.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Job starts and finishes reported by the current pool's processes
+_pool_job_events: Optional[SimpleQueue] = None
+# Token -> pid of the jobs reported started and not yet finished
+_running_job_pids: Dict[str, int] = {}
+
+# A conversion whose pool broke under it (another document's timed-out job
+# was killed, or a process crashed) is retried this many times on a new pool.
+CONVERSION_POOL_RETRIES = 1
+
+
+def get_conversion_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_job_events
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the worker holds a running loop and open sockets
+                context = multiprocessing.get_context("spawn")
+                _pool_job_events = context.SimpleQueue()
+                _pool = ProcessPoolExecutor(
+                    max_workers=worker_settings.docling_pool_processes,
+                    mp_context=context,
+                    initializer=_init_conversion_process,
+                    initargs=(_pool_job_events,),
+                )
+                _running_job_pids.clear()
+    return _pool
+
+
+def _discard_conversion_pool(pool: ProcessPoolExecutor) -> None:
+    """Stop handing out a broken pool; the next conversion starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill_jobs(tokens: Sequence[str]) -> None:
+    """
+    Kill the processes still running any of the given jobs. This breaks their
+    pool, so it is discarded; conversions of other documents that were in it
+    are retried on the next one.
+    """
+    with _pool_lock:
+        pool, job_events = _pool, _pool_job_events
+        if job_events is not None:
+            while not job_events.empty():
+                token, pid = job_events.get()
+                if pid is None:
+                    _running_job_pids.pop(token, None)
+                else:
+                    _running_job_pids[token] = pid
+        pids = {
+            _running_job_pids.pop(token)
+            for token in tokens
+            if token in _running_job_pids
+        }
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    if pids and pool is not None:
+        _discard_conversion_pool(pool)
+
+
+def shutdown_conversion_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def warm_up_conversion_pool() -> None:
+    """Start every conversion process now; each loads its models on startup."""
+    pool = get_conversion_pool()
+    wait(
+        [
+            pool.submit(int)
+            for _ in range(worker_settings.docling_pool_processes)
+        ]
+    )
+    logger.info(
+        f"Docling conversion pool ready with {worker_settings.docling_pool_processes} processes"
+    )
+
+
+async def _run_in_pool(
+    tokens: List[str], fn: Callable[..., Any], *args: Any
+) -> Any:
+    """Run a job in the conversion pool, recording its token in `tokens`."""
+    pool = get_conversion_pool()
+    token = uuid.uuid4().hex
+    tokens.append(token)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, _run_job, token, fn, *args
+        )
+    except BrokenProcessPool:
+        _discard_conversion_pool(pool)
+        raise
+
+
+async def _convert_document_once(
+    source: DoclingInput, document_id: str, tokens: List[str]
+) -> Dict[str, Any]:
+    num_pages = await asyncio.to_thread(count_pdf_pages, source)
+    if num_pages is None or num_pages < worker_settings.docling_page_parallel_min_pages:
+        return await _run_in_pool(tokens, _convert_in_pool, source)
+
+    page_ranges = split_page_ranges(num_pages, worker_settings.docling_page_range_size)
+    logger.info(
+        f"Converting {num_pages} pages of document {document_id} in {len(page_ranges)} page ranges"
+    )
+    docs = await asyncio.gather(
+        *(
+            _run_in_pool(tokens, _convert_pages_in_pool, source, page_range)
+            for page_range in page_ranges
+        )
+    )
+    return await _run_in_pool(tokens, _merge_in_pool, docs, num_pages)
+
+
+async def _convert_document(
+    source: DoclingInput, document_id: str, tokens: List[str]
+) -> Dict[str, Any]:
+    retries = 0
+    while True:
+        try:
+            return await _convert_document_once(source, document_id, tokens)
+        except BrokenProcessPool:
+            if retries >= CONVERSION_POOL_RETRIES:
+                raise
+            retries += 1
+            logger.warning(
+                f"Conversion pool broke while converting document {document_id}; retrying on a new pool"
+            )
+
+
+async def convert_document(
+    source: DoclingInput,
+    document_id: str,
+    timeout: Optional[float] = worker_settings.docling_conversion_timeout,
+) -> Dict[str, Any]:
+    """
+    Convert a document, given as a path or as (name, bytes), in the conversion
+    pool without blocking the running loop. Returns its `structured_data` and the converted DoclingDocument as
+    `document`, ready for `DoclingExtractor.iter_chunks`.
+
+    PDFs of at least `docling_page_parallel_min_pages` pages are split into
+    page ranges that convert in parallel across the pool, then merged.
+
+    On timeout only the processes running this document's jobs are killed;
+    other documents' conversions that were in the pool are retried.
+    """
+    # Tokens of this document's pool jobs, to kill only its own processes
+    tokens: List[str] = []
+    try:
+        return await asyncio.wait_for(
+            _convert_document(source, document_id, tokens), timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Docling conversion of document {document_id} exceeded {timeout}s, killing its conversion processes"
+        )
+        _kill_jobs(tokens)
+        raise DoclingConversionTimeout(
+            f"Docling conversion of document {document_id} timed out after {timeout}s"
+        )
@@ -0,0 +1,60 @@
+import threading
+from typing import Optional
+
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.chunking import HybridChunker
+from docling.datamodel.base_models import InputFormat
+from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
+
+from config.logger import get_logger
+
+logger = get_logger()
+
+# Building a converter loads the layout and table-structure models and building
+# a chunker loads its tokenizer, which takes seconds. Both are created once per
+# process and shared by every task running in it.
+_converter: Optional[DocumentConverter] = None
+_chunker: Optional[HybridChunker] = None
+_lock = threading.Lock()
+
+
+def get_document_converter() -> DocumentConverter:
+    global _converter
+    if _converter is None:
+        with _lock:
+            if _converter is None:
+                _converter = DocumentConverter(
+                    format_options={
+                        InputFormat.PDF: PdfFormatOption(
+                            pipeline_cls=StandardPdfPipeline,
+                            backend=PyPdfiumDocumentBackend,
+                        ),
+                    },
+                )
+    return _converter
+
+
+def get_chunker() -> HybridChunker:
+    global _chunker
+    if _chunker is None:
+        with _lock:
+            if _chunker is None:
+                # The token length warning is a "false alarm" according to Docling docs
+                _chunker = HybridChunker(
+                    granularity="paragraph",  # Can be "section", "paragraph", "sentence"
+                    add_metadata=True,  # Include metadata for each chunk
+                )
+    return _chunker
+
+
+def warm_up_docling() -> None:
+    """
+    Load the converter's PDF pipeline models and the chunker's tokenizer now,
+    so the first document a worker picks up doesn't pay for it.
+    """
+    converter = get_document_converter()
+    with _lock:
+        converter.initialize_pipeline(InputFormat.PDF)
+    get_chunker()
+    logger.info("Docling models loaded")
@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from config.mongo import TypedAsyncIOMotorDatabase
+from db.models.content_cache import Chunker
+from services.content_cache_service import ContentCacheService
+from config.logger import get_logger
+
+logger = get_logger()
+
+# Chunk IDs per Pinecone fetch request
+PINECONE_FETCH_SIZE = 100
+
+
+class DocumentChunkStore:
+    """
+    A document's chunks in `chunk_index` order, for reading all or a range of
+    them without a similarity search.
+
+    Ingestion already writes every chunk to `content_cache_chunks`, keyed by
+    the document's content hash and unique on (content, chunker, model,
+    chunk_index), so ranges are read straight off that index. Only a complete
+    chunk set is read, and embeddings are left behind.
+
+    Documents ingested before the content cache existed have no chunk set.
+    Given a `pinecone_index`, their chunks are fetched from it by ID instead;
+    ingestion names them `{document_id}_chunk_{i}`, so they too come in order
+    without a similarity search.
+    """
+
+    def __init__(
+        self,
+        db: TypedAsyncIOMotorDatabase,
+        embedding_model: str,
+        pinecone_index: Optional[Any] = None,
+    ):
+        self.db = db
+        self.embedding_model = embedding_model
+        self.content_cache = ContentCacheService(db)
+        # A pinecone.Index; the client is synchronous, so calls go to a thread
+        self.pinecone_index = pinecone_index
+
+    async def _chunk_set(self, document_id: str) -> Optional[Tuple[str, Chunker]]:
+        document = await self.db.document_uploads.find_one(
+            {"_id": ObjectId(document_id)}, {"content_hash": 1}
+        )
+        if not document:
+            raise ValueError(f"Document with ID {document_id} not found")
+        content_hash = document.get("content_hash")
+        chunker = (
+            await self.content_cache.get_cached_chunker(
+                content_hash, self.embedding_model
+            )
+            if content_hash
+            else None
+        )
+        if content_hash is None or chunker is None:
+            return None
+        return content_hash, chunker
+
+    async def iter_chunks(
+        self, document_id: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Chunks with `start <= chunk_index < end`, streamed in order."""
+        chunk_set = await self._chunk_set(document_id)
+        if chunk_set is None:
+            if self.pinecone_index is None:
+                raise ValueError(
+                    f"Document {document_id} has no indexed {self.embedding_model} chunks"
+                )
+            logger.info(
+                f"Document {document_id} has no cached chunk set; reading Pinecone"
+            )
+            async for chunk in self._iter_pinecone_chunks(document_id, start, end):
+                yield chunk
+            return
+
+        content_hash, chunker = chunk_set
+        async for chunk in self.content_cache.iter_chunks(
+            content_hash,
+            chunker,
+            self.embedding_model,
+            start=start,
+            end=end,
+            with_embeddings=False,
+        ):
+            yield {
+                **chunk,
+                "chunk_id": f"{document_id}_chunk_{chunk['chunk_index']}",
+                "document_id": document_id,
+            }
+
+    async def _iter_pinecone_chunks(
+        self, document_id: str, start: int, end: Optional[int]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        index = start
+        while end is None or index < end:
+            batch_end = index + PINECONE_FETCH_SIZE
+            if end is not None:
+                batch_end = min(batch_end, end)
+            chunk_ids = [f"{document_id}_chunk_{i}" for i in range(index, batch_end)]
+            response = await asyncio.to_thread(
+                self.pinecone_index.fetch, ids=chunk_ids
+            )
+            for chunk_id in chunk_ids:
+                vector = response.vectors.get(chunk_id)
+                if vector is None:
+                    # Chunk indexes are contiguous, so the first gap is the end
+                    return
+                metadata = vector.metadata
+                yield {
+                    "chunk_id": chunk_id,
+                    "document_id": document_id,
+                    # Pinecone stores numbers as floats
+                    "chunk_index": int(metadata["chunk_index"]),
+                    "text": metadata["text"],
+                }
+            index = batch_end
+
+    async def get_chunks(
+        self, document_id: str, start: int = 0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        return [chunk async for chunk in self.iter_chunks(document_id, start, end)]
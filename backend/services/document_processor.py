@@ -1,18 +1,10 @@
-import asyncio
-from bson import ObjectId
-from typing import List, Dict, Tuple, Any, Union, TypedDict
+from typing import List, Tuple, Optional
 import re
 from pinecone import Pinecone, ServerlessSpec
-from config.mongo import TypedAsyncIOMotorDatabase, AsyncIOMotorCollection
-from db.models.document_uploads import MongoDocumentUpload
 from config.ai_models import ModelPairConfig
 from services.embedding_generator import EmbeddingGenerator
-from services.openai_assistant_service import OpenAIAssistantService
-from config.environment import OpenAISettings
-
-openai_settings = OpenAISettings()
-
-from config.ai_models import DEFAULT_MODEL_CONFIGS
+from services.embedding_cache import EmbeddingCache
+from config.redis import RedisType
 
 import logging
 
@@ -22,31 +14,40 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class ProcessedChunk(TypedDict):
-    chunk_id: str
-    text: str
-    token_count: int
-    embedding: List[Union[float, str]]
-
-
 class DocumentProcessor:
+    """
+    The token-based text chunker used for documents Docling can't convert, and
+    the Pinecone index for the model pair. Ingestion itself is staged by
+    `DocumentIngestionPipeline`.
+    """
+
     def __init__(
         self,
         openai_api_key: str,
         pinecone_api_key: str,
         model_pair_config: ModelPairConfig,
-        db: TypedAsyncIOMotorDatabase,
+        redis_client: Optional[RedisType] = None,
     ):
         self.model_pair_config = model_pair_config
+        embedding_model = model_pair_config["embedding_model"]
         self.embedding_generator = EmbeddingGenerator(
-            openai_api_key, model_pair_config["embedding_model"]["model_name"]
+            openai_api_key,
+            embedding_model["model_name"],
+            cache=(
+                EmbeddingCache(
+                    redis_client,
+                    embedding_model["model_name"],
+                    embedding_model["dimension"],
+                )
+                if redis_client is not None
+                else None
+            ),
         )
         self.pinecone_client = Pinecone(api_key=pinecone_api_key)
         self.index_name = model_pair_config["pinecone"]["index_name"]
-        self.ensure_pinecone_index()
-        self.db = db
 
     def ensure_pinecone_index(self):
+        """Create the index if needed; blocking, so call it from a thread."""
         if self.index_name not in self.pinecone_client.list_indexes().names():
             self.pinecone_client.create_index(
                 name=self.index_name,
@@ -56,30 +57,6 @@ class DocumentProcessor:
             )
         self.index = self.pinecone_client.Index(self.index_name)
 
-    async def process_document(self, document_id: str) -> List[ProcessedChunk]:
-        obj_id = ObjectId(document_id)
-        collection: AsyncIOMotorCollection[MongoDocumentUpload] = (
-            self.db.document_uploads
-        )
-        document = await collection.find_one({"_id": obj_id})
-        if not document:
-            raise ValueError(
-                f"Document Processor: Document with ID {document_id} not found"
-            )
-        input_text = document["extracted_text"]
-        chunks = await self.chunk_text(input_text)
-        # TODO: Grab default model config for user
-        openai_assistant_service = OpenAIAssistantService(
-            openai_api_key=openai_settings.openai_api_key
-        )
-        assistant_details = await openai_assistant_service.create_assistant_thread(
-            model_config=DEFAULT_MODEL_CONFIGS["gpt-4o-mini"],
-            document=document,
-            mongo_collection=collection,
-        )
-        document["openai_assistants"].append(assistant_details)
-        return await self.process_chunks(chunks, document_id)
-
     async def chunk_text(self, text: str) -> List[Tuple[str, int]]:
         text = self._preprocess_text(text)
         text_chunks = self._split_text(text)
@@ -191,45 +168,3 @@ class DocumentProcessor:
                 if current_chunk:
                     result.append(current_chunk.strip())
         return result
-
-    async def process_chunks(
-        self, chunks: List[Tuple[str, int]], document_id: str
-    ) -> List[ProcessedChunk]:
-        chunk_texts = [chunk[0] for chunk in chunks]
-        token_counts = [chunk[1] for chunk in chunks]
-
-        embeddings = await self.embedding_generator.generate_embeddings_batch(
-            chunk_texts
-        )
-
-        vectors: List[Dict[str, Any]] = []
-        processed_chunks: List[ProcessedChunk] = []
-
-        for i, (chunk_text, token_count, embedding) in enumerate(
-            zip(chunk_texts, token_counts, embeddings)
-        ):
-            chunk_id = f"{document_id}_chunk_{i}"
-            metadata = {
-                "document_id": document_id,
-                "chunk_index": i,
-                "text": chunk_text,
-                "token_count": token_count,
-            }
-            vectors.append({"id": chunk_id, "values": embedding, "metadata": metadata})
-            processed_chunks.append(
-                ProcessedChunk(
-                    chunk_id=chunk_id,
-                    text=chunk_text,
-                    token_count=token_count,
-                    embedding=embedding[:5] + ["..."],
-                )
-            )
-
-        batch_size = (
-            100  # You might want to add this to model_pair_config['processing'] as well
-        )
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i : i + batch_size]
-            await asyncio.to_thread(self.index.upsert, vectors=batch)
-
-        return processed_chunks
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Optional, Tuple, Union
+
+from config.environment import IngestionPipelineSettings
+from config.s3 import AsyncS3Client
+from db.models.document_uploads import MongoDocumentUpload
+from utils.file_type_normalizer import mimetype_to_file_extension
+from config.logger import get_logger
+
+logger = get_logger()
+
+pipeline_settings = IngestionPipelineSettings()
+
+READ_SIZE = 1024 * 1024
+
+# What Docling is handed: a file path, or a (name, bytes) pair it can wrap in a
+# DocumentStream. Both pickle cheaply enough to send to a conversion process.
+DoclingInput = Union[str, Tuple[str, bytes]]
+
+
+def source_file_name(document: MongoDocumentUpload) -> str:
+    """The document's file name, with the extension its type requires."""
+    file_details = document["file_details"]
+    file_name = file_details["file_name"]
+    extension = mimetype_to_file_extension.get(file_details["file_type"])
+    # OpenAI and Docling both go by the extension, not the content
+    if extension and not file_name.lower().endswith(extension):
+        file_name += extension
+    return file_name
+
+
+class DocumentSource:
+    """
+    The bytes of one S3 object, read once and shared by every consumer in a job.
+
+    The object is streamed from S3 into memory up to `memory_limit` bytes; a
+    larger object spills to a private temp file, so no job holds more than
+    the limit in memory. Readers get independent file objects via `open()`.
+    The bytes are hashed as they arrive, so `content_hash` costs no extra read.
+    Use it as a context manager: the buffer and any spill file are released on
+    exit, including on error paths.
+    """
+
+    def __init__(self, name: str, memory_limit: int):
+        self.name = name
+        self.memory_limit = memory_limit
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._data: Optional[bytes] = None
+        self._spill_path: Optional[str] = None
+
+    @classmethod
+    async def from_s3(
+        cls,
+        s3_client: AsyncS3Client,
+        bucket: str,
+        key: str,
+        name: str,
+        memory_limit: int = pipeline_settings.ingestion_source_memory_limit,
+    ) -> "DocumentSource":
+        source = cls(name, memory_limit)
+        try:
+            response = await s3_client.get_object(Bucket=bucket, Key=key)
+            # Reading the body blocks, so it runs on the S3 threads too
+            await s3_client.run(source._fill, response["Body"])
+        except BaseException:
+            source.close()
+            raise
+        return source
+
+    @classmethod
+    async def for_document(
+        cls, s3_client: AsyncS3Client, document: MongoDocumentUpload
+    ) -> "DocumentSource":
+        return await cls.from_s3(
+            s3_client,
+            document["file_details"]["s3_bucket"],
+            document["file_details"]["file_key"],
+            source_file_name(document),
+        )
+
+    def _fill(self, body: BinaryIO) -> None:
+        spill: Optional[BinaryIO] = None
+        try:
+            while block := body.read(READ_SIZE):
+                self.size += len(block)
+                self._digest.update(block)
+                if spill is None and self.size > self.memory_limit:
+                    spill = self._spill()
+                (spill or self._buffer).write(block)  # type: ignore[union-attr]
+        finally:
+            if spill is not None:
+                spill.close()
+        if self._buffer is not None:
+            self._data = self._buffer.getvalue()
+            self._buffer = None
+
+    def _spill(self) -> BinaryIO:
+        """Move what's buffered so far to a temp file and continue there."""
+        assert self._buffer is not None
+        # Keep the extension as suffix, as Docling detects formats by it; the
+        # rest of the name comes from the upload and can hold path separators
+        extension = os.path.splitext(os.path.basename(self.name))[1]
+        fd, self._spill_path = tempfile.mkstemp(suffix=extension)
+        spill = os.fdopen(fd, "wb")
+        spill.write(self._buffer.getbuffer())
+        self._buffer = None
+        logger.info(
+            f"{self.name} exceeds {self.memory_limit} bytes, spilling to {self._spill_path}"
+        )
+        return spill
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the object's bytes."""
+        return self._digest.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._data is not None
+
+    def open(self) -> BinaryIO:
+        """A new reader positioned at the start; the caller closes it."""
+        if self._data is not None:
+            # BytesIO shares an immutable bytes object until written to
+            return io.BytesIO(self._data)
+        if self._spill_path is not None:
+            return open(self._spill_path, "rb")
+        raise ValueError(f"Document source {self.name} is closed")
+
+    def docling_input(self) -> DoclingInput:
+        if self._data is not None:
+            return (self.name, self._data)
+        if self._spill_path is not None:
+            return self._spill_path
+        raise ValueError(f"Document source {self.name} is closed")
+
+    def close(self) -> None:
+        self._buffer = None
+        self._data = None
+        if self._spill_path is not None:
+            try:
+                os.unlink(self._spill_path)
+            except FileNotFoundError:
+                pass
+            self._spill_path = None
+
+    def __enter__(self) -> "DocumentSource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
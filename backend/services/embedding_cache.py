@@ -0,0 +1,170 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config.environment import EmbeddingCacheSettings
+from config.redis import RedisType
+from config.logger import get_logger
+
+logger = get_logger()
+
+embedding_cache_settings = EmbeddingCacheSettings()
+
+# Aggregated across every process, readable with `read_embedding_cache_stats`
+STATS_KEY = "embedding_cache:stats"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Texts differing only in unicode form or whitespace share an embedding."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_cache_key(model: str, dimensions: int, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"embedding:{model}:{dimensions}:{digest}"
+
+
+def _pack(embedding: List[float]) -> bytes:
+    # OpenAI embeddings are float32 precision; 4 bytes per dimension
+    return array("f", embedding).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class _LRU:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+
+# Shared by every worker thread in the process
+_lru = _LRU(embedding_cache_settings.embedding_cache_lru_size)
+
+_stats: Dict[str, int] = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_embedding_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+async def read_embedding_cache_stats(redis_client: RedisType) -> Dict[str, int]:
+    """Hit/miss counters summed over all processes."""
+    raw = await redis_client.hgetall(STATS_KEY)
+    return {key.decode(): int(value) for key, value in raw.items()}
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model, dimensions, sha256 of normalized text), stored
+    in Redis with a per-process LRU in front.
+    """
+
+    def __init__(self, redis_client: RedisType, model: str, dimensions: int):
+        self.redis_client = redis_client
+        self.model = model
+        self.dimensions = dimensions
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [embedding_cache_key(self.model, self.dimensions, t) for t in texts]
+        results: List[Optional[List[float]]] = [_lru.get(key) for key in keys]
+        lru_hits = sum(1 for r in results if r is not None)
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        redis_hits = 0
+        if missing:
+            try:
+                values = await self.redis_client.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {str(e)}")
+                values = [None] * len(missing)
+            for i, value in zip(missing, values):
+                if value is not None:
+                    embedding = _unpack(value)
+                    _lru.set(keys[i], embedding)
+                    results[i] = embedding
+                    redis_hits += 1
+
+        await self._count(lru_hits, redis_hits, len(texts) - lru_hits - redis_hits)
+        return results
+
+    async def set_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        ttl = embedding_cache_settings.embedding_cache_ttl_seconds
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for text, embedding in zip(texts, embeddings):
+                    key = embedding_cache_key(self.model, self.dimensions, text)
+                    _lru.set(key, embedding)
+                    pipe.set(key, _pack(embedding), ex=ttl or None)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    async def _count(self, lru_hits: int, redis_hits: int, misses: int) -> None:
+        with _stats_lock:
+            _stats["lru_hits"] += lru_hits
+            _stats["redis_hits"] += redis_hits
+            _stats["misses"] += misses
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hincrby(STATS_KEY, "lru_hits", lru_hits)
+                pipe.hincrby(STATS_KEY, "redis_hits", redis_hits)
+                pipe.hincrby(STATS_KEY, "misses", misses)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache stats update failed: {str(e)}")
+
+    async def embed(
+        self,
+        texts: List[str],
+        embed_uncached: Callable[[List[str]], Awaitable[List[List[float]]]],
+    ) -> List[List[float]]:
+        """
+        Embeddings for `texts` in input order. Only cache misses are passed to
+        `embed_uncached`, each distinct normalized text once.
+        """
+        results = await self.get_many(texts)
+
+        pending: Dict[str, List[int]] = {}
+        for i, result in enumerate(results):
+            if result is None:
+                pending.setdefault(normalize_text(texts[i]), []).append(i)
+
+        if pending:
+            miss_texts = [texts[indices[0]] for indices in pending.values()]
+            embeddings = await embed_uncached(miss_texts)
+            await self.set_many(miss_texts, embeddings)
+            for indices, embedding in zip(pending.values(), embeddings):
+                for i in indices:
+                    results[i] = embedding
+
+        return [r for r in results if r is not None]
@@ -0,0 +1,198 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import tiktoken
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from config.environment import EmbeddingDispatchSettings
+from config.logger import get_logger
+
+logger = get_logger()
+
+dispatch_settings = EmbeddingDispatchSettings()
+
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+
+
+class RateLimiter:
+    """
+    Token bucket over tokens-per-minute and requests-per-minute.
+
+    State is guarded by a thread lock and waiting is done with asyncio.sleep, so
+    one limiter can be shared by every worker thread (each with its own loop)
+    in a process.
+    """
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.token_capacity = float(tokens_per_minute)
+        self.request_capacity = float(requests_per_minute)
+        self.tokens = self.token_capacity
+        self.requests = self.request_capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take capacity for one request, or return how long to wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated_at
+            self.updated_at = now
+            self.tokens = min(
+                self.token_capacity, self.tokens + elapsed * self.token_capacity / 60
+            )
+            self.requests = min(
+                self.request_capacity,
+                self.requests + elapsed * self.request_capacity / 60,
+            )
+
+            # A batch bigger than the whole budget still goes once the bucket is full
+            cost = min(float(tokens), self.token_capacity)
+            if self.tokens >= cost and self.requests >= 1:
+                self.tokens -= cost
+                self.requests -= 1
+                return 0.0
+            return max(
+                (cost - self.tokens) * 60 / self.token_capacity,
+                (1 - self.requests) * 60 / self.request_capacity,
+            )
+
+    async def acquire(self, tokens: int) -> None:
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+
+# OpenAI rate limits are per model, so every dispatcher for a model in this
+# process draws from the same limiter.
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(
+                dispatch_settings.embedding_tokens_per_minute,
+                dispatch_settings.embedding_requests_per_minute,
+            )
+        return _limiters[model]
+
+
+class EmbeddingBatch(NamedTuple):
+    start: int
+    texts: List[str]
+    tokens: int
+
+
+class EmbeddingDispatcher:
+    """
+    Packs texts into token-budgeted requests and sends several at once under the
+    model's rate limiter, retrying rate-limited and transient failures.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        encoding: tiktoken.Encoding,
+        max_batch_tokens: int = dispatch_settings.embedding_max_batch_tokens,
+        max_batch_inputs: int = dispatch_settings.embedding_max_batch_inputs,
+        concurrency: int = dispatch_settings.embedding_concurrency,
+        max_retries: int = dispatch_settings.embedding_max_retries,
+    ):
+        self.client = client
+        self.model = model
+        self.encoding = encoding
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.limiter = get_rate_limiter(model)
+
+    def pack(
+        self, texts: List[str], max_batch_inputs: Optional[int] = None
+    ) -> List[EmbeddingBatch]:
+        max_inputs = min(
+            max_batch_inputs or self.max_batch_inputs, self.max_batch_inputs
+        )
+        batches: List[EmbeddingBatch] = []
+        start, batch, batch_tokens = 0, [], 0
+
+        for i, text in enumerate(texts):
+            tokens = len(self.encoding.encode(text))
+            if batch and (
+                batch_tokens + tokens > self.max_batch_tokens
+                or len(batch) >= max_inputs
+            ):
+                batches.append(EmbeddingBatch(start, batch, batch_tokens))
+                start, batch, batch_tokens = i, [], 0
+            batch.append(text)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append(EmbeddingBatch(start, batch, batch_tokens))
+        return batches
+
+    async def embed(
+        self, texts: List[str], max_batch_inputs: Optional[int] = None
+    ) -> List[List[float]]:
+        """Embeddings for `texts`, in input order."""
+        batches = self.pack(texts, max_batch_inputs)
+        results: List[List[float]] = [[] for _ in texts]
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: EmbeddingBatch) -> None:
+            async with slots:
+                embeddings = await self._embed_batch(batch)
+            results[batch.start : batch.start + len(batch.texts)] = embeddings
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return results
+
+    async def _embed_batch(self, batch: EmbeddingBatch) -> List[List[float]]:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(batch.tokens)
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.model, input=batch.texts
+                )
+                # The API may return items out of order; `index` is authoritative
+                return [
+                    data.embedding
+                    for data in sorted(response.data, key=lambda d: d.index)
+                ]
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(
+                    f"Embeddings request of {len(batch.texts)} texts failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(60.0, 2.0**attempt) + random.uniform(0, 1)
@@ -1,21 +1,24 @@
-from typing import List
+from typing import List, Optional
 import tiktoken
 from openai import AsyncOpenAI
-from openai.types import CreateEmbeddingResponse
+from services.embedding_cache import EmbeddingCache
+from services.embedding_dispatcher import EmbeddingDispatcher
 
 class EmbeddingGenerator:
-    def __init__(self, api_key: str, model: str):
-        self.openai_client = AsyncOpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str, cache: Optional[EmbeddingCache] = None):
+        # The dispatcher retries with its own backoff; SDK retries would multiply it
+        self.openai_client = AsyncOpenAI(api_key=api_key, max_retries=0)
         self.model = model
         self.encoding = tiktoken.encoding_for_model(model)
+        self.cache = cache
+        self.dispatcher = EmbeddingDispatcher(self.openai_client, model, self.encoding)
 
     def num_tokens_from_string(self, string: str) -> int:
         return len(self.encoding.encode(string))
 
-    async def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
-        all_embeddings: List[List[float]] = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            response: CreateEmbeddingResponse = await self.openai_client.embeddings.create(model=self.model, input=batch)
-            all_embeddings.extend([data.embedding for data in response.data])
-        return all_embeddings
+    async def generate_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        # Requests are packed by token count; batch_size only caps texts per request
+        if self.cache is None:
+            return await self.dispatcher.embed(texts, batch_size)
+        # Only texts missing from the cache are sent to OpenAI
+        return await self.cache.embed(texts, lambda misses: self.dispatcher.embed(misses, batch_size))
@@ -5,7 +5,7 @@ from bson import ObjectId
 from aiohttp import ClientSession, ClientResponse
 from logging import Logger
 
-from config.s3 import s3_client
+from config.s3 import async_s3_client
 from config.environment import S3Settings
 from config.mongo import AsyncIOMotorCollection
 from db.models.document_uploads import (
@@ -58,7 +58,7 @@ async def capture_html(
                         url,
                         document_upload_id,
                         AllowedS3Buckets.PUBLIC_BUCKET,
-                        s3_client,
+                        async_s3_client,
                         S3_HOST,
                         logger,
                     )
@@ -80,7 +80,7 @@ async def capture_html(
                     url,
                     document_upload_id,
                     AllowedS3Buckets.PUBLIC_BUCKET,
-                    s3_client,
+                    async_s3_client,
                     S3_HOST,
                     logger,
                 )
@@ -102,7 +102,7 @@ async def capture_html(
                     url,
                     document_upload_id,
                     AllowedS3Buckets.PUBLIC_BUCKET,
-                    s3_client,
+                    async_s3_client,
                     S3_HOST,
                     logger,
                 )
@@ -120,7 +120,7 @@ async def capture_html(
             object_id=ObjectId(document_upload_id),
             file_name="index.html",
         )
-        s3_client.put_object(
+        await async_s3_client.put_object(
             Bucket=AllowedS3Buckets.PUBLIC_BUCKET.value,
             Key=html_key,
             Body=str(soup),
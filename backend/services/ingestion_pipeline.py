@@ -0,0 +1,418 @@
+import asyncio
+from datetime import datetime, UTC
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from docling_core.types.doc import DoclingDocument
+from elasticsearch import AsyncElasticsearch
+
+from config.ai_models import ModelPairConfig
+from config.environment import (
+    IngestionPipelineSettings,
+    OpenAISettings,
+    PineconeSettings,
+)
+from config.mongo import TypedAsyncIOMotorDatabase
+from config.redis import RedisType
+from config.s3 import async_s3_client
+from db.models.content_cache import Chunker
+from db.models.document_uploads import MongoDocumentUpload, find_assistant_by_model
+from services.chunk_indexing_pipeline import ChunkIndexingPipeline
+from services.content_cache_service import ContentCacheService
+from services.docling_conversion import DoclingExtractor, convert_document
+from services.document_source import DocumentSource
+from services.document_processor import DocumentProcessor
+from services.openai_assistant_service import OpenAIAssistantService
+from services.thumbnail_service import ThumbnailService
+from services.vector_sinks import (
+    ChunkSink,
+    ContentCacheChunkSink,
+    ElasticsearchChunkSink,
+    PineconeChunkSink,
+)
+from config.logger import get_logger
+
+logger = get_logger()
+
+openai_settings = OpenAISettings()
+pinecone_settings = PineconeSettings()
+pipeline_settings = IngestionPipelineSettings()
+
+# File types Docling converts; everything else is chunked from `extracted_text`
+DOCLING_FILE_TYPES = (
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+)
+
+# Chunks produced per trip to the chunker thread
+CHUNKER_STEP = 16
+
+
+def sink_stage(sink_name: str) -> str:
+    return f"sink:{sink_name}"
+
+
+class IngestionIncomplete(Exception):
+    """Raised when a stage finished without writing every chunk, so the task retries."""
+
+
+class DocumentIngestionPipeline:
+    """
+    Ingests a document upload as one staged DAG:
+
+        content hash -> download -> assistant thread
+                                 -> extract/chunk -> embed -> content cache
+                                                           -> vector sinks
+                     -> thumbnail
+
+    The file is downloaded and converted at most once, and each chunk set is
+    embedded once and fanned out to the sinks that use it: Elasticsearch gets
+    Docling chunks for the file types Docling converts, Pinecone always gets
+    text chunker chunks. Each completed stage is checkpointed under
+    `document_uploads.ingestion.stages`, so a retry skips what already
+    finished; chunk sinks that fell behind are replayed from the content cache
+    rather than re-chunked.
+    """
+
+    def __init__(
+        self,
+        db: TypedAsyncIOMotorDatabase,
+        es_client: AsyncElasticsearch,
+        redis_client: RedisType,
+        model_pair_config: ModelPairConfig,
+        settings: IngestionPipelineSettings = pipeline_settings,
+    ):
+        self.db = db
+        self.es_client = es_client
+        self.model_pair_config = model_pair_config
+        self.settings = settings
+        self.content_cache = ContentCacheService(db)
+        self.extractor = DoclingExtractor()
+        self.text_processor = DocumentProcessor(
+            openai_api_key=openai_settings.openai_api_key,
+            pinecone_api_key=pinecone_settings.pinecone_api_key,
+            model_pair_config=model_pair_config,
+            redis_client=redis_client,
+        )
+        self.embedding_generator = self.text_processor.embedding_generator
+        self.embedding_model = model_pair_config["embedding_model"]["model_name"]
+        self.completed: Dict[str, datetime] = {}
+        self._source: Optional[DocumentSource] = None
+        self._download_lock = asyncio.Lock()
+
+    async def run(self, document_id: str) -> Dict[str, Any]:
+        document = await self.db.document_uploads.find_one(
+            {"_id": ObjectId(document_id)}
+        )
+        if not document:
+            raise ValueError(f"Document with ID {document_id} not found")
+        self.completed = dict((document.get("ingestion") or {}).get("stages", {}))
+        if self.completed:
+            logger.info(
+                f"Resuming ingestion of document {document_id} after stages {sorted(self.completed)}"
+            )
+
+        try:
+            try:
+                # Hashed from the download the stages share, which a cache
+                # hit then leaves unused
+                content_hash = await self.content_cache.ensure_content_hash(
+                    document, lambda: self._content_hash(document)
+                )
+                # The assistant thread only needs the file, not the chunks
+                results = await asyncio.gather(
+                    self._stage(
+                        document, "assistant", self._create_assistant, content_hash
+                    ),
+                    self._index_chunks(document, content_hash),
+                    return_exceptions=True,
+                )
+            finally:
+                # Nothing after this reads the file
+                if self._source is not None:
+                    self._source.close()
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            chunks_indexed = results[1]
+
+            await self._stage(document, "thumbnail", self._generate_thumbnail)
+        finally:
+            await self.embedding_generator.openai_client.close()
+
+        return {
+            "document_id": document_id,
+            "status": "success",
+            "chunks_indexed": chunks_indexed,
+        }
+
+    async def _stage(
+        self,
+        document: MongoDocumentUpload,
+        name: str,
+        stage: Callable[..., Awaitable[None]],
+        *args: Any,
+    ) -> None:
+        if name in self.completed:
+            logger.info(f"Skipping completed stage {name} for {document['_id']}")
+            return
+        await stage(document, *args)
+        await self._checkpoint(document, name)
+
+    async def _checkpoint(self, document: MongoDocumentUpload, name: str) -> None:
+        completed_at = datetime.now(UTC)
+        await self.db.document_uploads.update_one(
+            {"_id": document["_id"]},
+            {"$set": {f"ingestion.stages.{name}": completed_at}},
+        )
+        self.completed[name] = completed_at
+
+    async def _download(self, document: MongoDocumentUpload) -> DocumentSource:
+        """Read the S3 object once; every stage shares the bytes."""
+        async with self._download_lock:
+            if self._source is None:
+                self._source = await DocumentSource.for_document(
+                    async_s3_client, document
+                )
+            return self._source
+
+    async def _content_hash(self, document: MongoDocumentUpload) -> str:
+        return (await self._download(document)).content_hash
+
+    async def _create_assistant(
+        self, document: MongoDocumentUpload, content_hash: str
+    ) -> None:
+        if find_assistant_by_model(
+            document, self.model_pair_config["chat_model"]["model_name"]
+        ):
+            return
+
+        openai_assistant_service = OpenAIAssistantService(
+            openai_api_key=openai_settings.openai_api_key
+        )
+        # Reuse the OpenAI file of an earlier upload of the same content
+        cached_file_id = await self.content_cache.get_openai_file_id(content_hash)
+        assistant_details = await openai_assistant_service.create_assistant_thread(
+            model_config=self.model_pair_config,
+            document=document,
+            mongo_collection=self.db.document_uploads,
+            file_id=cached_file_id,
+            source=(
+                await self._download(document)
+                if cached_file_id is None
+                and document["file_details"]["file_type"]
+                in openai_assistant_service.supported_file_types
+                else None
+            ),
+        )
+        uploaded_file_id = assistant_details["external_document_upload_id"]
+        if cached_file_id is None and uploaded_file_id:
+            await self.content_cache.set_openai_file_id(content_hash, uploaded_file_id)
+
+    def _sink_chunker(self, document: MongoDocumentUpload, name: str) -> Chunker:
+        # Pinecone keeps the text chunker's `max_tokens_per_chunk` chunks and
+        # their `token_count`, which its readers were built around
+        if name == PineconeChunkSink.name:
+            return "text"
+        if document["file_details"]["file_type"] in DOCLING_FILE_TYPES:
+            return "docling"
+        return "text"
+
+    async def _index_chunks(
+        self, document: MongoDocumentUpload, content_hash: str
+    ) -> int:
+        """
+        Index the document into every sink, once per chunker the sinks use:
+        Docling chunks for Elasticsearch when Docling converts the file type,
+        text chunks otherwise.
+        """
+        sink_names: Dict[Chunker, List[str]] = {}
+        for name in self.settings.ingestion_vector_sinks:
+            sink_names.setdefault(self._sink_chunker(document, name), []).append(
+                name
+            )
+        results = await asyncio.gather(
+            *(
+                self._index_chunk_set(document, content_hash, chunker, names)
+                for chunker, names in sink_names.items()
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return sum(results)
+
+    async def _index_chunk_set(
+        self,
+        document: MongoDocumentUpload,
+        content_hash: str,
+        chunker: Chunker,
+        sink_names: List[str],
+    ) -> int:
+        """
+        Chunk and embed the document once into the content cache, writing the
+        same batches to every sink that hasn't finished yet. If the content is
+        already cached (another upload, or an earlier attempt), replay it instead.
+        """
+        document_id = str(document["_id"])
+        pending = [
+            await self._create_sink(name)
+            for name in sink_names
+            if sink_stage(name) not in self.completed
+        ]
+
+        sinks: List[ChunkSink]
+        if await self.content_cache.has_chunks(
+            content_hash, chunker, self.embedding_model
+        ):
+            if chunker == "docling":
+                await self._stage(
+                    document, "structured_data", self._restore_structured_data
+                )
+            if not pending:
+                return 0
+            logger.info(
+                f"Replaying cached chunks of content {content_hash} for document {document_id}"
+            )
+            chunks = self._replay_chunks(content_hash, chunker, document_id)
+            sinks = pending
+        else:
+            if chunker == "docling":
+                chunks = await self._docling_chunks(document, content_hash)
+            else:
+                chunks = await self._text_chunks(document)
+            cache_sink = ContentCacheChunkSink(
+                self.content_cache, content_hash, chunker, self.embedding_model
+            )
+            sinks = [cache_sink, *pending]
+
+        pipeline = ChunkIndexingPipeline(self.embedding_generator, sinks)
+        produced = await pipeline.run(chunks)
+
+        incomplete = [
+            name for name, written in pipeline.written.items() if written != produced
+        ]
+        if ContentCacheChunkSink.name in pipeline.written and (
+            ContentCacheChunkSink.name not in incomplete
+        ):
+            # Only mark the cache complete if every chunk made it in
+            await self.content_cache.mark_chunks_cached(
+                content_hash, chunker, self.embedding_model
+            )
+        for sink in pending:
+            if sink.name in incomplete:
+                continue
+            if produced:
+                await sink.finish(document_id, produced)
+            await self._checkpoint(document, sink_stage(sink.name))
+
+        if incomplete:
+            raise IngestionIncomplete(
+                f"Only part of the {produced} chunks of document {document_id} reached {incomplete}"
+            )
+        logger.info(
+            f"Indexed {produced} chunks of document {document_id} into {[s.name for s in pending]}"
+        )
+        return produced
+
+    async def _create_sink(self, name: str) -> ChunkSink:
+        if name == ElasticsearchChunkSink.name:
+            return ElasticsearchChunkSink(self.es_client)
+        if name == PineconeChunkSink.name:
+            await asyncio.to_thread(self.text_processor.ensure_pinecone_index)
+            return PineconeChunkSink(self.text_processor.index)
+        raise ValueError(f"Unknown vector sink: {name}")
+
+    async def _docling_chunks(
+        self, document: MongoDocumentUpload, content_hash: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        document_id = str(document["_id"])
+        source = await self._download(document)
+
+        logger.info(f"Processing document {document_id} with Docling")
+        # Convert in the conversion pool, off this loop
+        converted = await convert_document(source.docling_input(), document_id)
+        structured_data = self.extractor._ensure_serializable(
+            converted["structured_data"]
+        )
+        await self.content_cache.set_docling_structured_data(
+            content_hash, structured_data
+        )
+        # The outline is usable before any chunk is indexed
+        await self._stage(
+            document, "structured_data", self._store_structured_data, structured_data
+        )
+        return self._stream_chunks(converted["document"], document_id)
+
+    async def _stream_chunks(
+        self, docling_doc: DoclingDocument, document_id: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the chunker in a thread, a few chunks at a time, as they're consumed."""
+        chunks = self.extractor.iter_chunks(docling_doc, document_id)
+        while batch := await asyncio.to_thread(
+            lambda: list(islice(chunks, CHUNKER_STEP))
+        ):
+            for chunk in batch:
+                yield chunk
+
+    async def _text_chunks(
+        self, document: MongoDocumentUpload
+    ) -> AsyncIterator[Dict[str, Any]]:
+        document_id = str(document["_id"])
+        text_chunks = await self.text_processor.chunk_text(
+            document.get("extracted_text") or ""
+        )
+
+        async def chunks() -> AsyncIterator[Dict[str, Any]]:
+            for i, (text, token_count) in enumerate(text_chunks):
+                yield {
+                    "chunk_id": f"{document_id}_chunk_{i}",
+                    "document_id": document_id,
+                    "text": text,
+                    "chunk_index": i,
+                    "chunk_type": "text",
+                    "token_count": token_count,
+                    "position_in_document": None,
+                }
+
+        return chunks()
+
+    async def _replay_chunks(
+        self, content_hash: str, chunker: Chunker, document_id: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for chunk in self.content_cache.iter_chunks(
+            content_hash, chunker, self.embedding_model
+        ):
+            yield {
+                **chunk,
+                "chunk_id": f"{document_id}_chunk_{chunk['chunk_index']}",
+                "document_id": document_id,
+                "position_in_document": None,
+            }
+
+    async def _restore_structured_data(self, document: MongoDocumentUpload) -> None:
+        structured_data = await self.content_cache.get_docling_structured_data(
+            document["content_hash"]
+        )
+        if structured_data is not None:
+            await self._store_structured_data(document, structured_data)
+
+    async def _store_structured_data(
+        self, document: MongoDocumentUpload, structured_data: Dict[str, Any]
+    ) -> None:
+        """Update MongoDB with structured data from Docling."""
+        await self.db.document_uploads.update_one(
+            {"_id": document["_id"]},
+            {
+                "$set": {
+                    "docling_structured_data": structured_data,
+                    "docling_processed_at": datetime.now(UTC),
+                }
+            },
+        )
+
+    async def _generate_thumbnail(self, document: MongoDocumentUpload) -> None:
+        thumbnail_generator = ThumbnailService(s3_client=async_s3_client, db=self.db)
+        await thumbnail_generator.generate_and_store_thumbnail(str(document["_id"]))
@@ -6,7 +6,7 @@ from bson import ObjectId
 from aiohttp import ClientSession, ClientResponse
 
 from config.mongo import AsyncIOMotorCollection
-from config.s3 import s3_client
+from config.s3 import async_s3_client
 from config.environment import S3Settings
 from db.models.document_uploads import (
     MongoDocumentUpload,
@@ -54,7 +54,7 @@ async def capture_non_html(
             file_name=file_name,
         )
 
-        s3_client.put_object(
+        await async_s3_client.put_object(
             Bucket=AllowedS3Buckets.DOCUMENT_UPLOADS.value,
             Key=s3_key,
             Body=content,
@@ -63,7 +63,7 @@ async def capture_non_html(
 
         await progress_updater.update(75)
 
-        capture_url = s3_client.generate_presigned_url(
+        capture_url = async_s3_client.generate_presigned_url(
             "get_object",
             Params={"Bucket": AllowedS3Buckets.DOCUMENT_UPLOADS.value, "Key": s3_key},
             ExpiresIn=3600,
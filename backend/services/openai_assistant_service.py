@@ -1,7 +1,6 @@
-import os
-import tempfile
+import asyncio
 from typing import Optional, AsyncGenerator, Dict, Any
-from openai import OpenAI, AsyncOpenAI
+from openai import AsyncOpenAI
 from openai.types.file_object import FileObject
 from openai.types.beta import Thread
 from openai.types.beta.threads.message import Message
@@ -17,9 +16,10 @@ from config.ai_models import ModelPairConfig
 from db.models.document_uploads import MongoDocumentUpload, OpenAIAssistantDetails
 from db.models.chat import OpenAIAssistantChat
 from config.mongo import AsyncIOMotorCollection
-from config.s3 import s3_client
+from config.s3 import async_s3_client
+from config.openai_client import get_async_openai_client
 from config.logger import get_logger
-from utils.file_type_normalizer import mimetype_to_file_extension
+from services.document_source import DocumentSource
 
 logger = get_logger()
 
@@ -48,10 +48,13 @@ class AssistantRunError(OpenAIAssistantError):
     """Raised when running an assistant fails"""
 
 
+# Attempts at starting a streamed run before giving up
+STREAM_ATTEMPTS = 3
+
+
 class OpenAIAssistantService:
     def __init__(self, openai_api_key: str):
-        self.client = OpenAI(api_key=openai_api_key)
-        self.async_client = AsyncOpenAI(api_key=openai_api_key)
+        self.openai_api_key = openai_api_key
         self.supported_file_types = {
             "application/pdf",
             "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -62,6 +65,11 @@ class OpenAIAssistantService:
             # Epub, CSV, Excel are not supported by OpenAI's Assistant API file tool
         }  # Add other supported types as needed
 
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Shared per event loop, so runs in one process share a connection pool
+        return get_async_openai_client(self.openai_api_key)
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -73,6 +81,8 @@ class OpenAIAssistantService:
         model_config: ModelPairConfig,
         document: MongoDocumentUpload,
         mongo_collection: AsyncIOMotorCollection[MongoDocumentUpload],
+        file_id: Optional[str] = None,  # Already uploaded file to reuse
+        source: Optional[DocumentSource] = None,  # Already downloaded file bytes
     ) -> OpenAIAssistantDetails:
         assistant_id = model_config["assistant"]["id"]
         assistant_type = model_config["assistant"]["type"]
@@ -86,18 +96,16 @@ class OpenAIAssistantService:
 
         try:
             # Create a new thread
-            thread = self._create_thread()
+            thread = await self._create_thread()
 
-            file_id = None
             file_type = document["file_details"]["file_type"]
             if file_type in self.supported_file_types:
-                # Upload the file to OpenAI if it's a supported type
-                file_path = await self._get_file_path(document)
-                openai_file = self._upload_file(file_path, file_type)
-                file_id = openai_file.id
+                if file_id is None:
+                    # Upload the file to OpenAI if it's a supported type
+                    file_id = await self._upload_document(document, source)
 
                 # Add the file to the assistant
-                self._attach_file_to_thread(thread.id, file_id)
+                await self._attach_file_to_thread(thread.id, file_id)
             else:
                 # For unsupported file types, add the extracted text as a message
                 extracted_text = document.get("extracted_text", "")
@@ -138,6 +146,7 @@ class OpenAIAssistantService:
         self,
         model_config: ModelPairConfig,
         document: MongoDocumentUpload,
+        file_id: Optional[str] = None,  # Already uploaded file to reuse
     ) -> OpenAIAssistantChat:
         assistant_id = model_config["assistant"]["id"]
         assistant_type = model_config["assistant"]["type"]
@@ -151,18 +160,16 @@ class OpenAIAssistantService:
 
         try:
             # Create a new thread
-            thread = self._create_thread()
+            thread = await self._create_thread()
 
-            file_id = None
             file_type = document["file_details"]["file_type"]
             if file_type in self.supported_file_types:
-                # Upload the file to OpenAI if it's a supported type
-                file_path = await self._get_file_path(document)
-                openai_file = self._upload_file(file_path, file_type)
-                file_id = openai_file.id
+                if file_id is None:
+                    # Upload the file to OpenAI if it's a supported type
+                    file_id = await self._upload_document(document)
 
                 # Add the file to the assistant
-                self._attach_file_to_thread(thread.id, file_id)
+                await self._attach_file_to_thread(thread.id, file_id)
             else:
                 # For unsupported file types, add the extracted text as a message
                 extracted_text = document.get("extracted_text", "")
@@ -192,9 +199,9 @@ class OpenAIAssistantService:
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True,
     )
-    def _create_thread(self) -> Thread:
+    async def _create_thread(self) -> Thread:
         try:
-            return self.client.beta.threads.create()
+            return await self.client.beta.threads.create()
         except Exception as e:
             logger.error(f"Error creating thread: {str(e)}")
             raise ThreadCreationError("Failed to create thread") from e
@@ -204,20 +211,13 @@ class OpenAIAssistantService:
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True,
     )
-    def _upload_file(self, file_path: str, file_type: str) -> FileObject:
+    async def _upload_file(self, source: DocumentSource) -> FileObject:
         try:
-            file_name = os.path.basename(file_path)
-            file_extension = mimetype_to_file_extension.get(file_type)
-
-            # OpenAI requires matching file extensions; Can't infer from mimetype
-            if file_extension and not file_name.lower().endswith(file_extension):
-                new_file_name = f"{file_name}{file_extension}"
-                new_file_path = os.path.join(os.path.dirname(file_path), new_file_name)
-                os.rename(file_path, new_file_path)
-                file_path = new_file_path
-
-            with open(file_path, "rb") as file:
-                return self.client.files.create(file=file, purpose="assistants")
+            # OpenAI requires matching file extensions; the source name carries one
+            with source.open() as file:
+                return await self.client.files.create(
+                    file=(source.name, file), purpose="assistants"
+                )
         except Exception as e:
             logger.error(f"Error uploading file: {str(e)}")
             raise FileUploadError("Failed to upload file to OpenAI") from e
@@ -227,9 +227,9 @@ class OpenAIAssistantService:
         wait=wait_exponential(multiplier=1, min=4, max=10),
         reraise=True,
     )
-    def _attach_file_to_thread(self, thread_id: str, file_id: str) -> Message:
+    async def _attach_file_to_thread(self, thread_id: str, file_id: str) -> Message:
         try:
-            return self.client.beta.threads.messages.create(
+            return await self.client.beta.threads.messages.create(
                 thread_id=thread_id,
                 role="user",
                 content="The file you the assistant will use in answering my questions",
@@ -241,19 +241,14 @@ class OpenAIAssistantService:
                 "Failed to attach file to assistant"
             ) from e
 
-    async def _get_file_path(self, document: MongoDocumentUpload) -> str:
-        file_key = document["file_details"]["file_key"]
-        file_name = document["file_details"]["file_name"]
-
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=f"_{file_name}"
-        ) as temp_file:
-            s3_client.download_fileobj(
-                Bucket=document["file_details"]["s3_bucket"],
-                Key=file_key,
-                Fileobj=temp_file,
-            )
-            return temp_file.name
+    async def _upload_document(
+        self, document: MongoDocumentUpload, source: Optional[DocumentSource] = None
+    ) -> str:
+        """Upload the document's file, streaming it from S3 unless given its bytes."""
+        if source is not None:
+            return (await self._upload_file(source)).id
+        with await DocumentSource.for_document(async_s3_client, document) as source:
+            return (await self._upload_file(source)).id
 
     @retry(
         stop=stop_after_attempt(3),
@@ -269,7 +264,7 @@ class OpenAIAssistantService:
                 Attachment(file_id=file_id, tools=[{"type": "file_search"}])
                 for file_id in file_ids or []
             ]
-            message = self.client.beta.threads.messages.create(
+            message = await self.client.beta.threads.messages.create(
                 thread_id=thread_id,
                 role="user",
                 content=content,
@@ -280,12 +275,35 @@ class OpenAIAssistantService:
             logger.error(f"Error adding message to thread: {str(e)}")
             raise MessageAdditionError("Failed to add message to thread") from e
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type(AssistantRunError),
-        reraise=True,
-    )
+    async def _stream_run(
+        self, thread_id: str, assistant_id: str, instructions: str
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a run's text deltas. A run that fails before producing any text
+        is retried with backoff; once text has been yielded it can't be taken
+        back, so a later failure is raised as is.
+        """
+        for attempt in range(1, STREAM_ATTEMPTS + 1):
+            streamed = False
+            try:
+                async with self.client.beta.threads.runs.stream(
+                    thread_id=thread_id,
+                    assistant_id=assistant_id,
+                    instructions=instructions,
+                ) as stream:
+                    async for text in stream.text_deltas:
+                        streamed = True
+                        yield text
+                return
+            except Exception as e:
+                if streamed or attempt == STREAM_ATTEMPTS:
+                    raise
+                delay = min(10, 4 * 2 ** (attempt - 1))
+                logger.warning(
+                    f"Starting assistant run failed ({str(e)}), retry {attempt}/{STREAM_ATTEMPTS - 1} in {delay}s"
+                )
+                await asyncio.sleep(delay)
+
     async def run_assistant(
         self, thread_id: str, assistant_id: str, context_file_id: str
     ) -> AsyncGenerator[str, None]:
@@ -294,13 +312,8 @@ class OpenAIAssistantService:
             f"Use this uploaded file {context_file_id} to answer any questions"
         )
         try:
-            with self.client.beta.threads.runs.stream(
-                thread_id=thread_id,
-                assistant_id=assistant_id,
-                instructions=instructions,
-            ) as stream:
-                for text in stream.text_deltas:
-                    yield text
+            async for text in self._stream_run(thread_id, assistant_id, instructions):
+                yield text
 
         except Exception as e:
             logger.error(f"Error running assistant: {str(e)}")
@@ -309,7 +322,7 @@ class OpenAIAssistantService:
 
     async def get_run_status(self, thread_id: str, run_id: str) -> Run:
         try:
-            run = self.client.beta.threads.runs.retrieve(
+            run = await self.client.beta.threads.runs.retrieve(
                 thread_id=thread_id, run_id=run_id
             )
             return run
@@ -319,18 +332,12 @@ class OpenAIAssistantService:
 
     async def get_messages(self, thread_id: str) -> list[Message]:
         try:
-            messages = self.client.beta.threads.messages.list(thread_id=thread_id)
+            messages = await self.client.beta.threads.messages.list(thread_id=thread_id)
             return messages.data
         except Exception as e:
             logger.error(f"Error getting messages: {str(e)}")
             raise OpenAIAssistantError("Failed to get messages") from e
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type(OpenAIAssistantError),
-        reraise=True,
-    )
     async def explain_text_subsection(
         self,
         thread_id: str,
@@ -393,14 +400,8 @@ class OpenAIAssistantService:
             )
 
             # Run the assistant with streaming
-            with self.client.beta.threads.runs.stream(
-                thread_id=thread_id,
-                assistant_id=assistant_id,
-                instructions=instructions,
-                # event_handler=handler,
-            ) as stream:
-                for text in stream.text_deltas:
-                    yield text
+            async for text in self._stream_run(thread_id, assistant_id, instructions):
+                yield text
 
         except Exception as e:
             logger.error(f"Error in explain_text_subsection: {str(e)}")
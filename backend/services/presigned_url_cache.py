@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config.environment import PresignedUrlSettings
+from config.s3 import AsyncS3Client
+from config.logger import get_logger
+
+logger = get_logger()
+
+presigned_url_settings = PresignedUrlSettings()
+
+# (bucket, key, expiry bucket)
+CacheKey = Tuple[str, str, int]
+
+
+class PresignBatchStats(NamedTuple):
+    requested: int
+    hits: int
+    signed: int
+    signing_seconds: float
+    saved_seconds: float
+
+
+_stats: Dict[str, float] = {
+    "hits": 0,
+    "signed": 0,
+    "signing_seconds": 0.0,
+    "saved_seconds": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def get_presigned_url_stats() -> Dict[str, float]:
+    """Signing cache counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class PresignedUrlCache:
+    """
+    Presigned GET URLs keyed by (bucket, key, expiry bucket).
+
+    Time is cut into buckets of `expires_in - min_remaining` seconds. A URL
+    signed anywhere in a bucket is valid for at least `min_remaining` seconds
+    after the bucket ends, so it is reused for the whole bucket and never
+    served close to expiry. A new bucket means a new key, and old entries
+    age out of the LRU.
+    """
+
+    def __init__(
+        self,
+        expires_in: int = presigned_url_settings.presigned_url_expires_in,
+        min_remaining: int = presigned_url_settings.presigned_url_min_remaining,
+        max_size: int = presigned_url_settings.presigned_url_cache_size,
+    ):
+        if min_remaining >= expires_in:
+            raise ValueError("min_remaining must be shorter than expires_in")
+        self.expires_in = expires_in
+        self.bucket_seconds = expires_in - min_remaining
+        self.max_size = max_size
+        self.items: "OrderedDict[CacheKey, str]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _expiry_bucket(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _get(self, key: CacheKey) -> Optional[str]:
+        with self.lock:
+            url = self.items.get(key)
+            if url is not None:
+                self.items.move_to_end(key)
+            return url
+
+    def _set(self, key: CacheKey, url: str) -> None:
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.items[key] = url
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def presign_many(
+        self, s3_client: AsyncS3Client, objects: Sequence[Tuple[str, str]]
+    ) -> Tuple[List[str], PresignBatchStats]:
+        """
+        URLs for every (bucket, key) in `objects`, in order, signing only those
+        not cached for the current expiry bucket, each distinct object once.
+        """
+        expiry_bucket = self._expiry_bucket(time.time())
+        urls: List[Optional[str]] = [
+            self._get((bucket, key, expiry_bucket)) for bucket, key in objects
+        ]
+        hits = sum(1 for url in urls if url is not None)
+
+        signed: Dict[Tuple[str, str], str] = {}
+        started = time.perf_counter()
+        for i, (bucket, key) in enumerate(objects):
+            if urls[i] is not None:
+                continue
+            if (bucket, key) not in signed:
+                url = s3_client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": bucket, "Key": key},
+                    ExpiresIn=self.expires_in,
+                )
+                self._set((bucket, key, expiry_bucket), url)
+                signed[(bucket, key)] = url
+            urls[i] = signed[(bucket, key)]
+        signing_seconds = time.perf_counter() - started
+
+        # Every URL not signed here (cache hits and repeats) saved one signing,
+        # estimated at this process's average signing time
+        with _stats_lock:
+            _stats["hits"] += hits
+            _stats["signed"] += len(signed)
+            _stats["signing_seconds"] += signing_seconds
+            average = (
+                _stats["signing_seconds"] / _stats["signed"] if _stats["signed"] else 0.0
+            )
+            saved_seconds = (len(objects) - len(signed)) * average
+            _stats["saved_seconds"] += saved_seconds
+
+        return [url or "" for url in urls], PresignBatchStats(
+            requested=len(objects),
+            hits=hits,
+            signed=len(signed),
+            signing_seconds=signing_seconds,
+            saved_seconds=saved_seconds,
+        )
+
+    def presign(self, s3_client: AsyncS3Client, bucket: str, key: str) -> str:
+        urls, _ = self.presign_many(s3_client, [(bucket, key)])
+        return urls[0]
+
+
+presigned_url_cache = PresignedUrlCache()
@@ -0,0 +1,222 @@
+from typing import AsyncGenerator, Dict, List, Optional, TypedDict, Any
+
+from elasticsearch import AsyncElasticsearch
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageParam
+
+from config.ai_models import ModelPairConfig
+from config.environment import RetrievalChatSettings
+from config.openai_client import get_async_openai_client
+from config.redis import RedisType
+from db.models.chat import ChatMessageRole, MongoChatMessage
+from services.embedding_cache import EmbeddingCache
+from services.vector_sinks import CHUNK_INDEX_NAME
+from config.logger import get_logger
+
+logger = get_logger()
+
+retrieval_chat_settings = RetrievalChatSettings()
+
+SYSTEM_PROMPT = (
+    "You answer questions about a document using only the excerpts of it "
+    "provided below. Cite the page when an excerpt has one. If the excerpts "
+    "don't contain the answer, say so rather than guessing."
+)
+
+
+class RetrievalChatError(Exception):
+    """Raised when retrieving context or streaming a retrieval chat reply fails"""
+
+
+class RetrievedChunk(TypedDict):
+    chunk_id: str
+    chunk_index: int
+    text: str
+    page_number: Optional[int]
+    heading_path: List[str]
+    score: float
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict[str, Any]]], rank_constant: int
+) -> List[RetrievedChunk]:
+    """
+    Merge ranked hit lists, scoring each chunk by the sum of 1 / (k + rank)
+    over the lists it appears in. Unlike adding BM25 and cosine scores, this
+    doesn't depend on the two scales being comparable.
+    """
+    fused: Dict[str, RetrievedChunk] = {}
+    for hits in rankings:
+        for rank, hit in enumerate(hits, start=1):
+            source = hit["_source"]
+            chunk = fused.get(hit["_id"])
+            if chunk is None:
+                heading_path = source.get("heading_path") or []
+                chunk = fused[hit["_id"]] = RetrievedChunk(
+                    chunk_id=source.get("chunk_id", hit["_id"]),
+                    chunk_index=source.get("chunk_index", 0),
+                    text=source.get("text", ""),
+                    page_number=source.get("page_number"),
+                    heading_path=(
+                        [heading_path]
+                        if isinstance(heading_path, str)
+                        else list(heading_path)
+                    ),
+                    score=0.0,
+                )
+            chunk["score"] += 1.0 / (rank_constant + rank)
+    return sorted(fused.values(), key=lambda chunk: chunk["score"], reverse=True)
+
+
+class RetrievalChatService:
+    """
+    Chat replies from the document's own chunks: the question is embedded, the
+    document's chunks in the Elasticsearch chunk index are searched by kNN on
+    their vectors and by BM25 on their text in one round trip, the two rankings
+    are fused, and a plain chat completion is streamed over the top chunks.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: str,
+        model_pair_config: ModelPairConfig,
+        es_client: AsyncElasticsearch,
+        redis_client: Optional[RedisType] = None,
+        index_name: str = CHUNK_INDEX_NAME,
+    ):
+        self.openai_api_key = openai_api_key
+        self.model_pair_config = model_pair_config
+        self.es_client = es_client
+        self.index_name = index_name
+        self.settings = retrieval_chat_settings
+        embedding_model = model_pair_config["embedding_model"]
+        self.embedding_cache = (
+            EmbeddingCache(
+                redis_client,
+                embedding_model["model_name"],
+                embedding_model["dimension"],
+            )
+            if redis_client is not None
+            else None
+        )
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Shared per event loop, so a reply doesn't open a new connection
+        return get_async_openai_client(self.openai_api_key)
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(
+            model=self.model_pair_config["embedding_model"]["model_name"],
+            input=texts,
+        )
+        return [item.embedding for item in response.data]
+
+    async def embed_question(self, question: str) -> List[float]:
+        if self.embedding_cache is None:
+            embeddings = await self._embed([question])
+        else:
+            embeddings = await self.embedding_cache.embed([question], self._embed)
+        return embeddings[0]
+
+    async def retrieve(
+        self, document_upload_id: str, question: str
+    ) -> List[RetrievedChunk]:
+        """The document's chunks most relevant to the question, best first."""
+        try:
+            vector = await self.embed_question(question)
+            document_filter = {"term": {"document_id": document_upload_id}}
+            size = self.settings.retrieval_chat_search_size
+            source = {"excludes": ["vector"]}
+            response = await self.es_client.msearch(
+                searches=[
+                    {"index": self.index_name},
+                    {
+                        "knn": {
+                            "field": "vector",
+                            "query_vector": vector,
+                            "k": size,
+                            "num_candidates": max(
+                                size, self.settings.retrieval_chat_num_candidates
+                            ),
+                            "filter": document_filter,
+                        },
+                        "size": size,
+                        "_source": source,
+                    },
+                    {"index": self.index_name},
+                    {
+                        "query": {
+                            "bool": {
+                                "must": {"match": {"text": question}},
+                                "filter": document_filter,
+                            }
+                        },
+                        "size": size,
+                        "_source": source,
+                    },
+                ]
+            )
+        except Exception as e:
+            raise RetrievalChatError(f"Failed to retrieve context: {str(e)}") from e
+
+        rankings: List[List[Dict[str, Any]]] = []
+        for result in response["responses"]:
+            if "error" in result:
+                raise RetrievalChatError(f"Context search failed: {result['error']}")
+            rankings.append(result["hits"]["hits"])
+
+        chunks = reciprocal_rank_fusion(rankings, self.settings.retrieval_chat_rrf_k)
+        return chunks[: self.settings.retrieval_chat_top_k]
+
+    def build_messages(
+        self,
+        question: str,
+        chunks: List[RetrievedChunk],
+        history: List[MongoChatMessage],
+    ) -> List[ChatCompletionMessageParam]:
+        """The prompt: instructions, excerpts in document order, history, question."""
+        excerpts = []
+        for chunk in sorted(chunks, key=lambda chunk: chunk["chunk_index"]):
+            label = " > ".join(chunk["heading_path"])
+            if chunk["page_number"] is not None:
+                label = f"page {chunk['page_number']}" + (f", {label}" if label else "")
+            excerpts.append(f"[{label}]\n{chunk['text']}" if label else chunk["text"])
+
+        messages: List[ChatCompletionMessageParam] = [
+            {
+                "role": "system",
+                "content": f"{SYSTEM_PROMPT}\n\nExcerpts:\n\n"
+                + ("\n\n---\n\n".join(excerpts) or "(none found)"),
+            }
+        ]
+        for message in history:
+            if message["role"] == ChatMessageRole.ASSISTANT:
+                messages.append({"role": "assistant", "content": message["content"]})
+            elif message["role"] == ChatMessageRole.USER:
+                messages.append({"role": "user", "content": message["content"]})
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    async def stream_answer(
+        self,
+        question: str,
+        chunks: List[RetrievedChunk],
+        history: List[MongoChatMessage],
+    ) -> AsyncGenerator[str, None]:
+        """Stream the reply's text deltas."""
+        chat_model = self.model_pair_config["chat_model"]
+        try:
+            stream = await self.client.chat.completions.create(
+                model=chat_model["model_name"],
+                messages=self.build_messages(question, chunks, history),
+                max_tokens=chat_model["max_output_tokens"],
+                stream=True,
+            )
+            async for event in stream:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        except Exception as e:
+            raise RetrievalChatError(
+                f"Failed to stream retrieval chat reply: {str(e)}"
+            ) from e
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+from datetime import datetime, UTC
+from typing import Awaitable, Callable, Dict, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from config.mongo import TypedAsyncIOMotorDatabase
+from db.models.summary_cache import MongoChunkSummary, MongoDocumentSummary
+from config.logger import get_logger
+
+logger = get_logger()
+
+_stats: Dict[str, int] = {
+    "chunk_hits": 0,
+    "chunk_misses": 0,
+    "document_hits": 0,
+    "document_misses": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def get_summary_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def summary_hash(*parts: str) -> str:
+    """SHA-256 of the texts a summary is made from, kept distinct from each other."""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class SummaryCacheService:
+    """
+    Summaries already paid for, in MongoDB.
+
+    First-level summaries in `chunk_summaries` are keyed by (chunk hash,
+    model, prompt version, target tokens), so any document containing the same
+    text reuses them and only changed chunks are sent to the model (except in
+    most_advanced_summarize, whose first-level inputs are groups of the whole
+    document's chunks, so its reuse is per document). The final summary in
+    `document_summaries` is kept per (document, method, model, prompt version)
+    with the hash of the input it was made from, and is reused while that input
+    is unchanged. Bump a prompt version whenever its prompt changes.
+    """
+
+    def __init__(self, db: TypedAsyncIOMotorDatabase, model: str):
+        self.db = db
+        self.model = model
+
+    async def chunk_summary(
+        self,
+        chunk_hash: str,
+        prompt_version: str,
+        target_tokens: Optional[int],
+        summarize: Callable[[], Awaitable[str]],
+    ) -> str:
+        """The cached summary of a chunk, or `summarize()`'s, which is then cached."""
+        target = target_tokens or 0
+        key = f"{self.model}:{prompt_version}:{target}:{chunk_hash}"
+        cached = await self.db.chunk_summaries.find_one({"_id": key}, {"summary": 1})
+        if cached is not None:
+            _count("chunk_hits")
+            return cached["summary"]
+
+        _count("chunk_misses")
+        summary = await summarize()
+        if summary:
+            try:
+                await self.db.chunk_summaries.insert_one(
+                    MongoChunkSummary(
+                        _id=key,
+                        chunk_hash=chunk_hash,
+                        model=self.model,
+                        prompt_version=prompt_version,
+                        target_tokens=target,
+                        summary=summary,
+                        created_at=datetime.now(UTC),
+                    )
+                )
+            except DuplicateKeyError:
+                # A concurrent request summarized the same chunk first
+                pass
+        return summary
+
+    async def document_summary(
+        self,
+        document_id: str,
+        method: str,
+        prompt_version: str,
+        source_hash: str,
+        summarize: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        The document's cached final summary if it was made from the same input,
+        otherwise `summarize()`'s, which replaces it.
+        """
+        key = f"{document_id}:{method}:{self.model}:{prompt_version}"
+        cached = await self.db.document_summaries.find_one(
+            {"_id": key, "source_hash": source_hash}, {"summary": 1}
+        )
+        if cached is not None:
+            _count("document_hits")
+            logger.info(f"Reusing cached {method} summary of document {document_id}")
+            return cached["summary"]
+
+        _count("document_misses")
+        summary = await summarize()
+        if summary:
+            await self.db.document_summaries.replace_one(
+                {"_id": key},
+                MongoDocumentSummary(
+                    _id=key,
+                    document_upload_id=ObjectId(document_id),
+                    method=method,
+                    model=self.model,
+                    prompt_version=prompt_version,
+                    source_hash=source_hash,
+                    summary=summary,
+                    created_at=datetime.now(UTC),
+                ),
+                upsert=True,
+            )
+        return summary
@@ -8,7 +8,7 @@ import os
 import base64
 import math
 from playwright.async_api import async_playwright
-from mypy_boto3_s3.client import S3Client
+from config.s3 import AsyncS3Client
 from config.mongo import TypedAsyncIOMotorDatabase
 from config.environment import S3Settings
 from db.models.document_uploads import (
@@ -32,7 +32,7 @@ poppler_settings = PopplerSettings()
 
 
 class ThumbnailService:
-    def __init__(self, db: TypedAsyncIOMotorDatabase, s3_client: S3Client):
+    def __init__(self, db: TypedAsyncIOMotorDatabase, s3_client: AsyncS3Client):
         self.db = db
         self.s3_client = s3_client
         self.s3_settings = S3Settings()
@@ -155,10 +155,9 @@ class ThumbnailService:
         )
 
     async def get_file_content(self, file_details: MongoFileDetails) -> bytes:
-        response = self.s3_client.get_object(
-            Bucket=file_details["s3_bucket"], Key=file_details["file_key"]
+        return await self.s3_client.get_object_bytes(
+            file_details["s3_bucket"], file_details["file_key"]
         )
-        return response["Body"].read()
 
     def get_normalized_file_type(self, file_type: str) -> str:
         """
@@ -650,7 +649,7 @@ class ThumbnailService:
         thumbnail.save(buffer, format="PNG")
         buffer.seek(0)
 
-        self.s3_client.put_object(
+        await self.s3_client.put_object(
             Bucket=self.s3_settings.s3_document_bucket,
             Key=thumbnail_key,
             Body=buffer,
@@ -0,0 +1,236 @@
+import asyncio
+from typing import Any, Dict, List
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+
+from config.environment import ElasticsearchSettings
+from db.models.content_cache import Chunker
+from services.content_cache_service import ContentCacheService
+from config.logger import get_logger
+
+logger = get_logger()
+
+es_settings = ElasticsearchSettings()
+
+CHUNK_INDEX_NAME = f"{es_settings.elasticsearch_index_prefix}academic_papers"
+
+
+class ChunkSink:
+    """
+    Somewhere embedded chunks are written to. A sink is prepared once, then
+    receives the chunks in batches (each carrying its embedding as `vector`),
+    then is told the final chunk count.
+    """
+
+    name: str
+
+    async def prepare(self) -> None:
+        pass
+
+    async def write(self, chunks: List[Dict[str, Any]]) -> int:
+        """Write a batch; returns how many chunks were stored."""
+        raise NotImplementedError
+
+    async def finish(self, document_id: str, total_chunks: int) -> None:
+        pass
+
+
+class ElasticsearchChunkSink(ChunkSink):
+    name = "elasticsearch"
+
+    def __init__(
+        self, es_client: AsyncElasticsearch, index_name: str = CHUNK_INDEX_NAME
+    ):
+        self.es_client = es_client
+        self.index_name = index_name
+
+    async def prepare(self) -> None:
+        """Create the chunk index if needed, handling connection errors."""
+        # First, check if the index exists, create it if it doesn't
+        index_name = self.index_name
+
+        # Retry mechanism for index existence check
+        max_retries = 3
+        retry_count = 0
+        index_exists = False
+
+        while retry_count < max_retries:
+            try:
+                index_exists = await self.es_client.indices.exists(index=index_name)
+                break
+            except Exception as e:
+                retry_count += 1
+                logger.warning(
+                    f"Elasticsearch connection error (attempt {retry_count}/{max_retries}): {str(e)}"
+                )
+                if retry_count >= max_retries:
+                    logger.error(
+                        f"Failed to connect to Elasticsearch after {max_retries} attempts"
+                    )
+                    raise
+                # Exponential backoff before retry
+                await asyncio.sleep(2**retry_count)
+
+        # Create index if it doesn't exist
+        if not index_exists:
+            await self._create_elasticsearch_index(index_name)
+
+    async def finish(self, document_id: str, total_chunks: int) -> None:
+        """Fill in `position_in_document` (0-1) now that the chunk count is known."""
+        try:
+            await self.es_client.update_by_query(
+                index=self.index_name,
+                query={"term": {"document_id": document_id}},
+                script={
+                    "source": "ctx._source.position_in_document = ctx._source.chunk_index / (double) params.total",
+                    "params": {"total": total_chunks},
+                },
+                conflicts="proceed",
+                refresh=True,
+            )
+        except Exception as e:
+            logger.warning(
+                f"Failed to set chunk positions for document {document_id}: {str(e)}"
+            )
+
+    async def _create_elasticsearch_index(self, index_name: str) -> None:
+        """Create Elasticsearch index with appropriate mappings for academic papers."""
+        try:
+            # Define mapping with dense vector field for embeddings
+            mapping = {
+                "mappings": {
+                    "properties": {
+                        "chunk_id": {"type": "keyword"},
+                        "document_id": {"type": "keyword"},
+                        "text": {"type": "text"},
+                        "heading_path": {"type": "keyword"},
+                        "chunk_index": {"type": "integer"},
+                        "chunk_type": {"type": "keyword"},
+                        "page_number": {"type": "integer"},
+                        "section_path": {"type": "text"},
+                        "position_in_document": {"type": "float"},
+                        "vector": {
+                            "type": "dense_vector",
+                            "dims": es_settings.vector_dimensions,
+                            "index": True,
+                            "similarity": es_settings.vector_similarity,
+                        },
+                    }
+                },
+                "settings": {"index": {"number_of_shards": 1, "number_of_replicas": 1}},
+            }
+
+            # Create index with proper error handling
+            try:
+                await self.es_client.indices.create(index=index_name, body=mapping)
+                logger.info(f"Created Elasticsearch index: {index_name}")
+            except Exception as e:
+                # Check if it's already exists error which can be ignored
+                if "resource_already_exists_exception" in str(e):
+                    logger.info(f"Elasticsearch index {index_name} already exists")
+                else:
+                    logger.error(f"Error creating Elasticsearch index: {str(e)}")
+                    raise
+
+        except Exception as e:
+            logger.error(f"Failed to create Elasticsearch index: {str(e)}")
+            raise
+
+    async def write(self, es_docs: List[Dict[str, Any]]) -> int:
+        actions = [
+            {
+                "_index": self.index_name,
+                "_id": es_doc["chunk_id"],
+                "_source": es_doc,
+            }
+            for es_doc in es_docs
+        ]
+
+        max_bulk_retries = 3
+        bulk_retry_count = 0
+
+        while bulk_retry_count < max_bulk_retries:
+            try:
+                # Use a reasonable timeout for bulk operations
+                success, errors = await async_bulk(
+                    self.es_client,
+                    actions,
+                    request_timeout=60,
+                    raise_on_error=False,  # Don't raise an exception on document errors
+                    stats_only=False,  # Return details about errors
+                )
+
+                if errors:
+                    logger.warning(
+                        f"Some chunks had errors during indexing: {len(errors)} errors"
+                    )
+                    for error in errors[:5]:  # Log first 5 errors
+                        logger.warning(f"Indexing error: {str(error)}")
+
+                return success
+
+            except Exception as e:
+                bulk_retry_count += 1
+                logger.warning(
+                    f"Elasticsearch bulk indexing error (attempt {bulk_retry_count}/{max_bulk_retries}): {str(e)}"
+                )
+                if bulk_retry_count >= max_bulk_retries:
+                    logger.error(
+                        f"Failed to store chunks in Elasticsearch after {max_bulk_retries} attempts"
+                    )
+                    raise
+                # Exponential backoff before retry
+                await asyncio.sleep(2**bulk_retry_count)
+        return 0
+
+
+class PineconeChunkSink(ChunkSink):
+    name = "pinecone"
+
+    def __init__(self, index: Any):
+        # A pinecone.Index; the client is synchronous, so calls go to a thread
+        self.index = index
+
+    async def write(self, chunks: List[Dict[str, Any]]) -> int:
+        vectors = [
+            {
+                "id": chunk["chunk_id"],
+                "values": chunk["vector"],
+                "metadata": {
+                    "document_id": chunk["document_id"],
+                    "chunk_index": chunk["chunk_index"],
+                    "text": chunk["text"],
+                    **(
+                        {"token_count": chunk["token_count"]}
+                        if "token_count" in chunk
+                        else {}
+                    ),
+                },
+            }
+            for chunk in chunks
+        ]
+        await asyncio.to_thread(self.index.upsert, vectors=vectors)
+        return len(vectors)
+
+
+class ContentCacheChunkSink(ChunkSink):
+    name = "content_cache"
+
+    def __init__(
+        self,
+        content_cache: ContentCacheService,
+        content_hash: str,
+        chunker: Chunker,
+        embedding_model: str,
+    ):
+        self.content_cache = content_cache
+        self.content_hash = content_hash
+        self.chunker = chunker
+        self.embedding_model = embedding_model
+
+    async def write(self, chunks: List[Dict[str, Any]]) -> int:
+        await self.content_cache.store_chunks(
+            self.content_hash, self.chunker, self.embedding_model, chunks
+        )
+        return len(chunks)
@@ -1,12 +1,129 @@
+import asyncio
+from collections import deque
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect
-from typing import Optional
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+from config.environment import WebSocketSettings
 from config.logger import get_logger
 
 
+class ConnectionWriter:
+    """
+    A websocket's bounded outbound queue and the task that drains it.
+
+    Messages are queued without waiting on the client, so one slow socket
+    can't hold up delivery to the others. When the queue is full the
+    `websocket_queue_full_policy` applies: "drop_progress" drops the oldest
+    non-terminal message (terminal COMPLETE/ERROR messages are always kept),
+    "disconnect" drops the client.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        websocket: WebSocket,
+        settings: WebSocketSettings,
+        on_failure: Callable[[], Awaitable[None]],
+    ):
+        self.key = key
+        self.websocket = websocket
+        self.settings = settings
+        self.on_failure = on_failure
+        self.logger = get_logger()
+        self.dropped = 0
+        self._messages: Deque[Tuple[str, bool]] = deque()
+        self._ready = asyncio.Event()
+        self._sending = False
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, message: str, terminal: bool = False) -> bool:
+        """Queue a message; returns False if the client should be disconnected."""
+        if len(self._messages) >= self.settings.websocket_send_queue_size:
+            if self.settings.websocket_queue_full_policy == "disconnect":
+                return False
+            for index, (_, queued_terminal) in enumerate(self._messages):
+                if not queued_terminal:
+                    del self._messages[index]
+                    self.dropped += 1
+                    break
+            else:
+                if not terminal:
+                    self.dropped += 1
+                    return True
+        self._messages.append((message, terminal))
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        while True:
+            while not self._messages:
+                self._ready.clear()
+                await self._ready.wait()
+            message, _ = self._messages.popleft()
+            self._sending = True
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(message),
+                    timeout=self.settings.websocket_send_timeout,
+                )
+            except WebSocketDisconnect:
+                self.logger.warning(
+                    f"Client {self.key} disconnected while sending message"
+                )
+                break
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Client {self.key} took over {self.settings.websocket_send_timeout}s to receive a message"
+                )
+                break
+            except Exception as e:
+                self.logger.error(
+                    f"Error sending message to client {self.key}: {str(e)}"
+                )
+                break
+            finally:
+                self._sending = False
+        await self.on_failure()
+
+    async def close(self, drain_timeout: float = 0):
+        """Stop the writer, first giving queued messages `drain_timeout` seconds."""
+        if self._task is asyncio.current_task():
+            return
+        if drain_timeout > 0 and (self._messages or self._sending):
+            try:
+                await asyncio.wait_for(self._drained(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        if self.dropped:
+            self.logger.info(
+                f"Dropped {self.dropped} queued messages for slow client {self.key}"
+            )
+
+    async def _drained(self):
+        while (self._messages or self._sending) and not self._task.done():
+            await asyncio.sleep(0.01)
+
+
 class WebSocketManager:
+    """
+    Holds this node's websockets, keyed `prefix:client_id`, and the topics each
+    one receives. A per-document socket receives its own key as its only topic;
+    a multiplexed session socket subscribes to any number of them.
+    """
+
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
+        self.writers: dict[str, ConnectionWriter] = {}
+        # topic key -> keys of the sockets subscribed to it
+        self.topics: dict[str, set[str]] = {}
+        # socket key -> topic keys it is subscribed to
+        self.socket_topics: dict[str, set[str]] = {}
+        self.settings = WebSocketSettings()
         self.logger = get_logger()
 
     def connection_key(self, client_id: str, prefix: str) -> str:
@@ -15,11 +132,60 @@ class WebSocketManager:
     async def connect(self, websocket: WebSocket, client_id: str, prefix: str):
         await websocket.accept()
         key = self.connection_key(client_id, prefix)
+        previous = self.writers.pop(key, None)
+        if previous is not None:
+            await previous.close()
         self.active_connections[key] = websocket
+        self.writers[key] = ConnectionWriter(
+            key,
+            websocket,
+            self.settings,
+            on_failure=lambda: self._drop(websocket, client_id, prefix),
+        )
         self.logger.info(f"Client {key} connected")
 
-    async def disconnect(self, client_id: str, prefix: str):
+    def subscribe(self, socket_key: str, topic_key: str):
+        self.topics.setdefault(topic_key, set()).add(socket_key)
+        self.socket_topics.setdefault(socket_key, set()).add(topic_key)
+
+    def unsubscribe(self, socket_key: str, topic_key: str):
+        sockets = self.topics.get(topic_key)
+        if sockets is not None:
+            sockets.discard(socket_key)
+            if not sockets:
+                del self.topics[topic_key]
+        topics = self.socket_topics.get(socket_key)
+        if topics is not None:
+            topics.discard(topic_key)
+            if not topics:
+                del self.socket_topics[socket_key]
+
+    def is_replaced(self, socket_key: str, websocket: Optional[WebSocket]) -> bool:
+        """
+        Whether `websocket` is no longer the socket held under its key, because
+        the client reconnected; its handler must then leave the new one alone.
+        """
+        return (
+            websocket is not None
+            and self.active_connections.get(socket_key) is not websocket
+        )
+
+    async def disconnect(
+        self,
+        client_id: str,
+        prefix: str,
+        drain_timeout: float = 0,
+        websocket: Optional[WebSocket] = None,
+    ):
+        """Close the `prefix:client_id` socket, only if it is still `websocket`."""
         key = self.connection_key(client_id, prefix)
+        if self.is_replaced(key, websocket):
+            return
+        for topic_key in list(self.socket_topics.get(key, ())):
+            self.unsubscribe(key, topic_key)
+        writer = self.writers.pop(key, None)
+        if writer is not None:
+            await writer.close(drain_timeout)
         if key in self.active_connections:
             try:
                 await self.active_connections[key].close()
@@ -29,44 +195,56 @@ class WebSocketManager:
                     f"Error closing connection for client {key}: {str(e)}"
                 )
             finally:
-                del self.active_connections[key]
+                self.active_connections.pop(key, None)
 
-    async def send_message(self, message: str, client_id: str, prefix: str):
-        key = self.connection_key(client_id, prefix)
-        if key in self.active_connections:
-            try:
-                await self.active_connections[key].send_text(message)
-            except WebSocketDisconnect:
-                self.logger.warning(f"Client {key} disconnected while sending message")
-                await self.disconnect(client_id, prefix)
-            except Exception as e:
-                self.logger.error(f"Error sending message to client {key}: {str(e)}")
-                await self.disconnect(client_id, prefix)
+    async def _drop(self, websocket: WebSocket, client_id: str, prefix: str):
+        # A writer that failed drops its own socket, unless it was replaced.
+        await self.disconnect(client_id, prefix, websocket=websocket)
+
+    async def send_message(
+        self, message: str, client_id: str, prefix: str, terminal: bool = False
+    ):
+        """
+        Queue a message for every socket subscribed to the `prefix:client_id`
+        topic; `terminal` marks COMPLETE/ERROR events.
+        """
+        topic_key = self.connection_key(client_id, prefix)
+        for socket_key in list(self.topics.get(topic_key, ())):
+            await self.send_to(socket_key, message, terminal)
+
+    async def send_to(self, socket_key: str, message: str, terminal: bool = False):
+        """Queue a message for one socket, whatever its topics."""
+        writer = self.writers.get(socket_key)
+        if writer is not None and not writer.put(message, terminal):
+            self.logger.warning(
+                f"Send queue full for client {socket_key}; disconnecting"
+            )
+            prefix, client_id = socket_key.split(":", 1)
+            await self.disconnect(client_id, prefix)
 
     async def broadcast(self, message: str, prefix: Optional[str] = None):
-        disconnected_clients: list[tuple[str, str]] = []
-        for key, connection in self.active_connections.items():
+        full_clients: list[tuple[str, str]] = []
+        for key, writer in list(self.writers.items()):
             if prefix is None or key.startswith(f"{prefix}:"):
-                try:
-                    await connection.send_text(message)
-                except WebSocketDisconnect:
-                    self.logger.warning(f"Client {key} disconnected during broadcast")
+                if not writer.put(message, terminal=True):
                     pre, client_id = key.split(":", 1) if ":" in key else ("", key)
-                    disconnected_clients.append((pre, client_id))
-                except Exception as e:
-                    self.logger.error(f"Error broadcasting to client {key}: {str(e)}")
-                    pre, client_id = key.split(":", 1) if ":" in key else ("", key)
-                    disconnected_clients.append((pre, client_id))
+                    full_clients.append((pre, client_id))
 
-        for prefix, client_id in disconnected_clients:
-            await self.disconnect(client_id, prefix)
+        await asyncio.gather(
+            *(self.disconnect(client_id, pre) for pre, client_id in full_clients)
+        )
 
     async def shutdown(self):
         self.logger.info("Initiating WebSocket manager shutdown")
         await self.broadcast("Server is shutting down. Goodbye!")
-        for key in list(self.active_connections.keys()):
-            prefix, client_id = key.split(":", 1)
-            await self.disconnect(client_id, prefix)
+        await asyncio.gather(
+            *(
+                self.disconnect(client_id, prefix, drain_timeout=1.0)
+                for prefix, client_id in (
+                    key.split(":", 1) for key in list(self.active_connections.keys())
+                )
+            )
+        )
         self.logger.info("WebSocket manager shutdown complete")
 
 
@@ -14,3 +14,5 @@ class RedisHuey:
     ) -> None: ...
     def task(self, **kwargs: Any) -> Callable[[Callable[..., T]], Callable[..., T]]: ...
     def current_task(self) -> Any: ...
+    def on_startup(self, name: str = ...) -> Callable[[Callable[..., T]], Callable[..., T]]: ...
+    def on_shutdown(self, name: str = ...) -> Callable[[Callable[..., T]], Callable[..., T]]: ...
@@ -1,7 +1,7 @@
 import os
 from bson import ObjectId
 from logging import Logger
-from mypy_boto3_s3.client import S3Client
+from config.s3 import AsyncS3Client
 from urllib.parse import urljoin, urlparse
 from aiohttp import ClientSession
 from db.models.document_uploads import (
@@ -18,7 +18,7 @@ async def fetch_and_store_resource(
     base_url: str,
     document_upload_id: str,
     bucket: S3Bucket,
-    s3_client: S3Client,
+    s3_client: AsyncS3Client,
     s3_host: str,
     logger: Logger,
 ) -> str | None:
@@ -39,7 +39,7 @@ async def fetch_and_store_resource(
             object_id=ObjectId(document_upload_id),
             file_name=file_name,
         )
-        s3_client.put_object(
+        await s3_client.put_object(
             Bucket=bucket.value,
             Key=s3_key,
             Body=content,
@@ -1,6 +1,9 @@
-from typing import Optional, TYPE_CHECKING, Union
-import json
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING, Union
+import asyncio
+import uuid
+import orjson
 from config.redis import Redis
+from config.environment import ProgressStreamSettings
 from config.redis_pubsub_channels import (
     PubSubChannel,
     PUBSUB_CONFIG,
@@ -15,6 +18,8 @@ if TYPE_CHECKING:
 else:
     RedisType = Redis
 
+progress_stream_settings = ProgressStreamSettings()
+
 
 class ProgressUpdater:
     def __init__(
@@ -22,9 +27,13 @@ class ProgressUpdater:
         redis_client: RedisType,
         document_upload_id: str,
         pub_channel: Union[PubSubChannel, str],
+        job_id: Optional[str] = None,
     ):
         self.redis_client = redis_client
         self.document_upload_id = document_upload_id
+        # Jobs of a channel share the document's stream, so every event names
+        # its job; readers filter on it to keep jobs apart
+        self.job_id = job_id or uuid.uuid4().hex
         if isinstance(pub_channel, str):
             if not PUBSUB_CONFIG.is_valid_channel(pub_channel):
                 raise ValueError(f"Invalid pub_channel: {pub_channel}")
@@ -40,17 +49,31 @@ class ProgressUpdater:
             Union[WebCaptureProgressData, SummaryProgressData, ExplainTextProgressData]
         ] = None,
     ):
-        await self.redis_client.publish(
-            PUBSUB_CONFIG.get_channel_name(self.pub_channel),
-            json.dumps(
+        stream_name = PUBSUB_CONFIG.get_stream_name(
+            self.pub_channel, self.document_upload_id
+        )
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xadd(
+                stream_name,
                 {
-                    "connection_id": self.document_upload_id,
+                    # Kept beside the JSON so readers can route without parsing it
                     "status": status,
-                    "progress": progress,
-                    "payload": payload or {},
-                }
-            ),
-        )
+                    "job_id": self.job_id,
+                    "data": orjson.dumps(
+                        {
+                            "connection_id": self.document_upload_id,
+                            "job_id": self.job_id,
+                            "status": status,
+                            "progress": progress,
+                            "payload": payload or {},
+                        }
+                    ),
+                },
+                maxlen=progress_stream_settings.progress_stream_maxlen,
+                approximate=True,
+            )
+            pipe.expire(stream_name, progress_stream_settings.progress_stream_ttl)
+            await pipe.execute()
 
     async def complete(
         self, payload: Union[WebCaptureProgressData, SummaryProgressData]
@@ -59,3 +82,178 @@ class ProgressUpdater:
 
     async def error(self):
         await self.update(0, "ERROR")
+
+
+def decode_stream_id(stream_id: Union[bytes, str]) -> str:
+    return stream_id.decode() if isinstance(stream_id, bytes) else stream_id
+
+
+def parse_stream_id(stream_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = stream_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def decode_progress_event(
+    stream_id: Union[bytes, str], fields: Dict[Any, Any]
+) -> Dict[str, Any]:
+    """A stored progress event as sent to clients, tagged with its stream ID."""
+    data = fields.get(b"data", fields.get("data"))
+    event: Dict[str, Any] = orjson.loads(data)
+    event["stream_id"] = decode_stream_id(stream_id)
+    return event
+
+
+def progress_event_job_id(fields: Dict[Any, Any]) -> Optional[str]:
+    """The job a stored event belongs to; None if it predates job IDs."""
+    job_id = fields.get(b"job_id", fields.get("job_id"))
+    return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+
+def progress_event_message(
+    stream_id: Union[bytes, str], fields: Dict[Any, Any], socket_prefix: str
+) -> Tuple[str, Optional[str]]:
+    """
+    The websocket message for a stored progress event, and the event's status.
+
+    The stored JSON object is forwarded as is, with the stream ID and the
+    event's channel (its socket prefix) appended before its closing brace, so
+    it is never parsed or re-encoded. Only events
+    written before the status field was stored are parsed, once, for it.
+    """
+    data = fields.get(b"data", fields.get("data"))
+    if isinstance(data, str):
+        data = data.encode()
+    status = fields.get(b"status", fields.get("status"))
+    if status is None:
+        status = orjson.loads(data).get("status")
+    elif isinstance(status, bytes):
+        status = status.decode()
+    if not isinstance(data, bytes) or not data.endswith(b"}"):
+        raise ValueError(f"Malformed progress event {decode_stream_id(stream_id)}")
+    stream_id = stream_id if isinstance(stream_id, bytes) else stream_id.encode()
+    message = (
+        data[:-1]
+        + b',"stream_id":"'
+        + stream_id
+        + b'","channel":"'
+        + socket_prefix.encode()
+        + b'"}'
+    )
+    return message.decode(), status
+
+
+async def get_latest_progress(
+    redis_client: RedisType,
+    pub_channel: PubSubChannel,
+    connection_id: str,
+    job_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    The last progress event of a job, e.g. a finished job's COMPLETE result:
+    of `job_id` if given, otherwise of whichever job wrote last.
+    """
+    stream_name = PUBSUB_CONFIG.get_stream_name(pub_channel, connection_id)
+    count = progress_stream_settings.progress_stream_read_count
+    max_id = "+"
+    while True:
+        entries = await redis_client.xrevrange(stream_name, max=max_id, count=count)
+        for stream_id, fields in entries:
+            if job_id is None or progress_event_job_id(fields) == job_id:
+                return decode_progress_event(stream_id, fields)
+        if len(entries) < count:
+            return None
+        max_id = f"({decode_stream_id(entries[-1][0])}"
+
+
+class StreamingTextPublisher:
+    """
+    Coalesces streamed text deltas into fewer `newText` progress updates.
+
+    Deltas are buffered and published together once `flush_interval` seconds
+    have passed since the first buffered delta, or as soon as `max_chars` are
+    buffered. Updates are published in order, one at a time, and `close()`
+    flushes whatever is left, so it must be awaited before `complete()`.
+    """
+
+    def __init__(
+        self,
+        progress_updater: ProgressUpdater,
+        progress: float = 50,
+        status: str = "IN_PROGRESS",
+        flush_interval: float = progress_stream_settings.progress_stream_flush_interval,
+        max_chars: int = progress_stream_settings.progress_stream_max_chars,
+    ):
+        self.progress_updater = progress_updater
+        self.progress = progress
+        self.status = status
+        self.flush_interval = flush_interval
+        self.max_chars = max_chars
+        self.deltas = 0
+        self.published = 0
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task[None]] = None
+        self._error: Optional[BaseException] = None
+
+    async def __aenter__(self) -> "StreamingTextPublisher":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def write(self, text: str) -> None:
+        self._raise_timer_error()
+        if not text:
+            return
+        self.deltas += 1
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after())
+
+    async def flush(self) -> None:
+        self._cancel_timer()
+        self._raise_timer_error()
+        await self._publish()
+
+    async def close(self) -> None:
+        await self.flush()
+
+    async def _flush_after(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        # Detach before publishing so a concurrent flush() can't cancel a
+        # publish that has already taken text out of the buffer.
+        self._timer = None
+        try:
+            await self._publish()
+        except Exception as e:
+            self._error = e
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+
+    def _raise_timer_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def _publish(self) -> None:
+        # The lock keeps a timer flush and an inline flush from interleaving,
+        # and the buffer is taken under it so text is published in order.
+        async with self._lock:
+            if not self._pending:
+                return
+            text = "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+            await self.progress_updater.update(
+                progress=self.progress,
+                status=self.status,
+                payload={"newText": text},
+            )
+            self.published += 1